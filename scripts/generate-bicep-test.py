@@ -1,26 +1,16 @@
 import os
-import re
+import sys
 import glob
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-def generate_test_bicep(main_bicep_path):
-    # Read the main.bicep file
-    with open(main_bicep_path, "r") as file:
-        main_bicep_content = file.read()
-
-    # Find the targetScope
-    target_scope_pattern = re.compile(r"targetScope\s*=\s*\'(\w+)\'")
-    target_scope_match = target_scope_pattern.search(main_bicep_content)
-    target_scope = target_scope_match.group(1) if target_scope_match else "subscription"
+from bicep_params import allowed_values, read_index
 
-    # Find all parameter definitions and allowed values
-    param_pattern = re.compile(r"param\s+(\w+)\s+(\w+)\s*(?!\s*=\s*'.*')(\n|\/|$)")
-    allowed_pattern = re.compile(
-        r"@allowed\(\[\s*([^\]]+)\s*\]\)(?:\s*@\w+\([^\)]*\))*\s*param\s+(\w+)\s+(\w+)"
-    )
 
-    params = param_pattern.findall(main_bicep_content)
-    allowed_params = allowed_pattern.findall(main_bicep_content)
+def generate_test_bicep(main_bicep_path):
+    # Index the parameters of the main.bicep file
+    index = read_index(main_bicep_path)
+    target_scope = index.targetScope or "subscription"
 
     # Generate the main.test.bicep content
     test_bicep_content = f"""// This file is for doing static analysis and contains sensible defaults
@@ -34,19 +24,15 @@ module test 'main.bicep' = {{
   params: {{
 """
 
-    # Add parameters to the test file content
-    for param_name, param_type, _ in params:
-        # Check if the parameter has allowed values
-        allowed_value = None
-        for allowed_values, allowed_param_name, allowed_param_type in allowed_params:
-            if param_name == allowed_param_name:
-                allowed_value = (
-                    allowed_values.split()[-1].split(",")[0].strip(" ").strip("'")
-                )
-                break
-
-        if allowed_value:
-            test_bicep_content += f"    {param_name}: '{allowed_value}'\n"
+    # Add the parameters without a default to the test file content
+    for parameter in index.required():
+        param_name = parameter.name
+        param_type = parameter.type
+        # Use the first allowed value if the parameter has any
+        allowed = allowed_values(parameter)
+
+        if allowed:
+            test_bicep_content += f"    {param_name}: {allowed[0]}\n"
         elif param_type == "string":
             test_bicep_content += f"    {param_name}: 'test'\n"
         elif param_type == "int":
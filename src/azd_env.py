@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+
+# Parsed .env files by path, with the modification time they were read at
+_cache = {}
+_cacheLock = threading.Lock()
+
+_escapes = {"n": "\n", "r": "\r"}
+
+
+def parse_dotenv_value(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1]
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        # azd writes double-quoted values with backslash escapes
+        chars = []
+        escaped = False
+        for char in value[1:-1]:
+            if escaped:
+                chars.append(_escapes.get(char, char))
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            else:
+                chars.append(char)
+        return "".join(chars)
+    return value.split(" #", 1)[0].strip()
+
+
+def read_dotenv(path):
+    """Parse the KEY=VALUE lines of a .env file as written by azd env set."""
+    values = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            line = line.removeprefix("export ")
+            key, value = line.split("=", 1)
+            values[key.strip()] = parse_dotenv_value(value)
+    return values
+
+
+def active_environment(folderPath, envName=None):
+    """
+    Return the azd environment azd would use in folderPath: envName, else AZURE_ENV_NAME,
+    else the default environment of .azure/config.json, or None.
+    """
+    if envName:
+        return envName
+    if os.getenv("AZURE_ENV_NAME"):
+        return os.getenv("AZURE_ENV_NAME")
+    try:
+        with open(os.path.join(folderPath, ".azure", "config.json"), "r") as file:
+            return json.load(file).get("defaultEnvironment") or None
+    except (OSError, ValueError):
+        return None
+
+
+def load_azd_env(folderPath, envName=None):
+    """
+    Read the values of the active azd environment of folderPath from its .env file.
+    Files are parsed again only when they changed.
+    :return: dict of the values, or None when the environment files are missing
+    """
+    name = active_environment(folderPath, envName)
+    if name is None:
+        return None
+    path = os.path.abspath(os.path.join(folderPath, ".azure", name, ".env"))
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _cacheLock:
+        cached = _cache.get(path)
+    if cached is not None and cached[0] == modified:
+        return cached[1]
+    try:
+        values = read_dotenv(path)
+    except (OSError, UnicodeDecodeError) as e:
+        logging.debug(f"Failed to read {path}: {e}")
+        return None
+    with _cacheLock:
+        _cache[path] = (modified, values)
+    return values
+
+
+def get_azd_env_value(folderPath, key, envName=None, **kwargs):
+    """
+    Return a value of the active azd environment of folderPath, from the .env file when
+    it exists, else from azd env get-value.
+    :param kwargs: extra arguments for subprocess.run when falling back to the CLI
+    :return: the value, or None when it is not set
+    """
+    values = load_azd_env(folderPath, envName)
+    if values is not None and key in values:
+        return values[key]
+
+    logging.debug(f"{key} is not in the azd environment files, asking azd.")
+    result = subprocess.run(
+        f"azd env get-value {key}",
+        shell=True,
+        text=True,
+        capture_output=True,
+        cwd=folderPath,
+        check=False,
+        **kwargs,
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
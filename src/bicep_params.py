@@ -0,0 +1,364 @@
+"""
+Indexes the parameters of a Bicep file in one pass: their types, defaults and decorators.
+Comments, multi-line strings, interpolations and multi-line decorators such as
+@allowed([...]) are tokenized, instead of matched line by line.
+
+Only the standard library is used, so the action can run it before the Python
+dependencies of the validation are installed.
+
+Usage:
+  python src/bicep_params.py table infra/main.bicep
+  python src/bicep_params.py env infra/main.bicep --parameters infra/main.parameters.json
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import string
+import sys
+from collections import namedtuple
+
+token_pattern = re.compile(
+    r"(?P<newline>\n)|(?P<space>[ \t\r]+)|(?P<comment>//[^\n]*|/\*.*?\*/)"
+    r"|(?P<multiline>'''.*?(?:'''|\Z))|(?P<string>')"
+    r"|(?P<word>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)|(?P<number>-?\d+)|(?P<punct>.)",
+    re.DOTALL,
+)
+string_run_pattern = re.compile(r"[^'\\$\n]*")
+# A parameters file value that is only an azd environment variable, such as ${AZURE_LOCATION}
+env_reference_pattern = re.compile(r"^\$\{([A-Za-z_]+)\}$")
+
+OPENING = "([{"
+CLOSING = ")]}"
+# Variables azd sets itself, they need no placeholder value
+AZD_ENV_KEYS = {
+    "AZURE_LOCATION",
+    "AZURE_ENV_NAME",
+    "AZURE_PRINCIPAL_ID",
+    "AZURE_PRINCIPAL_TYPE",
+}
+
+Token = namedtuple("Token", ["kind", "text", "start", "end", "line"])
+# A parameter declaration: the type and default as source text, the default is None when
+# there is none, and the decorators by name with their argument text, such as
+# {"allowed": "['S0', 'S1']"}
+BicepParameter = namedtuple(
+    "BicepParameter", ["name", "type", "default", "decorators", "line"]
+)
+# A resource or output declaration: its tokens after the keyword, newlines inside
+# brackets included, and its decorators by name
+BicepDeclaration = namedtuple(
+    "BicepDeclaration", ["keyword", "tokens", "decorators", "line"]
+)
+
+
+def string_end(text, pos):
+    """Return the position after the single-quoted string starting at pos."""
+    pos += 1
+    while pos < len(text):
+        pos = string_run_pattern.match(text, pos).end()
+        if pos == len(text) or text[pos] == "\n":
+            # An unterminated string ends with its line
+            return pos
+        char = text[pos]
+        if char == "'":
+            return pos + 1
+        if char == "\\":
+            pos += 2
+        elif text.startswith("${", pos):
+            pos = interpolation_end(text, pos + 2)
+        else:
+            pos += 1
+    return pos
+
+
+def interpolation_end(text, pos):
+    """Return the position after the } closing the interpolation whose body starts at pos."""
+    depth = 1
+    while pos < len(text):
+        match = token_pattern.match(text, pos)
+        pos = match.end()
+        if match.lastgroup == "string":
+            pos = string_end(text, match.start())
+        elif match.group() == "{":
+            depth += 1
+        elif match.group() == "}":
+            depth -= 1
+            if not depth:
+                break
+    return pos
+
+
+def tokenize(text):
+    """Yield the tokens of text, without spaces and comments."""
+    pos = 0
+    line = 1
+    while pos < len(text):
+        match = token_pattern.match(text, pos)
+        kind = match.lastgroup
+        end = string_end(text, pos) if kind == "string" else match.end()
+        if kind not in ("space", "comment"):
+            yield Token(kind, text[pos:end], pos, end, line)
+        if kind != "space":
+            line += text.count("\n", pos, end)
+        pos = end
+
+
+def split_items(text):
+    """Split the items of an array literal, or the members of a union type, as source text."""
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        text = text[1:-1]
+    items = []
+    depth = 0
+    start = end = None
+    for token in tokenize(text):
+        if token.text in CLOSING:
+            depth -= 1
+        boundary = depth == 0 and (token.kind == "newline" or token.text in (",", "|"))
+        if token.text in OPENING:
+            depth += 1
+        if boundary:
+            if start is not None:
+                items.append(text[start:end])
+            start = None
+        elif token.kind != "newline":
+            start = token.start if start is None else start
+            end = token.end
+    if start is not None:
+        items.append(text[start:end])
+    return items
+
+
+def literal(text):
+    """Return the value of a string literal, other literals as they are written."""
+    if text.startswith("'''"):
+        return text[3:-3]
+    if len(text) >= 2 and text[0] == text[-1] == "'":
+        return re.sub(r"\\(.)", r"\1", text[1:-1])
+    return text
+
+
+def is_literal(text):
+    return (
+        (text.startswith("'") and "${" not in text)
+        or text.lstrip("-").isdigit()
+        or text in ("true", "false")
+    )
+
+
+class ParameterIndex:
+    """
+    The target scope, the parameters by name in declaration order, the paths of the
+    modules, and the resource and output declarations of a Bicep or .bicepparam file.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.targetScope = None
+        self.parameters = {}
+        self.modules = []
+        self.declarations = []
+        self._decorators = {}
+        statement = []
+        depth = 0
+        for token in tokenize(text):
+            if token.kind == "newline" and depth == 0:
+                self.read_statement(statement)
+                statement = []
+                continue
+            if token.text in OPENING:
+                depth += 1
+            elif token.text in CLOSING:
+                depth = max(depth - 1, 0)
+            statement.append(token)
+        self.read_statement(statement)
+
+    def read_statement(self, tokens):
+        """Index one top-level statement, its tokens span lines inside brackets."""
+        index = 0
+        while index + 1 < len(tokens) and tokens[index].text == "@":
+            name = tokens[index + 1].text.split(".")[-1]
+            index += 2
+            argument = ""
+            if index < len(tokens) and tokens[index].text == "(":
+                close = matching_bracket(tokens, index)
+                if close > index + 1:
+                    argument = self.text[
+                        tokens[index + 1].start : tokens[close - 1].end
+                    ]
+                index = close + 1
+            self._decorators[name] = argument
+        # Decorators stay pending over blank lines and #disable-next-line directives
+        if index >= len(tokens) or tokens[index].text == "#":
+            return
+
+        keyword = tokens[index].text
+        equals = next(
+            (
+                position
+                for position in range(index + 1, len(tokens))
+                if tokens[position].text == "="
+            ),
+            None,
+        )
+        if (
+            keyword == "param"
+            and index + 1 < len(tokens)
+            and tokens[index + 1].kind == "word"
+        ):
+            typeTokens = tokens[index + 2 : equals]
+            self.parameters[tokens[index + 1].text] = BicepParameter(
+                tokens[index + 1].text,
+                self.source(typeTokens),
+                self.source(tokens[equals + 1 :]) if equals is not None else None,
+                self._decorators,
+                tokens[index].line,
+            )
+        elif (
+            keyword == "module"
+            and index + 2 < len(tokens)
+            and tokens[index + 2].kind in ("string", "multiline")
+        ):
+            self.modules.append(literal(tokens[index + 2].text))
+        elif keyword in ("resource", "output"):
+            self.declarations.append(
+                BicepDeclaration(
+                    keyword, tokens[index + 1 :], self._decorators, tokens[index].line
+                )
+            )
+        elif keyword == "targetScope" and equals is not None:
+            self.targetScope = literal(self.source(tokens[equals + 1 :]))
+        self._decorators = {}
+
+    def source(self, tokens):
+        return self.text[tokens[0].start : tokens[-1].end] if tokens else ""
+
+    def required(self):
+        """Return the parameters that have neither a default nor a nullable type."""
+        return [
+            parameter
+            for parameter in self.parameters.values()
+            if parameter.default is None and not parameter.type.endswith("?")
+        ]
+
+
+def matching_bracket(tokens, index):
+    """Return the index of the token closing the bracket at index, or the last token."""
+    depth = 0
+    for position in range(index, len(tokens)):
+        if tokens[position].text in OPENING:
+            depth += 1
+        elif tokens[position].text in CLOSING:
+            depth -= 1
+            if not depth:
+                return position
+    return len(tokens) - 1
+
+
+def allowed_values(parameter):
+    """
+    Return the values a parameter is limited to, as source literals: the items of its
+    @allowed decorator, or the members of its union type such as 'S0' | 'S1'.
+    """
+    if "allowed" in parameter.decorators:
+        return split_items(parameter.decorators["allowed"])
+    members = split_items(parameter.type) if "|" in parameter.type else []
+    return members if members and all(is_literal(item) for item in members) else []
+
+
+def read_index(path):
+    with open(path, "r", encoding="utf-8-sig") as file:
+        return ParameterIndex(file.read())
+
+
+def placeholder_value(envKey, parameter, rng=random):
+    """
+    Return a value for an environment variable a required parameter reads, so azd up
+    does not prompt for it: the first allowed value, else a random name that starts with
+    a letter, 10 for capacities and false for feature switches.
+    """
+    values = allowed_values(parameter)
+    if values:
+        return literal(values[0])
+    if "capacity" in envKey.lower():
+        return "10"
+    if "enabled" in envKey.lower():
+        return "false"
+    return rng.choice(string.ascii_uppercase) + "".join(
+        rng.choice(string.digits + string.ascii_lowercase) for _ in range(14)
+    )
+
+
+def placeholder_env(index, parameterValues, rng=random):
+    """
+    Return (KEY, value) pairs for the azd environment variables that the parameters file
+    binds to required parameters, other than the ones azd sets itself.
+    :param parameterValues: the "parameters" object of a main.parameters.json file
+    """
+    env = []
+    for parameter in index.required():
+        value = (parameterValues.get(parameter.name) or {}).get("value")
+        match = env_reference_pattern.match(value) if isinstance(value, str) else None
+        if match is None:
+            continue
+        envKey = match.group(1)
+        if envKey in AZD_ENV_KEYS or "location" in envKey.lower():
+            logging.info(f"Ignoring parameter: {parameter.name}")
+            continue
+        env.append((envKey, placeholder_value(envKey, parameter, rng)))
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Index the parameters of a Bicep file."
+    )
+    parser.add_argument(
+        "command",
+        choices=["table", "env"],
+        help="table prints the parameters as JSON, env prints KEY=VALUE lines for the environment variables the required parameters read.",
+    )
+    parser.add_argument("bicep_path", help="The Bicep file to index.")
+    parser.add_argument(
+        "--parameters", help="The main.parameters.json file, for the env command."
+    )
+    args = parser.parse_args(argv)
+    # Logs go to stderr, so the output can be appended to $GITHUB_ENV as it is
+    logging.basicConfig(format="%(message)s", level=logging.INFO, stream=sys.stderr)
+
+    index = read_index(args.bicep_path)
+    if args.command == "table":
+        required = {parameter.name for parameter in index.required()}
+        print(
+            json.dumps(
+                {
+                    "targetScope": index.targetScope,
+                    "parameters": [
+                        dict(
+                            parameter._asdict(),
+                            required=parameter.name in required,
+                            allowed=allowed_values(parameter),
+                        )
+                        for parameter in index.parameters.values()
+                    ],
+                },
+                indent=2,
+            )
+        )
+        return 0
+
+    if not args.parameters:
+        parser.error("env requires --parameters")
+    with open(args.parameters, "r", encoding="utf-8-sig") as file:
+        parameterValues = json.load(file).get("parameters") or {}
+    for envKey, value in placeholder_env(index, parameterValues):
+        logging.info(f"Adding to required_env: {envKey}={value}")
+        print(f"{envKey}={value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
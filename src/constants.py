@@ -23,5 +23,8 @@ class ItemResultFormat:
     AZD_FAIL = "{{sign}} <b>{{message}}</b>. <a href={azd_link}>[How to fix?]</a>\n\n{{detail_messages}}\n".format(
         azd_link=azd_help_link
     )
+    PENDING = "{sign} <b>{{message}}</b>: pending, the result is added when it finishes.".format(
+        sign=Signs.WARNING
+    )
     DETAILS = "  <details>\n  <summary> Details </summary>\n\n  {message}\n\n</details>"
     SUBITEM = "  {sign} {message}"
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import yaml
+from repo_index import hash_files
+from utils import atomic_write
+
+# Settings of the run that change what a deployment does with the same files
+ENVIRONMENT_KEYS = ["AZURE_ENV_NAME", "AZURE_LOCATION", "AZURE_SUBSCRIPTION_ID"]
+
+
+def read_azure_yaml(folderPath):
+    """
+    Parse the azure.yaml, or azure.yml, of the template folder.
+    :return: (file name, project definition)
+    """
+    for name in ("azure.yaml", "azure.yml"):
+        if os.path.isfile(os.path.join(folderPath, name)):
+            with open(os.path.join(folderPath, name), "r", encoding="utf-8") as file:
+                return name, yaml.safe_load(file) or {}
+    raise FileNotFoundError(f"No azure.yaml in {folderPath}")
+
+
+def deployment_inputs(folderPath):
+    """
+    Return the paths a deployment of the template folder is built from: azure.yaml,
+    the infra folder and the project folder of every service, relative to folderPath.
+    """
+    azureYaml, project = read_azure_yaml(folderPath)
+    inputs = [azureYaml, (project.get("infra") or {}).get("path") or "infra"]
+    for service in (project.get("services") or {}).values():
+        if isinstance(service, dict) and service.get("project"):
+            inputs.append(service["project"])
+    return inputs
+
+
+class DeploymentCache:
+    """
+    Remembers the deployment inputs of template folders whose whole azd cycle passed,
+    so an unchanged folder does not have to be deployed again.
+    :param cacheDir: the folder the records are kept in, one JSON file per input hash
+    :param force: ignore the records and always deploy, passing cycles are still recorded
+    """
+
+    def __init__(self, cacheDir, force=False):
+        self.cacheDir = cacheDir
+        self.force = force
+
+    def key(self, folderPath, extraPaths=None, envName=None):
+        """Return the hash of the deployment inputs of folderPath and the run settings."""
+        paths = deployment_inputs(folderPath) + [
+            os.path.relpath(path, folderPath) for path in extraPaths or []
+        ]
+        environment = {name: os.getenv(name, "") for name in ENVIRONMENT_KEYS}
+        if envName:
+            environment["AZURE_ENV_NAME"] = envName
+        digest = hashlib.sha256(hash_files(folderPath, paths).encode())
+        digest.update(json.dumps(environment, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cacheDir, f"{key}.json")
+
+    def lookup(self, key):
+        """:return: the record stored for key, or None on a miss or when forced"""
+        if self.force:
+            return None
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(
+                f"Ignoring the unreadable deployment cache record {key}: {e}"
+            )
+            return None
+
+    def store(self, key, folderPath):
+        os.makedirs(self.cacheDir, exist_ok=True)
+        record = {
+            "folder": folderPath,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        }
+        with atomic_write(self.path(key), encoding="utf-8") as file:
+            json.dump(record, file)
+        logging.info(f"Recorded the passing deployment of {folderPath} in the cache.")
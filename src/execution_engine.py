@@ -1,20 +1,236 @@
+import heapq
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from constants import ItemResultFormat, Signs
+from severity import Severity
+from utils import OutputBuffer
+
+
 class ExecutionEngine:
-    def __init__(self, validators):
+    def __init__(
+        self, validators, repo_index=None, jobs=1, exclusive_jobs=1, deadline=None
+    ):
         self.validators = validators
+        self.repo_index = repo_index
+        self.jobs = jobs
+        # How many validators that are not parallelSafe may run at the same time
+        self.exclusive_jobs = exclusive_jobs
+        # time.monotonic() value after which long-running validators are not started
+        self.deadline = deadline
+        self.results = None
+        self.backgroundRun = None
 
     def execute(self):
-        results = []
         for validator in self.validators:
-            try:
-                validator.validate()
-                results.append(
-                    (
-                        validator.catalog,
-                        validator.severity,
-                        validator.result,
-                        validator.resultMessage,
+            # Share a single repository scan between all filesystem validators
+            if (
+                self.repo_index is not None
+                and getattr(validator, "repoIndex", False) is None
+            ):
+                validator.repoIndex = self.repo_index
+            if self.deadline is not None:
+                validator.deadline = self.deadline
+
+        # Results always follow the validator list, whatever order they ran in
+        results = [None] * len(self.validators)
+        self.results = results
+        if (
+            self.jobs <= 1
+            and self.exclusive_jobs <= 1
+            and not any(map(self.is_background, self.validators))
+        ):
+            for index in self.topological_order():
+                results[index] = self.run_validator(self.validators[index])
+            return results
+
+        self.backgroundRun = self.execute_concurrently(results)
+        next(self.backgroundRun, None)
+        return [
+            result if result is not None else self.pending_result(validator)
+            for validator, result in zip(self.validators, results)
+        ]
+
+    def has_background(self):
+        """Return True while background validators are still running or waiting."""
+        return self.results is not None and None in self.results
+
+    def wait_background(self):
+        """Wait for the background validators and return the results of all validators."""
+        if self.backgroundRun is not None:
+            for _ in self.backgroundRun:
+                pass
+            self.backgroundRun = None
+        return self.results
+
+    def is_background(self, validator):
+        return getattr(validator, "background", False) is True
+
+    def pending_result(self, validator):
+        return (
+            validator.catalog,
+            validator.severity,
+            True,
+            ItemResultFormat.PENDING.format(message=validator.pending_message()),
+        )
+
+    def build_graph(self):
+        """
+        Build the dependency graph from the validators' dependencies.
+        Dependencies that are not part of the run are ignored.
+        :return: (blockers, dependents), the number of unfinished dependencies of
+                 each validator and the validators waiting on each of them
+        """
+        indexes = {
+            id(validator): index for index, validator in enumerate(self.validators)
+        }
+        blockers = [0] * len(self.validators)
+        dependents = [[] for _ in self.validators]
+        for index, validator in enumerate(self.validators):
+            for dependency in getattr(validator, "dependencies", None) or []:
+                dependencyIndex = indexes.get(id(dependency))
+                if dependencyIndex is None:
+                    continue
+                blockers[index] += 1
+                dependents[dependencyIndex].append(index)
+        return blockers, dependents
+
+    def topological_order(self):
+        """
+        Return the validator indexes in an order that respects their dependencies,
+        preferring the list order between independent validators.
+        """
+        blockers, dependents = self.build_graph()
+        ready = [index for index, count in enumerate(blockers) if count == 0]
+        order = []
+        while ready:
+            index = heapq.heappop(ready)
+            order.append(index)
+            for dependent in dependents[index]:
+                blockers[dependent] -= 1
+                if blockers[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+        if len(order) != len(self.validators):
+            raise ValueError("Validator dependencies contain a cycle.")
+        return order
+
+    def execute_concurrently(self, results):
+        """
+        Run every validator as soon as its dependencies are finished. At most
+        exclusive_jobs validators that are not parallelSafe, such as azd up and
+        azd down, run at the same time.
+        This is a generator: it pauses once only background validators are left, so
+        their results can be collected later, and ends when every validator finished.
+        """
+        self.topological_order()  # Fail fast on cycles before starting anything
+        blockers, dependents = self.build_graph()
+        ready = deque(index for index, count in enumerate(blockers) if count == 0)
+        exclusive = []
+        exclusiveRunning = 0
+        running = {}
+        paused = False
+        with ThreadPoolExecutor(
+            max_workers=max(self.jobs, self.exclusive_jobs)
+        ) as executor:
+            while ready or exclusive or running:
+                while ready:
+                    index = ready.popleft()
+                    if getattr(self.validators[index], "parallelSafe", False):
+                        future = executor.submit(
+                            self.run_validator, self.validators[index]
+                        )
+                        running[future] = index
+                    else:
+                        heapq.heappush(exclusive, index)
+                while exclusive and exclusiveRunning < self.exclusive_jobs:
+                    index = heapq.heappop(exclusive)
+                    future = executor.submit(self.run_validator, self.validators[index])
+                    running[future] = index
+                    exclusiveRunning += 1
+
+                if not paused and all(
+                    self.is_background(self.validators[index])
+                    for index in list(running.values()) + exclusive
+                ):
+                    paused = True
+                    yield
+
+                if not running:
+                    # wait() returns at once on nothing, the loop would spin forever
+                    raise ValueError(
+                        f"No validator can start with jobs={self.jobs} and exclusive_jobs={self.exclusive_jobs}."
                     )
-                )
-            except Exception as e:
-                results.append((validator.catalog, validator.severity, False, str(e)))
-        return results
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=running.get):
+                    index = running.pop(future)
+                    results[index] = future.result()
+                    if not getattr(self.validators[index], "parallelSafe", False):
+                        exclusiveRunning -= 1
+                    for dependent in dependents[index]:
+                        blockers[dependent] -= 1
+                        if blockers[dependent] == 0:
+                            ready.append(dependent)
+
+    def run_validator(self, validator):
+        failed = next(
+            (
+                prerequisite
+                for prerequisite in getattr(validator, "prerequisites", None) or []
+                if not prerequisite.result
+            ),
+            None,
+        )
+        if failed is not None:
+            # Cheap checks already showed the run would fail, save the time it takes
+            logging.warning(f"Skipping {validator.title()}, {failed.title()} failed.")
+            return self.skipped_result(
+                validator,
+                f"{validator.title()} was not run",
+                f"{failed.title()} failed.",
+            )
+        if (
+            self.deadline is not None
+            and time.monotonic() >= self.deadline
+            and not getattr(validator, "parallelSafe", False)
+        ):
+            # Static validators are cheap and still run, commands are not started any more
+            logging.warning(f"Skipping {validator.catalog}, the deadline was reached.")
+            return self.skipped_result(
+                validator,
+                f"{validator.catalog} was not run",
+                "The validation deadline was reached before it started.",
+            )
+        # Output of validators running side by side is written in blocks, not mixed
+        concurrent = self.jobs > 1 or self.exclusive_jobs > 1
+        outputBuffer = OutputBuffer() if concurrent else None
+        validator.outputBuffer = outputBuffer
+        try:
+            validator.validate()
+            return (
+                validator.catalog,
+                validator.severity,
+                validator.result,
+                validator.resultMessage,
+            )
+        except Exception as e:
+            return (validator.catalog, validator.severity, False, str(e))
+        finally:
+            if outputBuffer is not None:
+                outputBuffer.flush(validator.title())
+
+    def skipped_result(self, validator, message, reason):
+        return (
+            validator.catalog,
+            validator.severity,
+            False,
+            ItemResultFormat.FAIL.format(
+                sign=Signs.BLOCK
+                if Severity.isBlocker(validator.severity)
+                else Signs.WARNING,
+                message=message,
+                detail_messages=ItemResultFormat.SUBITEM.format(
+                    sign=Signs.WARNING, message=reason
+                ),
+            ),
+        )
@@ -1,12 +1,27 @@
+import json
 import os
+import sys
+import time
 import argparse
 import logging
 from rule_parser import RuleParser
 from execution_engine import ExecutionEngine
 from result_aggregator import ResultAggregator
+import psrule_cache
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
 
 
 def main():
+    # The psrule-cache subcommand keeps the repo path of the validation positional
+    if sys.argv[1:2] == ["psrule-cache"]:
+        return psrule_cache.main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
         description="Validate the repo with the standards of https://azure.github.io/ai-apps/."
     )
@@ -37,16 +52,85 @@ def main():
     parser.add_argument(
         "--validate_playwright_test", action="store_true", help="Run Playwright tests."
     )
+    parser.add_argument(
+        "--exclude",
+        type=str,
+        help="A comma-separated list of folder globs to skip when scanning the repo, in addition to the defaults.",
+    )
+    parser.add_argument(
+        "--use_git_index",
+        action="store_true",
+        help="List the repo files with git ls-files instead of walking the filesystem. Falls back to walking when the repo path is not a git checkout.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="The number of static validators to run concurrently. Results keep the rule order. These validators run Python code, so more jobs rarely make them faster. azd and Playwright commands follow --azd_concurrency instead.",
+    )
+    parser.add_argument(
+        "--azd_concurrency",
+        type=positive_int,
+        default=1,
+        help="The number of template folders to deploy with azd at the same time. Each folder gets its own azd environment named AZURE_ENV_NAME-<n>, or <folder name>-<n> when AZURE_ENV_NAME is not set. With 1, the folders share the environment and each one is torn down before the next one is deployed.",
+    )
+    parser.add_argument(
+        "--azd_pipeline",
+        action="store_true",
+        help="Run azd package and azd provision at the same time, then azd deploy. Only for templates whose packaging does not need the provisioned resources.",
+    )
+    parser.add_argument(
+        "--deploy_cache_dir",
+        type=str,
+        help="The folder to remember passing deployments in. Template folders whose azure.yaml, infra, service and Playwright folders are unchanged since then skip azd up, the Playwright tests and azd down.",
+    )
+    parser.add_argument(
+        "--force_deploy",
+        action="store_true",
+        help="Deploy even when the deployment cache has a passing run for the same inputs.",
+    )
+    parser.add_argument(
+        "--background_teardown",
+        action="store_true",
+        help="Write the summary and exit without running azd down, which is marked as pending. Run again with --teardown to tear down and update the output file. Without --output, azd down runs once the summary is built.",
+    )
+    parser.add_argument(
+        "--teardown",
+        action="store_true",
+        help="Run the azd down deferred by an earlier run with --background_teardown and the same arguments, and update its output file.",
+    )
+    parser.add_argument(
+        "--log_dir",
+        type=str,
+        help="The folder to write the full azd and Playwright output to. A temp folder by default.",
+    )
+    parser.add_argument(
+        "--retry_budget",
+        type=int,
+        default=4,
+        help="The total number of times azd commands may be retried in this run after a transient failure.",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=int,
+        help="The number of seconds the whole validation may take. Running commands are stopped and commands not started yet are reported as failed when it is reached, so the summary is still written.",
+    )
+    parser.add_argument(
+        "--mi_prescan",
+        action="store_true",
+        help="Check the managed identity baseline rules in process against the Bicep files and ARM templates of the repo, instead of reading the PSRule result.",
+    )
     parser.add_argument("--output", type=str, help="The output file path.")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging.")
 
     args = parser.parse_args()
+    deadline = time.monotonic() + args.deadline if args.deadline else None
 
     log_level = logging.DEBUG if args.debug else logging.INFO
     logging.basicConfig(format="%(message)s", level=log_level)
 
     logging.debug(
-        f"Repo path: {args.repo_path} validate_paths: {args.validate_paths} validate_azd: {args.validate_azd} debug: {args.debug} topics: {args.topics} expected_topics: {args.expected_topics} validate_playwright_test: {args.validate_playwright_test} psrule: {args.psrule_result} output: {args.output}"
+        f"Repo path: {args.repo_path} validate_paths: {args.validate_paths} validate_azd: {args.validate_azd} debug: {args.debug} topics: {args.topics} expected_topics: {args.expected_topics} validate_playwright_test: {args.validate_playwright_test} exclude: {args.exclude} use_git_index: {args.use_git_index} jobs: {args.jobs} azd_concurrency: {args.azd_concurrency} azd_pipeline: {args.azd_pipeline} deploy_cache_dir: {args.deploy_cache_dir} force_deploy: {args.force_deploy} background_teardown: {args.background_teardown} teardown: {args.teardown} log_dir: {args.log_dir} retry_budget: {args.retry_budget} deadline: {args.deadline} psrule: {args.psrule_result} mi_prescan: {args.mi_prescan} output: {args.output}"
     )
 
     # Parse rules and generate validators
@@ -54,10 +138,74 @@ def main():
     parser = RuleParser(rules_file_path, args)
     validators = parser.parse()
 
+    deferred = [
+        index
+        for index, validator in enumerate(validators)
+        if getattr(validator, "background", False) is True
+    ]
+    if args.output and deferred and (args.background_teardown or args.teardown):
+        run_deferred(validators, deferred, parser.repo_index, args, deadline)
+        return
+
     # Execute validators
-    engine = ExecutionEngine(validators)
+    engine = ExecutionEngine(
+        validators, parser.repo_index, args.jobs, args.azd_concurrency, deadline
+    )
     results = engine.execute()
+    write_summary(results, args.output)
+
+    if args.background_teardown and engine.has_background():
+        logging.info("Summary written, waiting for the teardown to finish.")
+        write_summary(engine.wait_background(), args.output)
+
+
+def run_deferred(validators, deferred, repo_index, args, deadline):
+    """
+    Run the validators in two processes: the first runs everything but the teardown
+    and writes the summary with the teardown pending, so the workflow reports it while
+    resources are still being deleted. The second, with --teardown, runs the teardown.
+    The results of the first run are kept next to the output file in between.
+    """
+    statePath = f"{args.output}.json"
+    if not args.teardown:
+        selected = [index for index in range(len(validators)) if index not in deferred]
+    else:
+        with open(statePath, "r") as file:
+            results = [tuple(result) for result in json.load(file)]
+        if len(results) != len(validators):
+            raise ValueError(
+                f"{statePath} does not match the validators of this run, run the validation again."
+            )
+        # Prerequisites, such as the pre-flight checks, keep their earlier outcome
+        for index, validator in enumerate(validators):
+            if index not in deferred:
+                validator.result = results[index][2]
+        selected = deferred
+
+    engine = ExecutionEngine(
+        [validators[index] for index in selected],
+        repo_index,
+        args.jobs,
+        args.azd_concurrency,
+        deadline,
+    )
+    selectedResults = engine.execute()
+    if engine.has_background():
+        selectedResults = engine.wait_background()
+
+    if not args.teardown:
+        results = [engine.pending_result(validator) for validator in validators]
+    for index, result in zip(selected, selectedResults):
+        results[index] = result
+    write_summary(results, args.output)
+    with open(f"{statePath}.tmp", "w") as file:
+        json.dump(results, file)
+    os.replace(f"{statePath}.tmp", statePath)
+    if not args.teardown:
+        logging.info("Summary written, run with --teardown to run azd down.")
+
 
+def write_summary(results, output):
     # Aggregate results
     aggregator = ResultAggregator()
     for result in results:
@@ -65,11 +213,12 @@ def main():
 
     summary = aggregator.generate_summary()
 
-    # Output the summary
-    if args.output:
-        with open(args.output, "w") as output_file:
+    # Output the summary, replaced at once as it may be rewritten after the teardown
+    if output:
+        with open(f"{output}.tmp", "w") as output_file:
             output_file.write(summary)
+        os.replace(f"{output}.tmp", output)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
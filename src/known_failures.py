@@ -0,0 +1,157 @@
+import json
+import os
+import re
+from collections import namedtuple
+from constants import ItemResultFormat, Signs, azd_help_link, line_delimiter
+from utils import indent
+
+KNOWN_FAILURES_PATH = os.path.join(os.path.dirname(__file__), "known_failures.json")
+
+# A recurring failure of azd or Playwright. pattern is a single-line regex without
+# named groups, retryable tells whether running the command again can help.
+KnownFailure = namedtuple(
+    "KnownFailure", ["id", "pattern", "reason", "solution", "link", "retryable"]
+)
+
+
+def load_known_failures(path=KNOWN_FAILURES_PATH):
+    with open(path, "r", encoding="utf-8") as file:
+        entries = json.load(file)
+    return [
+        KnownFailure(
+            entry["id"],
+            entry["pattern"],
+            entry["reason"],
+            entry.get("solution", ""),
+            entry.get("link", azd_help_link),
+            entry.get("retryable", False),
+        )
+        for entry in entries
+    ]
+
+
+class FailureClassifier:
+    """
+    Matches all failure patterns at once with a single compiled alternation.
+    :param failures: objects with pattern, retryable and reason, such as KnownFailure
+    """
+
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self._patterns = [re.compile(failure.pattern) for failure in self.failures]
+        # Plain alternatives let re skip ahead to the first characters of the patterns,
+        # named groups to tell them apart would make the scan an order of magnitude slower
+        self._pattern = (
+            re.compile("|".join(f"(?:{failure.pattern})" for failure in self.failures))
+            if self.failures
+            else None
+        )
+
+    def find(self, text):
+        """
+        :return: dict of failure index to the first text that matched it, in order of
+                 appearance. A match hides other patterns starting inside it.
+        """
+        found = {}
+        if self._pattern is None:
+            return found
+        for match in self._pattern.finditer(text):
+            # The alternation picked the first pattern that matches at this position
+            index = next(
+                index
+                for index, pattern in enumerate(self._patterns)
+                if pattern.match(text, match.start())
+            )
+            if index not in found:
+                found[index] = match.group(0)
+                if len(found) == len(self.failures):
+                    break
+        return found
+
+    def classify(self, text):
+        """
+        Decide whether a failure with this output is worth retrying. A failure that is
+        known not to be transient wins over transient ones, then the pattern order.
+        :return: (retryable, reason), (False, None) when no pattern matches
+        """
+        found = self.find(text)
+        if not found:
+            return False, None
+        index = min(found, key=lambda index: (self.failures[index].retryable, index))
+        return self.failures[index].retryable, self.failures[index].reason
+
+    def matcher(self):
+        return FailureMatcher(self)
+
+
+class FailureMatcher:
+    """
+    Collects the known failures of streamed output so the whole output is scanned once,
+    even when only its end is kept in memory. Lines are scanned in batches of whole lines,
+    patterns never span lines.
+    :param batchSize: number of characters buffered before they are scanned
+    """
+
+    def __init__(self, classifier, batchSize=64 * 1024):
+        self.classifier = classifier
+        self.batchSize = batchSize
+        self.found = {}
+        self._buffer = []
+        self._buffered = 0
+
+    def feed(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        # Batches end at a line break, unless a single line keeps growing
+        if self._buffered >= self.batchSize and (
+            text.endswith("\n") or self._buffered >= 16 * self.batchSize
+        ):
+            self._scan()
+
+    def _scan(self):
+        if self._buffer and len(self.found) < len(self.classifier.failures):
+            for index, text in self.classifier.find("".join(self._buffer)).items():
+                self.found.setdefault(index, text)
+        self._buffer = []
+        self._buffered = 0
+
+    def results(self):
+        """:return: list of (KnownFailure, matched text) in order of appearance"""
+        self._scan()
+        return [
+            (self.classifier.failures[index], text)
+            for index, text in self.found.items()
+        ]
+
+
+_default_classifier = None
+
+
+def default_classifier():
+    """Return the classifier of known_failures.json, loaded once."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = FailureClassifier(load_known_failures())
+    return _default_classifier
+
+
+def format_known_failures(results):
+    """
+    Describe the known failures found in the output of a command, quoting the matched
+    text so the message classifies the same way as the output it came from.
+    """
+    return line_delimiter.join(
+        ItemResultFormat.SUBITEM.format(
+            sign=Signs.WARNING,
+            message=f"Known issue, {failure.reason}: `{text.strip()}`. {failure.solution} <a href={failure.link}>[Details]</a>",
+        )
+        for failure, text in results
+    )
+
+
+def failure_details(results, output):
+    """Return the known failures followed by the end of the command output."""
+    details = ItemResultFormat.DETAILS.format(message=indent(output.replace("\\", "")))
+    if not results:
+        return details
+    return format_known_failures(results) + line_delimiter + details
@@ -1,12 +1,91 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from azure.identity import AzureDeveloperCliCredential
 from azure.mgmt.resource import ResourceManagementClient
 from azure.mgmt.cognitiveservices import CognitiveServicesManagementClient
 
+# A new token is fetched this many seconds before the cached one expires
+TOKEN_REFRESH_MARGIN = 300
+# Cognitive Services accounts whose deployments are listed at the same time
+MAX_WORKERS = 8
 
-def list_resources(resource_group, subscription_id):
-    credential = AzureDeveloperCliCredential()
-    resource_client = ResourceManagementClient(credential, subscription_id)
+
+class CachedCredential:
+    """
+    Hands out the tokens of another credential until shortly before they expire, so
+    AzureDeveloperCliCredential runs azd auth token once per scope instead of per request.
+    """
+
+    def __init__(self, credential):
+        self.credential = credential
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def get_token(self, *scopes, claims=None, tenant_id=None, **kwargs):
+        key = (scopes, claims, tenant_id)
+        # Held while fetching, so concurrent callers wait for one azd auth token
+        with self.lock:
+            token = self.tokens.get(key)
+            if token is None or token.expires_on - TOKEN_REFRESH_MARGIN <= time.time():
+                token = self.credential.get_token(
+                    *scopes, claims=claims, tenant_id=tenant_id, **kwargs
+                )
+                self.tokens[key] = token
+            return token
+
+
+class ClientPool:
+    """
+    Management clients shared by all the resource listings of the run, one per client
+    type and subscription, all using one cached credential.
+    :param credential: the credential of the clients, an AzureDeveloperCliCredential by default
+    :param clientOptions: extra arguments for the clients, such as base_url
+    """
+
+    def __init__(self, credential=None, **clientOptions):
+        self.credential = credential
+        self.clientOptions = clientOptions
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def get(self, clientType, subscription_id):
+        with self.lock:
+            if self.credential is None:
+                self.credential = CachedCredential(AzureDeveloperCliCredential())
+            client = self.clients.get((clientType, subscription_id))
+            if client is None:
+                client = clientType(
+                    self.credential, subscription_id, **self.clientOptions
+                )
+                self.clients[(clientType, subscription_id)] = client
+            return client
+
+    def close(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+
+_pool = ClientPool()
+
+
+def list_deployments(cognitive_client, resource_group, account_name):
+    deployments = cognitive_client.deployments.list(
+        resource_group_name=resource_group, account_name=account_name
+    )
+    return [
+        f"{deployment.properties.model.format}.{deployment.sku.name}."
+        f"{deployment.properties.model.name}:{deployment.properties.model.version}"
+        for deployment in deployments
+    ]
+
+
+def list_resources(resource_group, subscription_id, pool=None, max_workers=MAX_WORKERS):
+    pool = pool or _pool
+    resource_client = pool.get(ResourceManagementClient, subscription_id)
     resources = resource_client.resources.list_by_resource_group(resource_group)
 
     # Output the list of all resource types
@@ -22,27 +101,24 @@ def list_resources(resource_group, subscription_id):
 
     ai_deployments = []
     if ai_accounts:
-        for ai_account in ai_accounts:
-            cognitive_client = CognitiveServicesManagementClient(
-                credential, subscription_id
-            )
-            deployments = cognitive_client.deployments.list(
-                resource_group_name=resource_group, account_name=ai_account
-            )
-
-            logging.info(
-                f"List of all deployments for the cognitive services account {ai_account}:"
+        cognitive_client = pool.get(CognitiveServicesManagementClient, subscription_id)
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(ai_accounts))
+        ) as executor:
+            # map keeps the order of the accounts, whichever answers first
+            account_deployments = executor.map(
+                lambda account: list_deployments(
+                    cognitive_client, resource_group, account
+                ),
+                ai_accounts,
             )
-            for deployment in deployments:
-                model_format = deployment.properties.model.format
-                sku_name = deployment.sku.name
-                model_name = deployment.properties.model.name
-                model_version = deployment.properties.model.version
-                ai_deployment = (
-                    f"{model_format}.{sku_name}.{model_name}:{model_version}"
+            for ai_account, deployments in zip(ai_accounts, account_deployments):
+                logging.info(
+                    f"List of all deployments for the cognitive services account {ai_account}:"
                 )
-                logging.info(ai_deployment)
-                ai_deployments.append(ai_deployment)
+                for ai_deployment in deployments:
+                    logging.info(ai_deployment)
+                ai_deployments.extend(deployments)
     else:
         logging.debug("No Cognitive Services account found.")
     return resource_types, ai_deployments
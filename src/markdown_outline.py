@@ -0,0 +1,105 @@
+import re
+from collections import namedtuple
+
+Heading = namedtuple("Heading", ["level", "text", "line"])
+
+atx_heading_pattern = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+setext_underline_pattern = re.compile(r"^ {0,3}(=+|-+)[ \t]*$")
+fence_pattern = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+
+def normalize_heading(text):
+    return " ".join(text.split())
+
+
+def parse_outline(lines):
+    """
+    Parse the ATX (# Title) and setext (Title/=====) headings of a Markdown document.
+    Headings inside fenced code blocks are ignored.
+    :param lines: iterable of lines
+    :return: list of Heading(level, text, line) with 1-based line numbers
+    """
+    headings = []
+    fence = None
+    paragraph = None
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        fence_match = fence_pattern.match(line)
+        if fence is not None:
+            if (
+                fence_match
+                and fence_match.group(1)[0] == fence[0]
+                and len(fence_match.group(1)) >= len(fence)
+                and line.strip() == fence_match.group(1)
+            ):
+                fence = None
+            continue
+        if fence_match:
+            fence = fence_match.group(1)
+            paragraph = None
+            continue
+
+        atx_match = atx_heading_pattern.match(line)
+        if atx_match:
+            headings.append(
+                Heading(
+                    len(atx_match.group(1)),
+                    normalize_heading(atx_match.group(2) or ""),
+                    number,
+                )
+            )
+            paragraph = None
+            continue
+
+        setext_match = setext_underline_pattern.match(line)
+        if setext_match and paragraph is not None:
+            level = 1 if setext_match.group(1)[0] == "=" else 2
+            headings.append(Heading(level, paragraph[0], paragraph[1]))
+            paragraph = None
+            continue
+
+        if line.strip() and not line.startswith("    "):
+            # Only the line right before the underline becomes a setext heading
+            paragraph = (normalize_heading(line), number)
+        else:
+            paragraph = None
+    return headings
+
+
+def read_outline(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        return parse_outline(file)
+
+
+def parse_heading_tag(tag):
+    """
+    Split an assert_in tag such as "## Features" into its level and text.
+    A tag without leading "#" matches a heading of any level.
+    :return: (level or None, normalized text)
+    """
+    match = atx_heading_pattern.match(tag.strip())
+    if match:
+        return len(match.group(1)), normalize_heading(match.group(2) or "")
+    return None, normalize_heading(tag)
+
+
+def find_missing_headings(outline, tags, caseSensitive=False):
+    """
+    Return the tags that are not exactly a heading of the outline, in their original order.
+    """
+
+    def key(text):
+        return text if caseSensitive else text.lower()
+
+    leveled = {(heading.level, key(heading.text)) for heading in outline}
+    anyLevel = {key(heading.text) for heading in outline}
+    missing = []
+    for tag in tags:
+        level, text = parse_heading_tag(tag)
+        if level is None:
+            found = key(text) in anyLevel
+        else:
+            found = (level, key(text)) in leveled
+        if not found:
+            missing.append(tag)
+    return missing
@@ -0,0 +1,640 @@
+"""
+Checks the rules of the TemplateValidation.MI_2024_10 PSRule baseline in process, against
+the resource declarations of Bicep files and ARM templates, and reports the results as
+the records PSRule writes to psrule-output.json.
+
+Values only known at deployment, such as parameters without a default, pass: PSRule
+expands them, the pre-scan does not, and the full PSRule run stays authoritative.
+
+Usage: python src/mi_prescan.py PATH [--output psrule-output.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+from collections import namedtuple
+import yaml
+from bicep_params import (
+    CLOSING,
+    OPENING,
+    literal,
+    matching_bracket,
+    read_index,
+    tokenize,
+)
+from repo_index import DEFAULT_EXCLUDE, is_excluded
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(__file__), "..", ".ps-rule", "templateCustom.Rule.yaml"
+)
+RULE_LINK = "https://azure.github.io/PSRule.Rules.Azure/en/rules/{name}/"
+# The ref of pre-scan records, in place of the AZR id PSRule reports
+PRESCAN_REF = "pre-scan"
+
+identifier_pattern = re.compile(r"[A-Za-z_]\w*")
+number_pattern = re.compile(r"-?\d+")
+arm_parameter_pattern = re.compile(r"^\[parameters\('(\w+)'\)\]$", re.IGNORECASE)
+list_function_pattern = re.compile(r"\blist\w*\(", re.IGNORECASE)
+# The tokens that end a value in an object, an array or a declaration
+VALUE_END = ("\n", ",", "}", "]")
+
+
+class Expression(str):
+    """A Bicep or ARM expression, whose value is only known at deployment."""
+
+
+class Reference(Expression):
+    """An expression that is just a parameter, by name."""
+
+    def __new__(cls, text, name):
+        value = super().__new__(cls, text)
+        value.name = name
+        return value
+
+
+# A parameter of a template: its default (None when it has none) and whether it is secure
+Parameter = namedtuple("Parameter", ["default", "secure"])
+# A resource declaration: its full type, its body as a dict, and a name for the report
+Resource = namedtuple("Resource", ["type", "body", "target"])
+Output = namedtuple("Output", ["name", "value", "secure"])
+
+
+class Template:
+    """The parameters, resources and outputs of one Bicep file or ARM template."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parameters = {}
+        self.resources = []
+        self.outputs = []
+
+    def resolve(self, value):
+        """Replace a reference to a parameter with its default, when it has a plain one."""
+        if isinstance(value, Reference):
+            parameter = self.parameters.get(value.name)
+            if (
+                parameter is not None
+                and parameter.default is not None
+                and not isinstance(parameter.default, Expression)
+            ):
+                return parameter.default
+        return value
+
+    def lookup(self, body, path):
+        """Return the resolved value at the dotted path of body, or None."""
+        value = body
+        for key in path.split("."):
+            value = self.resolve(value)
+            if not isinstance(value, dict):
+                return value if isinstance(value, Expression) else None
+            value = value.get(key)
+        return self.resolve(value)
+
+
+class DeclarationReader:
+    """
+    Reads the values of the declarations ParameterIndex tokenized. Object and array
+    literals become dicts and lists, other expressions stay Expression text.
+    :param text: the source the tokens point into
+    """
+
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens
+        self.pos = 0
+
+    def resource(self, template, parentType):
+        symbol = self.next_text()
+        token = self.peek()
+        if token is None or token.kind not in ("string", "multiline"):
+            self.scan(("\n",))
+            return
+        self.pos += 1
+        type = literal(token.text).split("@")[0]
+        if parentType is not None and "/" not in type:
+            type = f"{parentType}/{type}"
+        header = self.scan(("=", "\n"))
+        if self.next_text() != "=":
+            return
+        self.skip_condition()
+        body = self.value(template, type)
+        # Existing resources are only referenced, the template does not configure them
+        if "existing" in header.split() or not isinstance(body, dict):
+            return
+        name = template.resolve(body.get("name"))
+        target = (
+            name
+            if isinstance(name, str) and not isinstance(name, Expression)
+            else symbol
+        )
+        template.resources.append(Resource(type, body, f"{target} ({template.path})"))
+
+    def output(self, template, secure):
+        name = self.next_text()
+        self.scan(("=",))
+        if self.next_text() == "=":
+            template.outputs.append(Output(name, self.value(), secure))
+
+    def value(self, template=None, resourceType=None):
+        start = self.pos
+        token = self.peek()
+        if token is None:
+            return None
+        if token.text == "{":
+            value = self.object(template, resourceType)
+        elif token.text == "[" and self.text_at(1) == "for":
+            # A loop, its body stands for every item
+            self.pos += 1
+            self.scan((":",))
+            self.pos += 1
+            self.skip_condition()
+            value = self.value(template, resourceType)
+            self.scan(("]",))
+            self.pos += 1
+            return value
+        elif token.text == "[":
+            value = self.array()
+        elif token.kind == "string" and "${" in token.text:
+            self.pos += 1
+            value = Expression(token.text)
+        elif token.kind in ("string", "multiline"):
+            self.pos += 1
+            value = literal(token.text)
+        else:
+            return self.scalar(self.scan(VALUE_END))
+        # Anything after the literal, such as an operator, makes it an expression
+        if self.pos < len(self.tokens) and self.text_at() not in VALUE_END:
+            self.pos = start
+            return Expression(self.scan(VALUE_END))
+        return value
+
+    def skip_condition(self):
+        """Skip the if (...) of a conditional resource or a filtered loop."""
+        if self.text_at() == "if" and self.text_at(1) == "(":
+            self.pos = matching_bracket(self.tokens, self.pos + 1) + 1
+
+    def scalar(self, text):
+        if text == "true":
+            return True
+        if text == "false":
+            return False
+        if text == "null":
+            return None
+        if number_pattern.fullmatch(text):
+            return int(text)
+        if identifier_pattern.fullmatch(text):
+            return Reference(text, text)
+        return Expression(text)
+
+    def object(self, template, resourceType):
+        self.pos += 1
+        value = {}
+        while self.pos < len(self.tokens):
+            start = self.pos
+            token = self.peek()
+            if token.text in ("\n", ","):
+                self.pos += 1
+            elif token.text == "}":
+                self.pos += 1
+                return value
+            elif token.text == "@" or token.kind not in ("string", "multiline", "word"):
+                self.scan(("\n", ","))
+            else:
+                self.pos += 1
+                key = token.text if token.kind == "word" else literal(token.text)
+                if key == "resource" and self.text_at() != ":" and template is not None:
+                    self.resource(template, resourceType)
+                elif self.text_at() != ":":
+                    self.scan(("\n", ","))
+                else:
+                    self.pos += 1
+                    value[key] = self.value(template)
+            if self.pos == start:
+                # Never stop on something unexpected, such as a stray bracket
+                self.pos += 1
+        return value
+
+    def array(self):
+        self.pos += 1
+        value = []
+        while self.pos < len(self.tokens):
+            start = self.pos
+            text = self.text_at()
+            if text in ("\n", ","):
+                self.pos += 1
+            elif text == "]":
+                self.pos += 1
+                return value
+            else:
+                value.append(self.value())
+            if self.pos == start:
+                self.pos += 1
+        return value
+
+    def scan(self, stops):
+        """Skip to the next stop token outside brackets, return the source text skipped."""
+        start = self.pos
+        depth = 0
+        while self.pos < len(self.tokens):
+            text = self.tokens[self.pos].text
+            if depth == 0 and text in stops:
+                break
+            if text in OPENING:
+                depth += 1
+            elif text in CLOSING:
+                if depth == 0:
+                    break
+                depth -= 1
+            self.pos += 1
+        if self.pos == start:
+            return ""
+        return self.text[self.tokens[start].start : self.tokens[self.pos - 1].end]
+
+    def peek(self, offset=0):
+        position = self.pos + offset
+        return self.tokens[position] if position < len(self.tokens) else None
+
+    def text_at(self, offset=0):
+        token = self.peek(offset)
+        return "" if token is None else token.text
+
+    def next_text(self):
+        """Return the text of the current token and move past it."""
+        text = self.text_at()
+        self.pos += 1
+        return text
+
+
+def read_bicep(path, relativePath):
+    index = read_index(path)
+    template = Template(relativePath)
+    for parameter in index.parameters.values():
+        default = parameter.default
+        if default is not None:
+            default = DeclarationReader(default, list(tokenize(default))).value()
+        template.parameters[parameter.name] = Parameter(
+            default, "secure" in parameter.decorators
+        )
+    for declaration in index.declarations:
+        reader = DeclarationReader(index.text, declaration.tokens)
+        if declaration.keyword == "resource":
+            reader.resource(template, None)
+        else:
+            reader.output(template, "secure" in declaration.decorators)
+    return template
+
+
+def arm_value(value):
+    """Turn the expressions of ARM JSON values into Expression, recursively."""
+    if isinstance(value, str) and value.startswith("[") and not value.startswith("[["):
+        match = arm_parameter_pattern.match(value)
+        return Reference(value, match.group(1)) if match else Expression(value)
+    if isinstance(value, dict):
+        return {key: arm_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [arm_value(item) for item in value]
+    return value
+
+
+def read_arm(content, relativePath):
+    """Return the templates of an ARM template, its nested deployments included."""
+    template = Template(relativePath)
+    for name, parameter in (content.get("parameters") or {}).items():
+        template.parameters[name] = Parameter(
+            arm_value(parameter.get("defaultValue")),
+            str(parameter.get("type", "")).lower() in ("securestring", "secureobject"),
+        )
+    for name, output in (content.get("outputs") or {}).items():
+        template.outputs.append(
+            Output(
+                name,
+                arm_value(output.get("value")),
+                str(output.get("type", "")).lower() in ("securestring", "secureobject"),
+            )
+        )
+
+    templates = [template]
+    pending = [(resource, None) for resource in arm_resources(content)]
+    while pending:
+        resource, parentType = pending.pop(0)
+        if not isinstance(resource, dict) or resource.get("existing"):
+            continue
+        type = resource.get("type", "")
+        if parentType is not None and "/" not in type:
+            type = f"{parentType}/{type}"
+        body = arm_value(resource)
+        name = body.get("name")
+        template.resources.append(
+            Resource(
+                type,
+                body,
+                f"{name if not isinstance(name, Expression) else type} ({relativePath})",
+            )
+        )
+        pending += [(child, type) for child in arm_resources(resource)]
+        nested = (resource.get("properties") or {}).get("template")
+        if type.lower() == "microsoft.resources/deployments" and isinstance(
+            nested, dict
+        ):
+            templates += read_arm(nested, relativePath)
+    return templates
+
+
+def arm_resources(content):
+    resources = content.get("resources") or []
+    # Templates with symbolic names keep their resources in an object
+    return list(resources.values()) if isinstance(resources, dict) else resources
+
+
+def find_templates(path, exclude=DEFAULT_EXCLUDE):
+    """
+    Return the templates of the Bicep files and ARM templates under path. ARM templates
+    compiled from a Bicep file next to them are skipped, the Bicep file covers them.
+    """
+    templates = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(folder for folder in dirs if not is_excluded(folder, exclude))
+        for name in sorted(names):
+            filePath = os.path.join(root, name)
+            relativePath = os.path.relpath(filePath, path).replace(os.sep, "/")
+            try:
+                if name.endswith(".bicep"):
+                    templates.append(read_bicep(filePath, relativePath))
+                elif name.endswith(".json"):
+                    templates += arm_templates(filePath, relativePath)
+            except (OSError, UnicodeDecodeError) as e:
+                logging.warning(f"Skipping {relativePath} in the pre-scan: {e}")
+    return templates
+
+
+def arm_templates(path, relativePath):
+    try:
+        with open(path, "r", encoding="utf-8-sig") as file:
+            content = json.load(file)
+    except ValueError:
+        return []
+    if not isinstance(content, dict) or "deploymentTemplate" not in str(
+        content.get("$schema", "")
+    ):
+        return []
+    generator = (content.get("metadata") or {}).get("_generator") or {}
+    if generator.get("name") == "bicep" and os.path.isfile(
+        os.path.splitext(path)[0] + ".bicep"
+    ):
+        return []
+    return read_arm(content, relativePath)
+
+
+def has_managed_identity(template, resource):
+    identity = template.lookup(resource.body, "identity")
+    if isinstance(identity, Expression):
+        return True
+    kind = template.lookup(resource.body, "identity.type")
+    if isinstance(kind, Expression):
+        return True
+    return isinstance(kind, str) and (
+        "systemassigned" in kind.lower() or "userassigned" in kind.lower()
+    )
+
+
+def local_auth_disabled(template, resource):
+    value = template.lookup(resource.body, "properties.disableLocalAuth")
+    return value is True or isinstance(value, Expression)
+
+
+def aad_only(template, resource):
+    value = template.lookup(
+        resource.body, "properties.administrators.azureADOnlyAuthentication"
+    )
+    if value is True or isinstance(value, Expression):
+        return True
+    # Also set by a child resource of the managed instance
+    return any(
+        child.type.lower()
+        == "microsoft.sql/managedinstances/azureadonlyauthentications"
+        and template.lookup(child.body, "properties.azureADOnlyAuthentication") is True
+        for child in template.resources
+    )
+
+
+# Properties that carry a secret, by resource type
+SECURE_PROPERTIES = {
+    "microsoft.keyvault/vaults/secrets": ["properties.value"],
+    "microsoft.compute/virtualmachines": ["properties.osProfile.adminPassword"],
+    "microsoft.compute/virtualmachinescalesets": [
+        "properties.virtualMachineProfile.osProfile.adminPassword"
+    ],
+    "microsoft.containerservice/managedclusters": [
+        "properties.windowsProfile.adminPassword"
+    ],
+    "microsoft.sql/servers": ["properties.administratorLoginPassword"],
+    "microsoft.sql/managedinstances": ["properties.administratorLoginPassword"],
+    "microsoft.dbforpostgresql/flexibleservers": [
+        "properties.administratorLoginPassword"
+    ],
+    "microsoft.dbformysql/flexibleservers": ["properties.administratorLoginPassword"],
+}
+
+
+def secure_values(template, resource):
+    for path in SECURE_PROPERTIES.get(resource.type.lower(), []):
+        value = resource.body
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, Reference):
+            parameter = template.parameters.get(value.name)
+            if parameter is not None and not parameter.secure:
+                return False
+        elif isinstance(value, str) and not isinstance(value, Expression) and value:
+            return False
+    return True
+
+
+def secret_output(template, output):
+    value = output.value
+    if output.secure or not isinstance(value, Expression):
+        return False
+    if isinstance(value, Reference):
+        parameter = template.parameters.get(value.name)
+        return parameter is not None and parameter.secure
+    return bool(list_function_pattern.search(value))
+
+
+# A rule of the baseline: the resource types it applies to, lower case, and its check
+Rule = namedtuple("Rule", ["types", "check", "recommendation"])
+
+RULES = {
+    "Azure.AI.ManagedIdentity": Rule(
+        {"microsoft.cognitiveservices/accounts"},
+        has_managed_identity,
+        "Configure managed identities to access Azure resources.",
+    ),
+    "Azure.AI.DisableLocalAuth": Rule(
+        {"microsoft.cognitiveservices/accounts"},
+        local_auth_disabled,
+        "Consider only using Entra ID identities to access Azure AI services.",
+    ),
+    "Azure.Cosmos.DisableLocalAuth": Rule(
+        {"microsoft.documentdb/databaseaccounts"},
+        local_auth_disabled,
+        "Consider only using Entra ID identities to access Cosmos DB data.",
+    ),
+    "Azure.AKS.ManagedIdentity": Rule(
+        {"microsoft.containerservice/managedclusters"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each AKS cluster.",
+    ),
+    "Azure.APIM.ManagedIdentity": Rule(
+        {"microsoft.apimanagement/service"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each API Management instance.",
+    ),
+    "Azure.AppService.ManagedIdentity": Rule(
+        {"microsoft.web/sites", "microsoft.web/sites/slots"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each App Service app.",
+    ),
+    "Azure.ContainerApp.ManagedIdentity": Rule(
+        {"microsoft.app/containerapps"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each container app.",
+    ),
+    "Azure.Deployment.SecureValue": Rule(
+        set(SECURE_PROPERTIES),
+        secure_values,
+        "Use secure parameters for properties that contain sensitive values.",
+    ),
+    "Azure.EventGrid.ManagedIdentity": Rule(
+        {"microsoft.eventgrid/topics", "microsoft.eventgrid/domains"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each Event Grid topic.",
+    ),
+    "Azure.EventGrid.DisableLocalAuth": Rule(
+        {
+            "microsoft.eventgrid/topics",
+            "microsoft.eventgrid/domains",
+            "microsoft.eventgrid/namespaces",
+        },
+        local_auth_disabled,
+        "Consider only using Entra ID identities to publish events to Event Grid.",
+    ),
+    "Azure.Search.ManagedIdentity": Rule(
+        {"microsoft.search/searchservices"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each AI Search service.",
+    ),
+    "Azure.SignalR.ManagedIdentity": Rule(
+        {"microsoft.signalrservice/signalr"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each SignalR Service.",
+    ),
+    "Azure.SQLMI.ManagedIdentity": Rule(
+        {"microsoft.sql/managedinstances"},
+        has_managed_identity,
+        "Consider configuring a managed identity for each SQL Managed Instance.",
+    ),
+    "Azure.SQLMI.AADOnly": Rule(
+        {"microsoft.sql/managedinstances"},
+        aad_only,
+        "Consider using Entra ID only authentication for SQL Managed Instance.",
+    ),
+}
+OUTPUT_RULE = "Azure.Deployment.OutputSecretValue"
+OUTPUT_RECOMMENDATION = (
+    "Consider removing the output, or marking it @secure(), as outputs are logged."
+)
+
+
+def load_baseline(path=BASELINE_PATH):
+    """
+    Return the names of the rules the PSRule baseline includes, or every rule the
+    pre-scan checks when the baseline file is not there, such as in a copy of src only.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            baseline = yaml.safe_load(file)
+    except FileNotFoundError:
+        logging.warning(
+            f"The PSRule baseline {path} is not found, checking every pre-scan rule."
+        )
+        return list(RULES) + [OUTPUT_RULE]
+    return baseline["spec"]["rule"]["include"]
+
+
+def record(ruleName, recommendation, passed, targetName, targetType):
+    return {
+        "ruleName": ruleName,
+        "ref": PRESCAN_REF,
+        "outcome": "Pass" if passed else "Fail",
+        "targetName": targetName,
+        "targetType": targetType,
+        "info": {
+            "recommendation": recommendation,
+            "annotations": {"online version": RULE_LINK.format(name=ruleName)},
+        },
+    }
+
+
+def prescan(path, baselinePath=BASELINE_PATH):
+    """
+    Check the rules of the baseline against the templates under path.
+    :return: list of records shaped like the entries of psrule-output.json
+    """
+    included = load_baseline(baselinePath)
+    unsupported = [
+        name for name in included if name not in RULES and name != OUTPUT_RULE
+    ]
+    if unsupported:
+        logging.warning(
+            f"The pre-scan does not check {', '.join(unsupported)}, run PSRule for them."
+        )
+    rules = [(name, RULES[name]) for name in included if name in RULES]
+
+    records = []
+    for template in find_templates(path):
+        for resource in template.resources:
+            for name, rule in rules:
+                if resource.type.lower() in rule.types:
+                    records.append(
+                        record(
+                            name,
+                            rule.recommendation,
+                            rule.check(template, resource),
+                            resource.target,
+                            resource.type,
+                        )
+                    )
+        if OUTPUT_RULE in included:
+            for output in template.outputs:
+                records.append(
+                    record(
+                        OUTPUT_RULE,
+                        OUTPUT_RECOMMENDATION,
+                        not secret_output(template, output),
+                        f"{output.name} ({template.path})",
+                        "Microsoft.Resources/deployments",
+                    )
+                )
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "path", help="The folder with the Bicep files and ARM templates."
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--output", default="psrule-output.json")
+    args = parser.parse_args()
+
+    records = prescan(args.path, args.baseline)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(records, file, indent=2)
+    failures = sum(item["outcome"] == "Fail" for item in records)
+    print(f"{len(records)} results, {failures} failed, written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Reuses the PSRule output of an earlier run while the infrastructure files, the baseline
+and the versions of the PSRule modules are unchanged.
+
+Usage:
+  python src/psrule_cache.py lookup REPO --cache_dir DIR --module_versions V [--output psrule-output.json]
+  python src/psrule_cache.py store REPO --cache_dir DIR --module_versions V [--result psrule-output.json]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import time
+from repo_index import DEFAULT_EXCLUDE, hash_files, is_excluded
+from utils import atomic_write
+
+ACTION_PATH = os.path.join(os.path.dirname(__file__), "..")
+BASELINE_PATH = os.path.join(ACTION_PATH, ".ps-rule", "templateCustom.Rule.yaml")
+OPTIONS_PATH = os.path.join(ACTION_PATH, "ps-rule.yaml")
+# Writes the main.test.bicep files PSRule analyzes, so its version is part of the key
+GENERATOR_PATH = os.path.join(ACTION_PATH, "scripts", "generate-bicep-test.py")
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# Outputs older than this are not reused, whatever else changed since
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+RESULT_NAME = "psrule-output.json"
+
+
+def infra_files(repoPath, exclude=DEFAULT_EXCLUDE):
+    """
+    Return the files PSRule reads under repoPath, relative to it: the Bicep files and the
+    JSON files, such as parameters files and ARM templates, of the folders with Bicep
+    files. The main.test.bicep files generated before each PSRule run are left out.
+    """
+    files = []
+    for root, dirs, names in os.walk(repoPath):
+        dirs[:] = [folder for folder in dirs if not is_excluded(folder, exclude)]
+        bicepFolder = any(name.endswith(".bicep") for name in names)
+        for name in names:
+            if name.endswith(".test.bicep") or name == RESULT_NAME:
+                continue
+            if name.endswith((".bicep", ".bicepparam")) or (
+                bicepFolder and name.endswith(".json")
+            ):
+                files.append(os.path.relpath(os.path.join(root, name), repoPath))
+    return files
+
+
+class PSRuleCache:
+    """
+    PSRule outputs by the hash of the infrastructure files, the PSRule configuration and
+    the module versions. Outputs stored more than maxAge seconds ago are not reused, and
+    when the cache grows over maxSize bytes, the least recently used outputs are removed.
+    :param moduleVersions: the versions of the PSRule modules that run, such as
+                           PSRule=2.9.0,PSRule.Rules.Azure=1.39.0
+    """
+
+    def __init__(
+        self,
+        cacheDir,
+        maxSize=DEFAULT_MAX_SIZE,
+        baselinePath=BASELINE_PATH,
+        optionsPath=OPTIONS_PATH,
+        moduleVersions="",
+        maxAge=DEFAULT_MAX_AGE,
+    ):
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        self.configPaths = [baselinePath, optionsPath, GENERATOR_PATH]
+        self.moduleVersions = moduleVersions
+        self.maxAge = maxAge
+
+    def key(self, repoPath):
+        """:return: the cache key of repoPath, or None when it has no infrastructure files"""
+        files = infra_files(repoPath)
+        if not files:
+            return None
+        digest = hashlib.sha256(hash_files(repoPath, files, []).encode())
+        # A new rules release can find what the previous one passed
+        digest.update(self.moduleVersions.encode())
+        for path in self.configPaths:
+            if os.path.isfile(path):
+                with open(path, "rb") as file:
+                    digest.update(hashlib.sha256(file.read()).digest())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cacheDir, f"{key}.json")
+
+    def lookup(self, repoPath, output):
+        """Copy the cached output for repoPath to output. :return: True on a hit"""
+        key = self.key(repoPath)
+        if key is None:
+            logging.info(
+                f"No infrastructure files in {repoPath}, PSRule is not cached."
+            )
+            return False
+        path = self.path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.maxAge:
+                logging.info(f"The cached PSRule output {key} expired.")
+                return False
+            shutil.copyfile(path, output)
+        except FileNotFoundError:
+            return False
+        # The access time orders the outputs for eviction, the modification time
+        # stays the time they were stored
+        os.utime(path, (time.time(), stat.st_mtime))
+        return True
+
+    def store(self, repoPath, result):
+        """Add result as the output for repoPath. :return: False when it is not cached"""
+        key = self.key(repoPath)
+        if key is None:
+            logging.info(
+                f"No infrastructure files in {repoPath}, PSRule is not cached."
+            )
+            return False
+        os.makedirs(self.cacheDir, exist_ok=True)
+        with open(result, "rb") as source, atomic_write(self.path(key), "wb") as file:
+            shutil.copyfileobj(source, file)
+        self.evict()
+        return True
+
+    def evict(self):
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cacheDir):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.cacheDir, name))
+                if now - stat.st_mtime > self.maxAge:
+                    logging.info(f"Removing the expired PSRule output {name}.")
+                    os.remove(os.path.join(self.cacheDir, name))
+                    continue
+                entries.append((stat.st_atime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.maxSize:
+                break
+            logging.info(f"Removing the cached PSRule output {name}.")
+            os.remove(os.path.join(self.cacheDir, name))
+            total -= size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Reuse PSRule outputs while the infrastructure files are unchanged."
+    )
+    parser.add_argument("command", choices=["lookup", "store", "key"])
+    parser.add_argument("repo_path", help="The path to the repo PSRule analyzes.")
+    parser.add_argument("--cache_dir", required=True, help="The cache folder.")
+    parser.add_argument(
+        "--output",
+        default=RESULT_NAME,
+        help="Where lookup copies the cached PSRule output to.",
+    )
+    parser.add_argument(
+        "--result", default=RESULT_NAME, help="The PSRule output store adds."
+    )
+    parser.add_argument(
+        "--max_size_mb",
+        type=int,
+        default=DEFAULT_MAX_SIZE // (1024 * 1024),
+        help="The size the cache folder is trimmed to, least recently used outputs first.",
+    )
+    parser.add_argument(
+        "--max_age_days",
+        type=float,
+        default=DEFAULT_MAX_AGE / (24 * 3600),
+        help="The age after which a cached PSRule output is not reused.",
+    )
+    parser.add_argument(
+        "--module_versions",
+        default="",
+        help="The versions of the PSRule modules that run, such as PSRule=2.9.0,PSRule.Rules.Azure=1.39.0. A new version does not reuse outputs of the previous one.",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+
+    cache = PSRuleCache(
+        args.cache_dir,
+        args.max_size_mb * 1024 * 1024,
+        args.baseline,
+        moduleVersions=args.module_versions,
+        maxAge=args.max_age_days * 24 * 3600,
+    )
+    if args.command == "key":
+        print(cache.key(args.repo_path) or "")
+    elif args.command == "lookup":
+        if not cache.lookup(args.repo_path, args.output):
+            logging.info("No cached PSRule output for these infrastructure files.")
+            return 1
+        logging.info(f"Reused the cached PSRule output, written to {args.output}.")
+    elif cache.store(args.repo_path, args.result):
+        logging.info("Stored the PSRule output in the cache.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
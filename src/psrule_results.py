@@ -0,0 +1,133 @@
+import json
+import re
+from collections import namedtuple
+
+READ_SIZE = 1024 * 1024
+# Targets listed per failing rule, so a rule that fails everywhere keeps the report short
+MAX_TARGETS = 10
+whitespace_pattern = re.compile(r"[ \t\n\r]*")
+# Characters that continue a JSON number
+number_chars = "0123456789.eE+-"
+
+# The fields of a failing PSRule record that the report is built from
+PSRuleFailure = namedtuple(
+    "PSRuleFailure",
+    ["ruleName", "ref", "recommendation", "reference", "targetName"],
+)
+
+
+def iter_json_array(file, chunkSize=READ_SIZE):
+    """
+    Yield the elements of the JSON array in file one at a time. The file is read in
+    chunks, so memory is bounded by the chunk and the largest element instead of the
+    size of the file.
+    :raises ValueError: when the file does not contain a JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    # What comes next: the opening bracket, the first element, a separator or an element
+    state = "start"
+    while True:
+        position = whitespace_pattern.match(buffer, position).end()
+        if position == len(buffer):
+            if eof:
+                raise ValueError("The JSON array is not closed.")
+            buffer, position, eof = read_more(file, buffer, position, chunkSize)
+            continue
+
+        char = buffer[position]
+        if state == "start":
+            if char != "[":
+                raise ValueError("Expected a JSON array.")
+            position += 1
+            state = "first"
+        elif state in ("first", "separator") and char == "]":
+            return
+        elif state == "separator":
+            if char != ",":
+                raise ValueError(f"Expected , or ] in the JSON array, found {char}.")
+            position += 1
+            state = "element"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Usually an element cut at the end of the chunk
+                if eof:
+                    raise
+                buffer, position, eof = read_more(file, buffer, position, chunkSize)
+                continue
+            if not eof and (end == len(buffer) or buffer[end] in number_chars):
+                # A number cut by the chunk, such as 1. of 1.5, decodes as a shorter one
+                buffer, position, eof = read_more(file, buffer, position, chunkSize)
+                continue
+            yield value
+            position = end
+            state = "separator"
+
+
+def read_more(file, buffer, position, chunkSize):
+    """
+    Drop the consumed part of buffer and append the next chunk of file. The chunk grows
+    with the buffer, so an element larger than chunkSize is decoded in linear time.
+    :return: (buffer, position, eof)
+    """
+    data = file.read(max(chunkSize, len(buffer) - position))
+    return buffer[position:] + data, 0, not data
+
+
+def iter_failures(path, chunkSize=READ_SIZE):
+    """Yield the failing records of a PSRule JSON output file, one at a time."""
+    with open(path, "r", encoding="utf-8-sig") as file:
+        yield from failures_from_records(iter_json_array(file, chunkSize))
+
+
+def failures_from_records(records):
+    """Yield the failures of records shaped like the entries of a PSRule JSON output."""
+    for record in records:
+        if record["outcome"] == "Fail":
+            yield PSRuleFailure(
+                record["ruleName"],
+                record["ref"],
+                record["info"]["recommendation"],
+                record["info"]["annotations"]["online version"],
+                record.get("targetName"),
+            )
+
+
+class RuleFindings:
+    """The failures of one rule: how many there are and the first targets they hit."""
+
+    def __init__(self, failure):
+        self.ruleName = failure.ruleName
+        self.ref = failure.ref
+        self.recommendation = failure.recommendation
+        self.reference = failure.reference
+        self.count = 0
+        # Distinct target names in the order they failed, a dict as an ordered set
+        self.targets = {}
+        # Whether other distinct targets failed after the first ones were kept
+        self.moreTargets = False
+
+
+def group_failures(failures, maxTargets=MAX_TARGETS):
+    """
+    Aggregate failures by rule name in a single pass, keeping at most maxTargets
+    distinct targets per rule.
+    :return: list of RuleFindings, in the order each rule first failed
+    """
+    findings = {}
+    for failure in failures:
+        rule = findings.get(failure.ruleName)
+        if rule is None:
+            rule = findings[failure.ruleName] = RuleFindings(failure)
+        rule.count += 1
+        if failure.targetName is None or failure.targetName in rule.targets:
+            continue
+        if len(rule.targets) < maxTargets:
+            rule.targets[failure.targetName] = None
+        else:
+            rule.moreTargets = True
+    return list(findings.values())
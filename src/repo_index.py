@@ -0,0 +1,295 @@
+import hashlib
+import os
+import logging
+import subprocess
+import threading
+from fnmatch import fnmatch
+from markdown_outline import read_outline
+
+READ_SIZE = 1024 * 1024
+
+# Folders that never hold template files but dominate the inode count of a checkout
+DEFAULT_EXCLUDE = [
+    ".git",
+    ".azure",
+    ".venv",
+    "venv",
+    "node_modules",
+    "__pycache__",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".ruff_cache",
+    ".tox",
+    ".next",
+    "dist",
+    "build",
+]
+
+
+def is_excluded(relativePath, exclude):
+    """
+    Return True if a folder matches one of the exclude globs.
+    A glob matches either the folder name or its path relative to the indexed root.
+    :param relativePath: the folder path relative to the indexed root, using "/"
+    :param exclude: list of glob patterns
+    """
+    name = relativePath.rsplit("/", 1)[-1]
+    return any(
+        fnmatch(name, pattern) or fnmatch(relativePath, pattern) for pattern in exclude
+    )
+
+
+def hash_files(folderPath, paths, exclude=DEFAULT_EXCLUDE):
+    """
+    Hash the names and contents of the files under paths, which may overlap, relative to
+    folderPath. Folders matching exclude, such as node_modules, are skipped.
+    """
+    files = set()
+    for path in paths:
+        fullPath = os.path.normpath(os.path.join(folderPath, path))
+        if os.path.isfile(fullPath):
+            files.add(fullPath)
+            continue
+        for root, dirs, names in os.walk(fullPath):
+            dirs[:] = [folder for folder in dirs if not is_excluded(folder, exclude)]
+            files.update(os.path.join(root, name) for name in names)
+
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        relativePath = os.path.relpath(path, folderPath).replace(os.sep, "/")
+        fileDigest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for data in iter(lambda: file.read(READ_SIZE), b""):
+                fileDigest.update(data)
+        digest.update(f"{relativePath}\0{fileDigest.hexdigest()}\n".encode())
+    return digest.hexdigest()
+
+
+class RepoIndex:
+    """
+    Scans a repository once and answers file and folder lookups from memory.
+    :param rootFolder: the folder to index, paths are reported the way os.walk reports them
+    :param exclude: glob patterns of folders that are not descended into
+    :param useGitIndex: list files with git ls-files instead of walking the filesystem
+    """
+
+    def __init__(self, rootFolder, exclude=DEFAULT_EXCLUDE, useGitIndex=False):
+        self.rootFolder = rootFolder
+        self.exclude = list(exclude or [])
+        self.useGitIndex = useGitIndex
+        self._scanLock = threading.Lock()
+        self._entries = None
+        self._folders = None
+        self._entriesByRoot = None
+        self._order = None
+        self._rootsByKey = {}
+        self._fileNames = {}
+        self._outlines = {}
+
+    def walk(self, exclude=None):
+        """
+        Return the indexed (root, dirs, files) entries in os.walk order.
+        The lists are shared between callers and must not be modified.
+        :param exclude: extra glob patterns, subtrees matching them are skipped
+        """
+        if self._entries is None:
+            self._scan()
+        if not exclude:
+            return self._entries
+        return list(self._walk_pruned(exclude))
+
+    def _scan(self):
+        # Validators may share the index from several threads, scan only once
+        with self._scanLock:
+            if self._entries is None:
+                self._scan_locked()
+
+    def _scan_locked(self):
+        entries = self._list_git_index() if self.useGitIndex else None
+        if entries is None:
+            entries = self._walk_filesystem()
+
+        indexed = []
+        self._folders = {os.path.normpath(self.rootFolder)}
+        self._entriesByRoot = {}
+        self._order = {}
+        for entry in entries:
+            root, dirs, _ = entry
+            self._order[root] = len(indexed)
+            indexed.append(entry)
+            self._entriesByRoot[root] = entry
+            for folder in dirs:
+                self._folders.add(os.path.normpath(os.path.join(root, folder)))
+        # Published last, a non-None _entries means the whole index is ready
+        self._entries = indexed
+        logging.debug(f"Indexed {len(self._entries)} folders under {self.rootFolder}.")
+
+    def _walk_filesystem(self):
+        for root, dirs, files in os.walk(self.rootFolder):
+            if self.exclude:
+                # Prune in place so os.walk never descends into excluded folders
+                dirs[:] = [
+                    folder
+                    for folder in dirs
+                    if not is_excluded(
+                        self.relative_path(os.path.join(root, folder)), self.exclude
+                    )
+                ]
+            yield root, dirs, files
+
+    def _list_git_index(self):
+        """
+        Build the entries from the tracked and untracked, not ignored, files of a git checkout.
+        :return: the entries in os.walk order, or None if rootFolder is not in a git work tree
+        """
+        try:
+            result = subprocess.run(
+                ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                cwd=self.rootFolder,
+                capture_output=True,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.debug(f"git ls-files is not available, walking the filesystem: {e}")
+            return None
+
+        tree = {(): ([], [])}
+        for path in os.fsdecode(result.stdout).split("\0"):
+            if not path:
+                continue
+            parts = tuple(path.split("/"))
+            for depth in range(1, len(parts)):
+                folder = parts[:depth]
+                if folder not in tree:
+                    tree[folder] = ([], [])
+                    tree[folder[:-1]][0].append(folder[-1])
+            files = tree[parts[:-1]][1]
+            if parts[-1] not in files:
+                files.append(parts[-1])
+
+        entries = []
+        stack = [()]
+        while stack:
+            folder = stack.pop()
+            dirs, files = tree[folder]
+            root = os.path.join(self.rootFolder, *folder)
+            dirs.sort()
+            files.sort()
+            if self.exclude:
+                dirs[:] = [
+                    name
+                    for name in dirs
+                    if not is_excluded("/".join(folder + (name,)), self.exclude)
+                ]
+            entries.append((root, dirs, files))
+            stack.extend(folder + (name,) for name in reversed(dirs))
+        logging.debug(f"Listed {len(tree)} folders from the git index.")
+        return entries
+
+    def _walk_pruned(self, exclude):
+        pruned = set()
+        skipUnder = None
+        for root, dirs, files in self._entries:
+            if skipUnder is not None and root.startswith(skipUnder):
+                continue
+            if root in pruned:
+                skipUnder = os.path.join(root, "")
+                continue
+            keptDirs = []
+            for folder in dirs:
+                path = os.path.join(root, folder)
+                if is_excluded(self.relative_path(path), exclude):
+                    pruned.add(path)
+                else:
+                    keptDirs.append(folder)
+            yield root, keptDirs, files
+
+    def relative_path(self, path):
+        """Return path relative to the indexed root, using "/" as separator."""
+        relativePath = path[len(self.rootFolder) :].lstrip("/" + os.sep)
+        return relativePath.replace(os.sep, "/")
+
+    def is_pruned(self, path, exclude):
+        """Return True if path or one of its parents matches the exclude globs."""
+        if not exclude:
+            return False
+        parts = self.relative_path(path).split("/")
+        return any(
+            is_excluded("/".join(parts[: i + 1]), exclude)
+            for i in range(len(parts))
+            if parts[i] not in ("", ".")
+        )
+
+    def find_entries(self, roots, caseSensitive=True, exclude=None):
+        """
+        Look up the indexed entries of the given folders without walking the index.
+        :param roots: folder paths spelled the way os.walk reports them
+        :param caseSensitive: when False, roots must be lowercased and match any casing
+        :param exclude: extra glob patterns, folders under a match are skipped
+        :return: the matching (root, dirs, files) entries in os.walk order
+        """
+        if self._entries is None:
+            self._scan()
+        rootsByKey = self._rootsByKey.get(caseSensitive)
+        if rootsByKey is None:
+            rootsByKey = {}
+            for root, _, _ in self._entries:
+                rootsByKey.setdefault(
+                    root if caseSensitive else root.lower(), []
+                ).append(root)
+            self._rootsByKey[caseSensitive] = rootsByKey
+        matches = {
+            root
+            for key in roots
+            for root in rootsByKey.get(key, [])
+            if not self.is_pruned(root, exclude)
+        }
+        return [
+            self._entriesByRoot[root]
+            for root in sorted(matches, key=self._order.__getitem__)
+        ]
+
+    def is_folder(self, path):
+        """Return True if path, relative to the current directory, is an indexed folder."""
+        if self._entries is None:
+            self._scan()
+        return os.path.normpath(path) in self._folders
+
+    def has_folder_named(self, folderName, exclude=None):
+        """Return True if a folder named folderName exists anywhere in the index."""
+        return any(folderName in dirs for _, dirs, _ in self.walk(exclude))
+
+    def find_roots_with_file(self, fileNames):
+        """Return every indexed folder that directly contains one of fileNames."""
+        return [
+            root
+            for root, _, files in self.walk()
+            if any(fileName in files for fileName in fileNames)
+        ]
+
+    def file_names(self, root, caseSensitive=True):
+        """
+        Return a dict mapping the file names in an indexed folder to the actual names.
+        Without case sensitivity the keys are lowercased and the first file listed wins.
+        """
+        key = (root, caseSensitive)
+        fileNames = self._fileNames.get(key)
+        if fileNames is None:
+            fileNames = {}
+            if self._entries is None:
+                self._scan()
+            for file in self._entriesByRoot[root][2]:
+                fileNames.setdefault(file if caseSensitive else file.lower(), file)
+            self._fileNames[key] = fileNames
+        return fileNames
+
+    def outline(self, path):
+        """
+        Return the Markdown headings of a file, every file is read and parsed once per index.
+        """
+        key = os.path.normpath(path)
+        outline = self._outlines.get(key)
+        if outline is None:
+            outline = read_outline(path)
+            self._outlines[key] = outline
+        return outline
@@ -0,0 +1,124 @@
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from known_failures import FailureClassifier, default_classifier
+
+# A failure whose message matches pattern (a regex) is retried when retryable is True
+# and never retried when it is False. Rules that forbid a retry win, then the rule order.
+RetryRule = namedtuple("RetryRule", ["pattern", "retryable", "reason"])
+
+# One run of the retried function: what was run, 1-based number, seconds spent, result
+# and the reason of the classifier rule that matched a failure
+Attempt = namedtuple("Attempt", ["name", "number", "duration", "result", "reason"])
+
+
+class RetryBudget:
+    """
+    The number of retries left for a whole validation run, shared between validators.
+    :param total: how many retries all validators may do together, None for no limit
+    """
+
+    def __init__(self, total=None):
+        self.total = total
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one retry from the budget, return False when it is spent."""
+        with self._lock:
+            if self.total is not None and self.used >= self.total:
+                return False
+            self.used += 1
+            return True
+
+
+class RetryPolicy:
+    """
+    Retries a function returning (result, message) while its failures are classified
+    as transient, waiting an exponentially growing, jittered delay between attempts.
+    :param maxAttempts: the most times the function runs, including the first one
+    :param baseDelay: seconds to wait before the first retry, doubled for each next one
+    :param maxDelay: upper bound of a single delay
+    :param jitter: fraction of a delay that is randomly taken off, so concurrent
+                   validators hitting the same failure do not retry in lockstep
+    :param rules: list of RetryRule classifying failure messages, the known failures
+                  of known_failures.json by default
+    :param budget: RetryBudget shared by the run, or None for no run-wide limit
+    """
+
+    def __init__(
+        self,
+        maxAttempts=3,
+        baseDelay=15,
+        maxDelay=120,
+        jitter=0.5,
+        rules=None,
+        budget=None,
+        sleep=None,
+        uniform=None,
+    ):
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.jitter = jitter
+        self.classifier = (
+            default_classifier() if rules is None else FailureClassifier(rules)
+        )
+        self.budget = budget
+        self.sleep = sleep or time.sleep
+        self.uniform = uniform or random.random
+
+    def classify(self, message):
+        """
+        :return: (retryable, reason) of the rules matching message,
+                 (False, None) when no rule matches
+        """
+        return self.classifier.classify(message)
+
+    def delay(self, retry):
+        """Return the seconds to wait before the given 1-based retry."""
+        delay = min(self.maxDelay, self.baseDelay * 2 ** (retry - 1))
+        return delay * (1 - self.jitter * self.uniform())
+
+    def run(self, func, attempts=None, timeBudget=None, name=None):
+        """
+        Call func until it succeeds, fails permanently, or attempts or budget run out.
+        :param func: callable returning (result, message)
+        :param attempts: optional list the Attempt records are appended to
+        :param timeBudget: optional callable returning the seconds left, no retry is
+                           started when the delay would not fit
+        :param name: what is retried, for the log
+        :return: the (result, message) of the last attempt
+        """
+        name = name or getattr(func, "__name__", "function")
+        number = 0
+        while True:
+            number += 1
+            start = time.monotonic()
+            result, message = func()
+            retryable, reason = (True, None) if result else self.classify(message)
+            if attempts is not None:
+                attempts.append(
+                    Attempt(name, number, time.monotonic() - start, result, reason)
+                )
+            if result or not retryable:
+                return result, message
+
+            if number >= self.maxAttempts:
+                logging.warning(f"{name} failed {number} times ({reason}), giving up.")
+                return result, message
+            delay = self.delay(number)
+            if timeBudget is not None:
+                left = timeBudget()
+                if left is not None and delay >= left:
+                    logging.warning(f"No time left to retry {name} ({reason}).")
+                    return result, message
+            if self.budget is not None and not self.budget.acquire():
+                logging.warning(f"The retry budget is spent, not retrying {name}.")
+                return result, message
+            logging.warning(
+                f"{name} failed ({reason}), retrying {number}/{self.maxAttempts - 1} in {delay:.0f} seconds."
+            )
+            self.sleep(delay)
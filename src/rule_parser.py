@@ -1,21 +1,35 @@
 import json
 import logging
 import os
+import re
 from validator.file_validator import FileValidator
 from validator.azd_validator import AzdValidator
 from validator.topic_validator import TopicValidator
 from validator.folder_validator import FolderValidator
 from validator.ps_rule_validator import PSRuleValidator
 from validator.playwright_test_validator import PlaywrightTestValidator
+from validator.preflight_validator import PreflightValidator
 from validator.azd_command import AzdCommand
 from severity import Severity
+from repo_index import RepoIndex, DEFAULT_EXCLUDE
+from retry_policy import RetryBudget, RetryPolicy
+from deployment_cache import DeploymentCache
 import utils
 
+# Characters azd does not allow in environment names
+env_name_pattern = re.compile(r"[^A-Za-z0-9-]+")
+
 
 class RuleParser:
     def __init__(self, rules_file_path, args):
         self.rules_file_path = rules_file_path
         self.args = args
+        exclude = getattr(args, "exclude", None)
+        self.repo_index = RepoIndex(
+            args.repo_path,
+            DEFAULT_EXCLUDE + (exclude.split(",") if exclude else []),
+            getattr(args, "use_git_index", False),
+        )
 
     def parse(self):
         with open(self.rules_file_path, "r") as file:
@@ -44,6 +58,15 @@ class RuleParser:
         logging.debug(f"Validate paths: {custom_rules}")
         logging.debug(f"Rules: {rules}")
 
+        # Retries of all azd commands of the run draw from the same budget
+        retry_budget = RetryBudget(getattr(self.args, "retry_budget", None))
+        deploy_cache_dir = getattr(self.args, "deploy_cache_dir", None)
+        deploy_cache = (
+            DeploymentCache(deploy_cache_dir, getattr(self.args, "force_deploy", False))
+            if deploy_cache_dir
+            else None
+        )
+
         validators = []
         for rule_name, rule_details in rules.items():
             validator_type = rule_details.get("validator")
@@ -51,6 +74,8 @@ class RuleParser:
             severity = Severity.validate(
                 rule_details.get("severity", Severity.MODERATE)
             )
+            exclude = rule_details.get("exclude", [])
+            timeout = rule_details.get("timeout", None)
 
             if validator_type == "FileValidator":
                 if self.args.validate_paths == "None" or (
@@ -62,6 +87,7 @@ class RuleParser:
                 candidate_path = rule_details.get("candidate_path", ["."])
                 case_sensitive = rule_details.get("case_sensitive", False)
                 accept_folder = rule_details.get("accept_folder", False)
+                exact_heading = rule_details.get("exact_heading", False)
 
                 # Read the environment variable for h2_tags
                 h2_tags_env = os.getenv(f"{rule_name.upper().replace('.', '_')}_H2_TAG")
@@ -77,12 +103,15 @@ class RuleParser:
                     catalog,
                     rule_name,
                     ext,
-                    ".",
+                    self.repo_index.rootFolder,
                     candidate_path,
                     h2_tags,
                     case_sensitive,
                     severity,
                     accept_folder,
+                    self.repo_index,
+                    exclude,
+                    exact_heading,
                 )
                 validators.append(validator)
 
@@ -94,7 +123,12 @@ class RuleParser:
 
                 candidate_path = rule_details.get("candidate_path", ["."])
                 validator = FolderValidator(
-                    catalog, rule_name, candidate_path, severity
+                    catalog,
+                    rule_name,
+                    candidate_path,
+                    severity,
+                    self.repo_index,
+                    exclude,
                 )
                 validators.append(validator)
 
@@ -102,32 +136,56 @@ class RuleParser:
                 if not self.args.validate_azd:
                     continue
 
-                infra_yaml_paths = utils.find_infra_yaml_path(self.args.repo_path)
+                infra_yaml_paths = utils.find_infra_yaml_path(
+                    self.args.repo_path, self.repo_index
+                )
                 logging.debug(f"infra_yaml_paths: {infra_yaml_paths}")
 
+                env_names = self.azd_env_names(infra_yaml_paths)
                 for infra_yaml_path in infra_yaml_paths:
                     if rule_name == AzdCommand.UP.value:
                         validators.append(
                             AzdValidator(
-                                catalog, infra_yaml_path, AzdCommand.UP, severity
+                                catalog,
+                                infra_yaml_path,
+                                AzdCommand.UP,
+                                severity,
+                                env_names.get(infra_yaml_path),
+                                getattr(self.args, "log_dir", None),
+                                timeout,
+                                RetryPolicy(budget=retry_budget),
+                                getattr(self.args, "azd_pipeline", False),
+                                deploy_cache,
                             )
                         )
                     if rule_name == AzdCommand.DOWN.value:
-                        azd_down_validator = AzdValidator(
-                            catalog, infra_yaml_path, AzdCommand.DOWN, severity
+                        validators.append(
+                            AzdValidator(
+                                catalog,
+                                infra_yaml_path,
+                                AzdCommand.DOWN,
+                                severity,
+                                env_names.get(infra_yaml_path),
+                                getattr(self.args, "log_dir", None),
+                                timeout,
+                                RetryPolicy(budget=retry_budget),
+                                False,
+                                deploy_cache,
+                                getattr(self.args, "background_teardown", False)
+                                or getattr(self.args, "teardown", False),
+                            )
                         )
-                        inserted = False
-                        for i, validator in enumerate(validators):
-                            if (
-                                isinstance(validator, AzdValidator)
-                                and validator.command == AzdCommand.UP
-                                and validator.folderPath == infra_yaml_path
-                            ):
-                                validators.insert(i + 1, azd_down_validator)
-                                inserted = True
-                                break
-                        if not inserted:
-                            validators.append(azd_down_validator)
+
+            elif validator_type == "PreflightValidator":
+                if not self.args.validate_azd:
+                    continue
+
+                for infra_yaml_path in utils.find_infra_yaml_path(
+                    self.args.repo_path, self.repo_index
+                ):
+                    validators.append(
+                        PreflightValidator(catalog, infra_yaml_path, severity)
+                    )
 
             elif validator_type == "TopicValidator":
                 if self.args.expected_topics == "None":
@@ -142,7 +200,14 @@ class RuleParser:
                 validators.append(validator)
 
             elif validator_type == "PSRuleValidator":
-                validator = PSRuleValidator(catalog, self.args.psrule_result, severity)
+                validator = PSRuleValidator(
+                    catalog,
+                    self.args.psrule_result,
+                    severity,
+                    self.args.repo_path
+                    if getattr(self.args, "mi_prescan", False)
+                    else None,
+                )
                 validators.append(validator)
 
             elif validator_type == "PlaywrightTestValidator":
@@ -150,33 +215,179 @@ class RuleParser:
                     continue
 
                 playwright_config_ts_paths = utils.find_playwright_config_ts_path(
-                    self.args.repo_path
+                    self.args.repo_path, self.repo_index
                 )
                 logging.debug(
                     f"playwright_config_ts_paths: {playwright_config_ts_paths}"
                 )
 
                 for playwright_config_ts_path in playwright_config_ts_paths:
-                    playwright_validator = PlaywrightTestValidator(
-                        catalog, playwright_config_ts_path, severity
+                    validators.append(
+                        PlaywrightTestValidator(
+                            catalog,
+                            playwright_config_ts_path,
+                            severity,
+                            getattr(self.args, "log_dir", None),
+                            timeout,
+                        )
                     )
-                    inserted = False
-                    for i, validator in enumerate(validators):
-                        if (
-                            isinstance(validator, AzdValidator)
-                            and validator.command == AzdCommand.UP
-                        ):
-                            validators.insert(i + 1, playwright_validator)
-                            inserted = True
-                            break
-                    if not inserted:
-                        validators.append(playwright_validator)
             else:
                 continue
 
+        self.link_dependencies(validators)
+        validators = self.group_cycles(validators)
         logging.debug(f"Validators: {[validator.name for validator in validators]}")
         return validators
 
+    def azd_env_names(self, infra_yaml_paths):
+        """
+        Give every template folder its own azd environment when several folders are
+        deployed concurrently, or when a teardown in the background overlaps the next
+        deployment, so their environments and resource groups do not collide.
+        The names are AZURE_ENV_NAME-<n>, or <folder name>-<n> when it is not set.
+        :return: dict of folder path to environment name, empty when deploying one at a time
+        """
+        azd_concurrency = getattr(self.args, "azd_concurrency", 1) or 1
+        overlapping = (
+            azd_concurrency > 1
+            or getattr(self.args, "background_teardown", False)
+            or getattr(self.args, "teardown", False)
+        )
+        if not overlapping or len(infra_yaml_paths) <= 1:
+            return {}
+        base_env_name = os.getenv("AZURE_ENV_NAME")
+        env_names = {}
+        for index, infra_yaml_path in enumerate(infra_yaml_paths, start=1):
+            base = base_env_name or env_name_pattern.sub(
+                "-", os.path.basename(os.path.abspath(infra_yaml_path))
+            ).strip("-")
+            env_names[infra_yaml_path] = f"{base or 'env'}-{index}"
+        return env_names
+
+    def link_dependencies(self, validators):
+        """
+        Declare the ordering the ExecutionEngine has to respect for each template folder:
+        the pre-flight checks, azd up, then the Playwright tests against the deployment,
+        then azd down. Nothing is deployed when the pre-flight checks fail.
+        Folders that share one azd environment are deployed one after the other, the
+        next azd up waits for the teardown of the previous folder.
+        """
+        preflight_validators = {
+            validator.folderPath: validator
+            for validator in validators
+            if isinstance(validator, PreflightValidator)
+        }
+        azd_up_validators = {}
+        for validator in validators:
+            if (
+                isinstance(validator, AzdValidator)
+                and validator.command == AzdCommand.UP
+            ):
+                azd_up_validators.setdefault(validator.folderPath, validator)
+
+        tests_by_folder = {}
+        for validator in validators:
+            if isinstance(validator, PlaywrightTestValidator):
+                azd_up_validator = self.find_deployment(
+                    validator.folderPath, azd_up_validators
+                )
+                if azd_up_validator is not None:
+                    validator.dependencies.append(azd_up_validator)
+                    # A test change has to invalidate the cached deployment as well
+                    azd_up_validator.cachePaths.append(validator.folderPath)
+                    tests_by_folder.setdefault(azd_up_validator.folderPath, []).append(
+                        validator
+                    )
+                    self.require(
+                        validator, preflight_validators.get(azd_up_validator.folderPath)
+                    )
+
+        for validator in validators:
+            if (
+                isinstance(validator, AzdValidator)
+                and validator.command == AzdCommand.DOWN
+            ):
+                azd_up_validator = azd_up_validators.get(validator.folderPath)
+                if azd_up_validator is not None:
+                    validator.dependencies.append(azd_up_validator)
+                validator.dependencies.extend(
+                    tests_by_folder.get(validator.folderPath, [])
+                )
+            if isinstance(validator, AzdValidator):
+                self.require(validator, preflight_validators.get(validator.folderPath))
+
+        if self.azd_env_names(list(azd_up_validators)):
+            return
+        previous = None
+        for folder_path, azd_up_validator in azd_up_validators.items():
+            if previous is not None:
+                azd_up_validator.dependencies.extend(previous)
+            previous = [
+                validator
+                for validator in validators
+                if isinstance(validator, AzdValidator)
+                and validator.command == AzdCommand.DOWN
+                and validator.folderPath == folder_path
+            ] or [azd_up_validator] + tests_by_folder.get(folder_path, [])
+
+    def group_cycles(self, validators):
+        """
+        List the validators of each template folder together, in the order they run:
+        azd up, the Playwright tests against the deployment, then azd down.
+        :return: the validators, with the cycles where the first azd up was
+        """
+        cycles = []
+        for validator in validators:
+            if (
+                isinstance(validator, AzdValidator)
+                and validator.command == AzdCommand.UP
+            ):
+                cycles.append(validator)
+                cycles.extend(
+                    dependent
+                    for dependent in validators
+                    if isinstance(dependent, PlaywrightTestValidator)
+                    and validator in dependent.dependencies
+                )
+                cycles.extend(
+                    dependent
+                    for dependent in validators
+                    if isinstance(dependent, AzdValidator)
+                    and dependent.command == AzdCommand.DOWN
+                    and dependent.folderPath == validator.folderPath
+                )
+        if not cycles:
+            return validators
+        grouped = set(map(id, cycles))
+        start = validators.index(cycles[0])
+        rest = [validator for validator in validators if id(validator) not in grouped]
+        before = sum(id(validator) not in grouped for validator in validators[:start])
+        return rest[:before] + cycles + rest[before:]
+
+    def require(self, validator, prerequisite):
+        """Run validator only after prerequisite, and only when it passed."""
+        if prerequisite is not None:
+            validator.dependencies.append(prerequisite)
+            validator.prerequisites.append(prerequisite)
+
+    def find_deployment(self, folder_path, azd_up_validators):
+        """
+        Return the azd up validator of the template folder that contains folder_path,
+        or the first azd up validator when no template folder contains it.
+        """
+        folder = os.path.abspath(folder_path)
+        best_match = None
+        for infra_yaml_path, azd_up_validator in azd_up_validators.items():
+            infra_folder = os.path.abspath(infra_yaml_path)
+            if os.path.commonpath([folder, infra_folder]) == infra_folder and (
+                best_match is None
+                or len(infra_folder) > len(os.path.abspath(best_match.folderPath))
+            ):
+                best_match = azd_up_validator
+        if best_match is None and azd_up_validators:
+            best_match = next(iter(azd_up_validators.values()))
+        return best_match
+
     def normalize_extensions(self, ext):
         ext_map = {
             ".yml": [".yml", ".yaml"],
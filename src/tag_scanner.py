@@ -0,0 +1,111 @@
+import codecs
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+
+class TagScanner:
+    """
+    Finds several tags in a file in a single streaming pass with an Aho-Corasick automaton.
+    :param tags: list of strings to look for
+    :param caseSensitive: when False, tags and content are compared lowercased
+    """
+
+    def __init__(self, tags, caseSensitive=False):
+        self.tags = list(tags)
+        self.caseSensitive = caseSensitive
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._alwaysFound = set()
+        for index, tag in enumerate(self.tags):
+            key = self._normalize(tag)
+            if key == "":
+                # An empty tag is contained in every file
+                self._alwaysFound.add(index)
+                continue
+            state = 0
+            for char in key:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+        self._build_fail_links()
+        # In the root state only the first character of a tag can make progress,
+        # so the scan jumps straight to the next occurrence of one of them
+        first_chars = "".join(self._goto[0])
+        self._start = re.compile(f"[{re.escape(first_chars)}]") if first_chars else None
+
+    def _normalize(self, text):
+        return text if self.caseSensitive else text.lower()
+
+    def _build_fail_links(self):
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def scan(self, chunks):
+        """
+        Scan an iterable of text chunks, matches spanning chunk boundaries are found.
+        :return: the set of indexes of the tags that were found
+        """
+        found = set(self._alwaysFound)
+        remaining = len(self.tags) - len(found)
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for chunk in chunks:
+            if remaining == 0:
+                break
+            text = self._normalize(chunk)
+            position = 0
+            length = len(text)
+            while position < length:
+                if state == 0:
+                    if self._start is None:
+                        break
+                    match = self._start.search(text, position)
+                    if match is None:
+                        break
+                    position = match.start()
+                char = text[position]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                for index in output[state]:
+                    if index not in found:
+                        found.add(index)
+                        remaining -= 1
+                position += 1
+        return found
+
+    def find_missing(self, path, chunkSize=CHUNK_SIZE):
+        """
+        Stream a file and return the tags that do not occur in it, in their original order.
+        Bytes that are not valid UTF-8 are replaced instead of failing the scan.
+        """
+        found = self.scan(self._read_chunks(path, chunkSize))
+        return [tag for index, tag in enumerate(self.tags) if index not in found]
+
+    def _read_chunks(self, path, chunkSize):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        with open(path, "rb") as file:
+            while True:
+                data = file.read(chunkSize)
+                if not data:
+                    break
+                yield decoder.decode(data)
+        yield decoder.decode(b"", final=True)
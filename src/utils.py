@@ -1,51 +1,212 @@
+import hashlib
 import logging
 import os
+import re
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from repo_index import RepoIndex
 
+# Characters of command output kept in memory for the failure details
+OUTPUT_TAIL_SIZE = 16 * 1024
+# Seconds a timed out command gets to exit after SIGTERM before it is killed
+TERMINATE_GRACE_PERIOD = 10
+# Longest piece of a line read at once, so a huge line without newline stays bounded
+READ_SIZE = 8 * 1024
 
-def find_infra_yaml_path(repo_path):
-    infra_yaml_paths = []
-    for root, dirs, files in os.walk(repo_path):
-        for extension in ["yaml", "yml"]:
-            if "azure" + "." + extension in files:
-                infra_yaml_paths.append(root)
+default_log_dir = None
+# Held while buffered output is written, so the blocks of two validators do not mix
+console_lock = threading.Lock()
+
+
+def find_infra_yaml_path(repo_path, repo_index=None):
+    repo_index = repo_index or RepoIndex(repo_path)
+    infra_yaml_paths = repo_index.find_roots_with_file(["azure.yaml", "azure.yml"])
     return infra_yaml_paths if len(infra_yaml_paths) > 0 else [repo_path]
 
 
-def find_playwright_config_ts_path(repo_path):
+def find_playwright_config_ts_path(repo_path, repo_index=None):
     # playwright.config.ts
-    playwright_config_ts_paths = []
-    for root, dirs, files in os.walk(repo_path):
-        if "playwright.config.ts" in files:
-            playwright_config_ts_paths.append(root)
-    return playwright_config_ts_paths if len(playwright_config_ts_paths) > 0 else []
+    repo_index = repo_index or RepoIndex(repo_path)
+    return repo_index.find_roots_with_file(["playwright.config.ts"])
 
 
 def indent(text, count=2):
     return (" " * count).join(text.splitlines(True))
 
 
-def retry(times, retryMessages):
+def log_file_path(label, log_dir=None):
+    """
+    Return the file that stores the full output of a command run, named after its label
+    and a hash of it, so labels that only differ in punctuation get their own files.
+    :param log_dir: the folder of the log files, a new temp folder per run by default
+    """
+    global default_log_dir
+    if not log_dir:
+        if default_log_dir is None:
+            default_log_dir = tempfile.mkdtemp(prefix="template-validation-logs-")
+        log_dir = default_log_dir
+    os.makedirs(log_dir, exist_ok=True)
+    name = re.sub(r"[^A-Za-z0-9_-]+", "-", label).strip("-")
+    digest = hashlib.sha256(label.encode()).hexdigest()[:8]
+    return os.path.join(log_dir, f"{name}-{digest}.log")
+
+
+@contextmanager
+def atomic_write(path, mode="w", encoding=None):
+    """
+    Open a temp file next to path and move it over path once the block ends, so that
+    concurrent runs reading path get either the old or the whole new file, never a part.
+    :param mode: "w" for text, "wb" for bytes
+    """
+    handle, tempPath = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, mode, encoding=encoding) as file:
+            yield file
+        os.replace(tempPath, path)
+    except BaseException:
+        os.remove(tempPath)
+        raise
+
+
+class OutputBuffer:
+    """
+    The console output of a validator that runs concurrently with others, held back
+    and written as one block when it finishes. Kept in a temp file, as azd output can
+    be long.
+    """
+
+    def __init__(self):
+        self.file = None
+        # The phases of a pipelined azd up write from their own threads
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            if self.file is None:
+                self.file = tempfile.TemporaryFile("w+", encoding="utf-8")
+            self.file.write(text)
+
+    def flush(self, title):
+        """Log the output held back under title, and release it."""
+        if self.file is None:
+            return
+        self.file.seek(0)
+        with console_lock:
+            logging.info(f"Output of {title}:")
+            for line in self.file:
+                logging.info(line.rstrip())
+        self.file.close()
+        self.file = None
+
+
+def terminate_process_tree(process, grace_period=TERMINATE_GRACE_PERIOD):
+    """
+    Stop a process started by run_command together with every process it spawned.
+    """
+    if process.poll() is not None:
+        return
+    if os.name == "nt":
+        subprocess.run(
+            ["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True
+        )
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(grace_period)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_command(
+    command,
+    cwd,
+    log_path,
+    prefix="",
+    console=None,
+    on_line=None,
+    tail_size=OUTPUT_TAIL_SIZE,
+    timeout=None,
+    **kwargs,
+):
     """
-    Decorator to retry a function multiple times if it raises a RetryableException
-    :param times: number of times to retry
-    :param retryMessages: list of strings that if found in the exception message, the function will be retried
+    Run a shell command and stream its combined stdout and stderr line by line to the
+    console and to a log file, keeping only the end of the output in memory.
+    :param log_path: the file the full output is appended to
+    :param prefix: text put before every console line, to tell concurrent runs apart
+    :param console: an OutputBuffer that holds the console lines, instead of logging
+                    them as they come
+    :param on_line: optional callback called with every line of output
+    :param tail_size: number of characters of output to keep for the failure details
+    :param timeout: seconds after which the command and its children are terminated
+    :param kwargs: extra arguments for subprocess.Popen, such as env or stdin
+    :return: (returncode, tail of the output)
+    :raises subprocess.TimeoutExpired: when the command ran out of time, with the tail as output
     """
+    if timeout is not None and timeout <= 0:
+        raise subprocess.TimeoutExpired(command, 0, output="")
+    if timeout is not None:
+        # Own process group, so the whole tree can be terminated on timeout
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
 
-    def decorator(func):
-        def fn(*args, **kwargs):
-            attempt = 0
-            while attempt < times:
-                result, messages = func(*args, **kwargs)
-                if not result and any(message in messages for message in retryMessages):
-                    logging.warning(
-                        f"Retryable error message found in {func.__name__} output. Retrying."
-                    )
-                    attempt += 1
-                    logging.info(f"Retrying {func.__name__} {attempt}/{times}")
-                else:
-                    return result, messages
-            return func(*args, **kwargs)
+    tail = deque()
+    tail_length = 0
+    timed_out = threading.Event()
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        log_file.write(f"$ {command} ({time.strftime('%Y-%m-%d %H:%M:%S')})\n")
+        with subprocess.Popen(
+            command,
+            cwd=cwd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            **kwargs,
+        ) as process:
+            timer = None
+            if timeout is not None:
 
-        return fn
+                def on_timeout():
+                    timed_out.set()
+                    terminate_process_tree(process)
 
-    return decorator
+                timer = threading.Timer(timeout, on_timeout)
+                timer.daemon = True
+                timer.start()
+            try:
+                for line in iter(lambda: process.stdout.readline(READ_SIZE), ""):
+                    log_file.write(line)
+                    if console is None:
+                        logging.info(f"{prefix}{line.rstrip()}")
+                    else:
+                        console.write(f"{prefix}{line.rstrip()}\n")
+                    if on_line is not None:
+                        on_line(line)
+                    tail.append(line)
+                    tail_length += len(line)
+                    while tail_length > tail_size and len(tail) > 1:
+                        tail_length -= len(tail.popleft())
+                returncode = process.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+        log_file.write(
+            f"timed out after {timeout} seconds\n"
+            if timed_out.is_set()
+            else f"exit code {returncode}\n"
+        )
+    output = "".join(tail)[-tail_size:]
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, timeout, output=output)
+    return returncode, output
@@ -2,15 +2,26 @@ import os
 import subprocess
 import logging
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from validator.validator_base import ValidatorBase
 from list_azd_resources import list_resources
 from constants import ItemResultFormat, line_delimiter, Signs
-from utils import indent, retry
+from utils import indent, run_command, log_file_path
 from validator.azd_command import AzdCommand
 from severity import Severity
+from retry_policy import RetryPolicy
+from known_failures import default_classifier, failure_details
+from azd_env import active_environment, get_azd_env_value
 
-# defines string array of retryable error messages
-retryable_error_messages = ["Cannot connect to the Docker daemon", "spawn ETXTBSY"]
+# The steps of azd up, run one by one so a failure only reruns its own step
+UP_PHASES = [
+    ("azd package", "--all --no-prompt"),
+    ("azd provision", "--no-prompt"),
+    ("azd deploy", "--all --no-prompt"),
+]
+# Hooks that only run as part of azd up itself
+up_hook_pattern = re.compile(r"^\s+(preup|postup)\s*:", re.MULTILINE)
 
 
 class AzdValidator(ValidatorBase):
@@ -20,31 +31,164 @@ class AzdValidator(ValidatorBase):
         folderPath,
         command: AzdCommand,
         severity=Severity.HIGH,
+        envName=None,
+        logDir=None,
+        timeout=None,
+        retryPolicy=None,
+        pipelined=False,
+        cache=None,
+        background=False,
     ):
-        super().__init__("AzdValidator", validatorCatalog, severity)
+        super().__init__("AzdValidator", validatorCatalog, severity, False)
         self.folderPath = folderPath
         self.command = command
+        # Own azd environment name, so deployments of several folders can run side by side
+        self.envName = envName
+        self.logDir = logDir
+        self.timeout = timeout
+        self.retryPolicy = retryPolicy or RetryPolicy()
+        # Package and provision at the same time, for templates whose build does not
+        # need the provisioned resources
+        self.pipelined = pipelined
+        # DeploymentCache skipping unchanged folders, and more folders the key covers
+        self.cache = cache
+        self.cachePaths = []
+        self.cacheKey = None
+        self.background = background
+        self.attempts = []
+        self.completedPhases = set()
         self.resource_group = None
 
-    @retry(3, retryable_error_messages)
     def validate(self):
-        self.result = True
-        self.messages = []
+        self.startTime = time.monotonic()
+        self.attempts = []
+        self.cachedPass = False
 
         if self.command == AzdCommand.UP:
-            result, message = self.validate_up()
-            self.result = self.result and result
-            self.messages.append(message)
+            record = self.lookup_cache()
+            if record is not None:
+                return self.cached_pass("azd up", record["time"])
+            self.result, self.resultMessage = self.validate_up()
             self.list_resources()
 
         elif self.command == AzdCommand.DOWN:
-            result, message = self.validate_down()
-            self.result = self.result and result
-            self.messages.append(message)
+            if self.cached_dependency() is not None:
+                return self.cached_pass("azd down")
+            self.result, self.resultMessage = self.validate_down()
+            if self.result:
+                self.store_cache()
 
-        self.resultMessage = line_delimiter.join(self.messages)
+        if len(self.attempts) > len({attempt.name for attempt in self.attempts}):
+            self.resultMessage += line_delimiter + self.attempts_summary()
         return self.result, self.resultMessage
 
+    def title(self):
+        return self.describe(self.command.value)
+
+    def pending_message(self):
+        return f"{self.describe(self.command.value)} (teardown pending)"
+
+    def lookup_cache(self):
+        """Compute the deployment inputs hash and return the cached record matching it."""
+        if self.cache is None:
+            return None
+        try:
+            self.cacheKey = self.cache.key(
+                self.folderPath, self.cachePaths, self.envName
+            )
+        except Exception as e:
+            logging.warning(
+                f"Not using the deployment cache for {self.folderPath}: {e}"
+            )
+            self.cacheKey = None
+            return None
+        return self.cache.lookup(self.cacheKey)
+
+    def store_cache(self):
+        """
+        Record the inputs of this folder once azd down passed, when azd up and every
+        test against the deployment passed as well.
+        """
+        deployment = next(
+            (
+                dependency
+                for dependency in self.dependencies
+                if getattr(dependency, "command", None) == AzdCommand.UP
+            ),
+            None,
+        )
+        if (
+            deployment is None
+            or deployment.cache is None
+            or deployment.cacheKey is None
+            or not all(dependency.result for dependency in self.dependencies)
+        ):
+            return
+        try:
+            deployment.cache.store(deployment.cacheKey, self.folderPath)
+        except OSError as e:
+            logging.warning(f"Failed to update the deployment cache: {e}")
+
+    def cached_pass(self, command, since=None):
+        self.cachedPass = True
+        self.result = True
+        reason = (
+            f"the deployment inputs are unchanged since {since} UTC"
+            if since
+            else "the deployment was not rerun"
+        )
+        self.resultMessage = ItemResultFormat.PASS.format(
+            message=f"{self.describe(command)} (cached pass, {reason})"
+        )
+        return self.result, self.resultMessage
+
+    def attempts_summary(self):
+        """Describe every attempt of the commands that were retried and the time it took."""
+        attempts = ", ".join(
+            f"{attempt.name} #{attempt.number} {'passed' if attempt.result else 'failed'} after {attempt.duration:.0f}s"
+            + (f" ({attempt.reason})" if attempt.reason else "")
+            for attempt in self.attempts
+        )
+        return ItemResultFormat.SUBITEM.format(
+            sign=Signs.WARNING, message=f"Attempts: {attempts}."
+        )
+
+    def describe(self, command):
+        return (
+            f"{command}"
+            if self.folderPath == "."
+            else f"{command} in {self.folderPath}"
+        )
+
+    def runPhase(self, command, arguments):
+        """
+        Run one azd command with the retry policy. Phases that passed are remembered,
+        so validating again resumes at the phase that failed.
+        """
+        if command in self.completedPhases:
+            return True, ItemResultFormat.PASS.format(message=self.describe(command))
+        result, message = self.retryPolicy.run(
+            lambda: self.runCommand(command, arguments),
+            self.attempts,
+            self.time_budget,
+            command,
+        )
+        if result:
+            self.completedPhases.add(command)
+        return result, message
+
+    def runPhasesConcurrently(self, phases):
+        """
+        Run independent phases at the same time and wait for all of them.
+        :return: (True, None) when all passed, else False and the failures in phase order
+        """
+        with ThreadPoolExecutor(max_workers=len(phases)) as executor:
+            results = list(executor.map(lambda phase: self.runPhase(*phase), phases))
+        failures = [message for result, message in results if not result]
+        if failures:
+            return False, line_delimiter.join(failures)
+        return True, None
+
     def validate_up(self):
         logging.debug(f"Running azd up in {self.folderPath}")
         try:
@@ -52,7 +196,59 @@ class AzdValidator(ValidatorBase):
         except Exception as e:
             logging.warning(f"Failed to update tf backend: {e}")
 
-        return self.runCommand("azd up", "--no-prompt")
+        if self.has_up_hooks():
+            logging.info(
+                f"{self.folderPath} declares preup or postup hooks, running azd up as a single command."
+            )
+            return self.runPhase("azd up", "--no-prompt")
+
+        if self.pipelined:
+            result, message = self.prepare_environment()
+            if not result:
+                return result, message
+            result, message = self.runPhasesConcurrently(UP_PHASES[:2])
+            if not result:
+                return result, message
+            result, message = self.runPhase(*UP_PHASES[2])
+            if not result:
+                return result, message
+        else:
+            for command, arguments in UP_PHASES:
+                result, message = self.runPhase(command, arguments)
+                if not result:
+                    return result, message
+        return True, ItemResultFormat.PASS.format(message=self.describe("azd up"))
+
+    def prepare_environment(self):
+        """
+        Create the azd environment before azd package and azd provision run at the same
+        time, so they do not race to create .azure/<env>/.env and .azure/config.json.
+        An existing environment, such as the default one of the folder, is used as is.
+        """
+        envName = active_environment(self.folderPath, self.envName)
+        if envName is None:
+            # azd env new cannot prompt for the name with --no-prompt
+            return False, ItemResultFormat.AZD_FAIL.format(
+                sign=Signs.BLOCK
+                if Severity.isBlocker(self.severity)
+                else Signs.WARNING,
+                message=self.describe("azd env new"),
+                detail_messages=ItemResultFormat.SUBITEM.format(
+                    sign=Signs.WARNING,
+                    message="Set AZURE_ENV_NAME to create the azd environment before azd package and azd provision run at the same time.",
+                ),
+            )
+        if os.path.isfile(os.path.join(self.folderPath, ".azure", envName, ".env")):
+            return True, None
+        return self.runPhase("azd env new", f"{envName} --no-prompt")
+
+    def has_up_hooks(self):
+        for name in ("azure.yaml", "azure.yml"):
+            path = os.path.join(self.folderPath, name)
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8", errors="replace") as file:
+                    return up_hook_pattern.search(file.read()) is not None
+        return False
 
     def extract_resource_group(self, stdout):
         match = re.search(r"\(✓\) Done: Resource group: ([\w-]+) \(\d+\.\d+s\)", stdout)
@@ -63,16 +259,18 @@ class AzdValidator(ValidatorBase):
     def list_resources(self):
         try:
             if not self.resource_group:
-                get_rg_command = "azd env get-value AZURE_RESOURCE_GROUP"
-                rgResult = subprocess.run(
-                    get_rg_command, shell=True, text=True, capture_output=True
+                self.resource_group = get_azd_env_value(
+                    self.folderPath,
+                    "AZURE_RESOURCE_GROUP",
+                    self.envName,
+                    **self.environment(),
                 )
-                if rgResult.returncode == 0:
-                    self.resource_group = rgResult.stdout.strip()
-            get_subs_command = "azd env get-value AZURE_SUBSCRIPTION_ID"
-            subs = subprocess.run(
-                get_subs_command, shell=True, text=True, capture_output=True
-            ).stdout.strip()
+            subs = get_azd_env_value(
+                self.folderPath,
+                "AZURE_SUBSCRIPTION_ID",
+                self.envName,
+                **self.environment(),
+            )
 
             resources, ai_deployments = list_resources(self.resource_group, subs)
             return ItemResultFormat.DETAILS.format(
@@ -87,7 +285,7 @@ class AzdValidator(ValidatorBase):
 
     def validate_down(self):
         logging.debug(f"Running azd down in {self.folderPath}")
-        return self.runCommand("azd down", "--force --purge --no-prompt")
+        return self.runPhase("azd down", "--force --purge --no-prompt")
 
     def use_local_tf_backend(self):
         provider_file = os.path.join(self.folderPath, "infra", "provider.tf")
@@ -101,34 +299,45 @@ class AzdValidator(ValidatorBase):
             file.write(modified_content)
         logging.info(f"Replace azurerm backend with local backend in {provider_file}.")
 
+    def environment(self):
+        """Return the subprocess keyword arguments that select this validator's azd environment."""
+        if not self.envName:
+            return {}
+        return {"env": {**os.environ, "AZURE_ENV_NAME": self.envName}}
+
     def runCommand(self, command, arguments):
-        message = (
-            f"{command}"
-            if self.folderPath == "."
-            else f"{command} in {self.folderPath}"
-        )
+        message = self.describe(command)
+        log_path = log_file_path(message, self.logDir)
+        timeout = self.time_budget()
+        failures = default_classifier().matcher()
+
+        def on_line(line):
+            self.extract_resource_group(line)
+            failures.feed(line)
+
         try:
-            result = subprocess.run(
+            returncode, output = run_command(
                 " ".join([command, arguments]),
-                cwd=self.folderPath,
-                capture_output=True,
-                text=True,
-                check=True,
-                shell=True,
+                self.folderPath,
+                log_path,
+                prefix=f"[{message}] ",
+                console=self.outputBuffer,
+                on_line=on_line,
+                timeout=timeout,
                 stdin=subprocess.DEVNULL,
+                **self.environment(),
             )
-            logging.info(f"{result.stdout}")
-            self.extract_resource_group(result.stdout)
+        except subprocess.TimeoutExpired as e:
+            returncode = None
+            output = f"{e.output}\nTimed out after {timeout:.0f} seconds."
+        if returncode == 0:
             return True, ItemResultFormat.PASS.format(message=message)
-        except subprocess.CalledProcessError as e:
-            logging.info(f"{e.stdout}")
-            logging.warning(f"{e.stderr}")
-            return False, ItemResultFormat.AZD_FAIL.format(
-                sign=Signs.BLOCK
-                if Severity.isBlocker(self.severity)
-                else Signs.WARNING,
-                message=message,
-                detail_messages=ItemResultFormat.DETAILS.format(
-                    message=indent(e.stdout.replace("\\", ""))
-                ),
-            )
+        logging.warning(
+            f"{message} {'timed out' if returncode is None else 'failed'}, "
+            f"the full output is in {log_path}"
+        )
+        return False, ItemResultFormat.AZD_FAIL.format(
+            sign=Signs.BLOCK if Severity.isBlocker(self.severity) else Signs.WARNING,
+            message=message,
+            detail_messages=failure_details(failures.results(), output),
+        )
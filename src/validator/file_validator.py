@@ -1,6 +1,9 @@
 from validator.validator_base import ValidatorBase
 from constants import line_delimiter, ItemResultFormat, Signs
 from severity import Severity
+from repo_index import RepoIndex
+from tag_scanner import TagScanner
+from markdown_outline import find_missing_headings
 import os
 import logging
 
@@ -17,6 +20,9 @@ class FileValidator(ValidatorBase):
         caseSensitive=False,
         severity=Severity.HIGH,
         isFolderAllowed=False,
+        repoIndex=None,
+        exclude=None,
+        exactHeading=False,
     ):
         super().__init__(f"{fileName}FileValidator", validatorCatalog, severity)
         self.fileName = fileName
@@ -31,6 +37,9 @@ class FileValidator(ValidatorBase):
         )
         self.isFolderAllowed = isFolderAllowed
         self.severity = severity
+        self.repoIndex = repoIndex
+        self.exclude = exclude or []
+        self.exactHeading = exactHeading
 
     def validate(self):
         logging.debug(
@@ -45,88 +54,76 @@ class FileValidator(ValidatorBase):
             else self.fileName + self.extensionList[0]
         )
 
-        for root, dirs, files in os.walk(self.rootFolder):
-            # print('{}; {}; {}'.format(root, dirs, files))
-            for folder in self.candidatePaths:
-                candidateFolder = (
-                    self.rootFolder
-                    if folder == "."
-                    else root
-                    if folder == "*"
-                    else os.path.join(self.rootFolder, folder)
-                )
-                if (
-                    self.caseSensitive is False
-                    and candidateFolder.lower() == root.lower()
-                ) or (self.caseSensitive is True and root == candidateFolder):
-                    for extension in self.extensionList:
-                        candidateFile = (
-                            self.fileName
-                            if extension == ""
-                            else self.fileName + extension
+        if self.repoIndex is None:
+            self.repoIndex = RepoIndex(self.rootFolder)
+
+        matchAnyFolder, candidateFolders, candidateFiles = self.compile_matcher()
+        tagScanner = (
+            TagScanner(self.h2Tags, self.caseSensitive)
+            if self.h2Tags is not None and not self.exactHeading
+            else None
+        )
+
+        # Only wildcard rules need the whole tree, others look up their folders directly
+        entries = (
+            self.repoIndex.walk(self.exclude)
+            if matchAnyFolder
+            else self.repoIndex.find_entries(
+                candidateFolders, self.caseSensitive, self.exclude
+            )
+        )
+        for root, dirs, files in entries:
+            fileNames = self.repoIndex.file_names(root, self.caseSensitive)
+            file = next(
+                (fileNames[key] for key in candidateFiles if key in fileNames), None
+            )
+            if file is not None:
+                self.result = True
+                logging.debug(f"- {file} is found in '{root}'.")
+                subMessages = []
+                if self.h2Tags is not None:
+                    missingTags = (
+                        find_missing_headings(
+                            self.repoIndex.outline(os.path.join(root, file)),
+                            self.h2Tags,
+                            self.caseSensitive,
                         )
-                        for file in files:
-                            if (
-                                self.caseSensitive is False
-                                and file.lower() == candidateFile.lower()
-                            ) or (self.caseSensitive is True and file == candidateFile):
-                                self.result = True
-                                logging.debug(f"- {file} is found in '{root}'.")
-                                subMessages = []
-                                if self.h2Tags is not None:
-                                    with open(
-                                        os.path.join(root, file), "r", encoding="utf-8"
-                                    ) as fileContent:
-                                        content = fileContent.read()
-                                        for tag in self.h2Tags:
-                                            if (
-                                                self.caseSensitive is False
-                                                and tag.lower() not in content.lower()
-                                            ) or (
-                                                self.caseSensitive is True
-                                                and tag not in content
-                                            ):
-                                                self.result = False
-                                                subMessages.append(
-                                                    ItemResultFormat.SUBITEM.format(
-                                                        sign=Signs.BLOCK
-                                                        if Severity.isBlocker(
-                                                            self.severity
-                                                        )
-                                                        else Signs.WARNING,
-                                                        message=f"{tag} is missing in {file}.",
-                                                    )
-                                                )
-                                    fileContent.close()
-                                if self.result:
-                                    messages.append(
-                                        ItemResultFormat.PASS.format(
-                                            message=f"{potential_name} File"
-                                        )
-                                    )
-                                else:
-                                    messages.append(
-                                        ItemResultFormat.FAIL.format(
-                                            sign=Signs.BLOCK
-                                            if Severity.isBlocker(self.severity)
-                                            else Signs.WARNING,
-                                            message=f"{potential_name} File",
-                                            detail_messages=line_delimiter.join(
-                                                subMessages
-                                            ),
-                                        )
-                                    )
-                                self.resultMessage = line_delimiter.join(messages)
-                                return self.result, self.resultMessage
-                    if self.isFolderAllowed is True and self.fileName in dirs:
-                        self.result = True
-                        messages.append(
-                            ItemResultFormat.PASS.format(
-                                message=f"{self.fileName} Folder"
+                        if self.exactHeading
+                        else tagScanner.find_missing(os.path.join(root, file))
+                    )
+                    for tag in missingTags:
+                        self.result = False
+                        subMessages.append(
+                            ItemResultFormat.SUBITEM.format(
+                                sign=Signs.BLOCK
+                                if Severity.isBlocker(self.severity)
+                                else Signs.WARNING,
+                                message=f"{tag} is missing in {file}.",
                             )
                         )
-                        self.resultMessage = line_delimiter.join(messages)
-                        return self.result, self.resultMessage
+                if self.result:
+                    messages.append(
+                        ItemResultFormat.PASS.format(message=f"{potential_name} File")
+                    )
+                else:
+                    messages.append(
+                        ItemResultFormat.FAIL.format(
+                            sign=Signs.BLOCK
+                            if Severity.isBlocker(self.severity)
+                            else Signs.WARNING,
+                            message=f"{potential_name} File",
+                            detail_messages=line_delimiter.join(subMessages),
+                        )
+                    )
+                self.resultMessage = line_delimiter.join(messages)
+                return self.result, self.resultMessage
+            if self.isFolderAllowed is True and self.fileName in dirs:
+                self.result = True
+                messages.append(
+                    ItemResultFormat.PASS.format(message=f"{self.fileName} Folder")
+                )
+                self.resultMessage = line_delimiter.join(messages)
+                return self.result, self.resultMessage
 
         errorMessage = (
             f"{potential_name} File or {self.fileName} Folder"
@@ -155,3 +152,31 @@ class FileValidator(ValidatorBase):
 
         self.resultMessage = line_delimiter.join(messages)
         return self.result, self.resultMessage
+
+    def match_key(self, name):
+        return name if self.caseSensitive else name.lower()
+
+    def compile_matcher(self):
+        """
+        Precompute the folder and file names this rule accepts, so every visited
+        folder costs one lookup per extension.
+        :return: (matchAnyFolder, candidateFolders, candidateFiles)
+        """
+        matchAnyFolder = "*" in self.candidatePaths
+        candidateFolders = {
+            self.match_key(
+                self.rootFolder
+                if folder == "."
+                else os.path.join(self.rootFolder, folder)
+            )
+            for folder in self.candidatePaths
+            if folder != "*"
+        }
+        # Keep the extension order, the first extension found wins
+        candidateFiles = [
+            self.match_key(
+                self.fileName if extension == "" else self.fileName + extension
+            )
+            for extension in self.extensionList
+        ]
+        return matchAnyFolder, candidateFolders, candidateFiles
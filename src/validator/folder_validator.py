@@ -3,38 +3,57 @@ import logging
 from validator.validator_base import ValidatorBase
 from constants import ItemResultFormat, Signs, line_delimiter
 from severity import Severity
+from repo_index import RepoIndex
 
 
 class FolderValidator(ValidatorBase):
     def __init__(
-        self, validatorCatalog, folderName, candidatePaths, severity=Severity.HIGH
+        self,
+        validatorCatalog,
+        folderName,
+        candidatePaths,
+        severity=Severity.HIGH,
+        repoIndex=None,
+        exclude=None,
     ):
         super().__init__(f"{folderName}FolderValidator", validatorCatalog, severity)
         self.folderName = folderName
         self.candidatePaths = [
             path.replace("/", os.path.sep) for path in candidatePaths
         ]
+        self.repoIndex = repoIndex
+        self.exclude = exclude or []
 
     def validate(self):
         logging.debug(f"Checking for {self.folderName} folder in candidate folders...")
         messages = []
-        folder_found = False
 
-        if "*" in self.candidatePaths:
-            self.candidatePaths = ["."] + [
-                os.path.join(root, d) for root, dirs, _ in os.walk(".") for d in dirs
-            ]
+        if self.repoIndex is None:
+            self.repoIndex = RepoIndex(".")
 
-        for candidate_folder in self.candidatePaths:
-            folder_path = os.path.join(candidate_folder, self.folderName)
-            if os.path.isdir(folder_path):
-                messages.append(
-                    ItemResultFormat.PASS.format(message=f"{self.folderName} Folder")
+        if "*" in self.candidatePaths:
+            folder_found = self.repoIndex.has_folder_named(
+                self.folderName, self.exclude
+            )
+        else:
+            folder_paths = [
+                os.path.join(
+                    self.repoIndex.rootFolder, candidate_folder, self.folderName
                 )
-                folder_found = True
-                break
+                for candidate_folder in self.candidatePaths
+            ]
+            folder_found = any(
+                self.repoIndex.is_folder(folder_path)
+                and not self.repoIndex.is_pruned(folder_path, self.exclude)
+                for folder_path in folder_paths
+            )
 
-        if not folder_found:
+        if folder_found:
+            messages.append(
+                ItemResultFormat.PASS.format(message=f"{self.folderName} Folder")
+            )
+            result = True
+        else:
             messages.append(
                 ItemResultFormat.FAIL.format(
                     sign=Signs.BLOCK
@@ -50,8 +69,6 @@ class FolderValidator(ValidatorBase):
                 )
             )
             result = False
-        else:
-            result = True
 
         self.result = result
         self.resultMessage = line_delimiter.join(messages)
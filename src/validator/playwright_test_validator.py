@@ -1,9 +1,10 @@
-import subprocess
 import logging
+import subprocess
 from validator.validator_base import ValidatorBase
 from constants import ItemResultFormat, line_delimiter, Signs
-from utils import indent
+from utils import run_command, log_file_path
 from severity import Severity
+from known_failures import default_classifier, failure_details
 import re
 
 
@@ -13,11 +14,25 @@ class PlaywrightTestValidator(ValidatorBase):
         validatorCatalog,
         folderPath,
         severity=Severity.LOW,
+        logDir=None,
+        timeout=None,
     ):
-        super().__init__("PlaywrightTestValidator", validatorCatalog, severity)
+        super().__init__("PlaywrightTestValidator", validatorCatalog, severity, False)
         self.folderPath = folderPath
+        self.logDir = logDir
+        self.timeout = timeout
 
     def validate(self):
+        self.cachedPass = False
+        if self.cached_dependency() is not None:
+            # No fresh deployment to test against, the last full cycle passed
+            self.cachedPass = True
+            self.result = True
+            self.resultMessage = ItemResultFormat.PASS.format(
+                message=f"{self.describe('npx playwright test')} (cached pass, the deployment was not rerun)"
+            )
+            return self.result, self.resultMessage
+
         self.result = True
         self.messages = []
 
@@ -43,32 +58,41 @@ class PlaywrightTestValidator(ValidatorBase):
         logging.debug(f"removing {word} with {replacement} from line")
         return line.replace(word, replacement)
 
-    def runCommand(self, command, arguments):
-        message = (
+    def title(self):
+        return self.describe("npx playwright test")
+
+    def describe(self, command):
+        return (
             f"{command}"
             if self.folderPath == "."
             else f"{command} in {self.folderPath}"
         )
+
+    def runCommand(self, command, arguments):
+        message = self.describe(command)
+        log_path = log_file_path(message, self.logDir)
+        timeout = self.time_budget()
+        failures = default_classifier().matcher()
         try:
-            result = subprocess.run(
+            returncode, output = run_command(
                 " ".join([command, arguments]),
-                cwd=self.folderPath,
-                capture_output=True,
-                text=True,
-                check=True,
-                shell=True,
+                self.folderPath,
+                log_path,
+                console=self.outputBuffer,
+                on_line=failures.feed,
+                timeout=timeout,
             )
-            logging.info(f"{result.stdout}")
+        except subprocess.TimeoutExpired as e:
+            returncode = None
+            output = f"{e.output}\nTimed out after {timeout:.0f} seconds."
+        if returncode == 0:
             return True, ItemResultFormat.PASS.format(message=message)
-        except subprocess.CalledProcessError as e:
-            logging.info(f"{e.stdout}")
-            logging.warning(f"{e.stderr}")
-            return False, ItemResultFormat.AZD_FAIL.format(
-                sign=Signs.BLOCK
-                if Severity.isBlocker(self.severity)
-                else Signs.WARNING,
-                message=message,
-                detail_messages=ItemResultFormat.DETAILS.format(
-                    message=indent(e.stdout.replace("\\", ""))
-                ),
-            )
+        logging.warning(
+            f"{message} {'timed out' if returncode is None else 'failed'}, "
+            f"the full output is in {log_path}"
+        )
+        return False, ItemResultFormat.AZD_FAIL.format(
+            sign=Signs.BLOCK if Severity.isBlocker(self.severity) else Signs.WARNING,
+            message=message,
+            detail_messages=failure_details(failures.results(), output),
+        )
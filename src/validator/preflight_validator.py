@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import yaml
+from validator.validator_base import ValidatorBase
+from constants import ItemResultFormat, line_delimiter, Signs
+from bicep_params import read_index
+from deployment_cache import read_azure_yaml
+from severity import Severity
+
+
+class PreflightValidator(ValidatorBase):
+    """
+    Static checks of a template folder that azd up would otherwise only fail on minutes
+    in: the service project paths and infra modules of azure.yaml exist, and every
+    required parameter of the main Bicep file is set by its parameters file.
+    """
+
+    def __init__(self, validatorCatalog, folderPath, severity=Severity.HIGH):
+        super().__init__("PreflightValidator", validatorCatalog, severity)
+        self.folderPath = folderPath
+
+    def title(self):
+        return (
+            "azd pre-flight checks"
+            if self.folderPath == "."
+            else f"azd pre-flight checks in {self.folderPath}"
+        )
+
+    def validate(self):
+        logging.debug(f"Running the azd pre-flight checks in {self.folderPath}")
+        problems = self.check()
+        self.result = not problems
+        if self.result:
+            self.resultMessage = ItemResultFormat.PASS.format(message=self.title())
+        else:
+            sign = Signs.BLOCK if Severity.isBlocker(self.severity) else Signs.WARNING
+            self.resultMessage = ItemResultFormat.AZD_FAIL.format(
+                sign=sign,
+                message=self.title(),
+                detail_messages=line_delimiter.join(
+                    ItemResultFormat.SUBITEM.format(sign=sign, message=problem)
+                    for problem in problems
+                ),
+            )
+        return self.result, self.resultMessage
+
+    def check(self):
+        """:return: the problems found, empty when the folder is ready to deploy"""
+        try:
+            azureYaml, project = read_azure_yaml(self.folderPath)
+        except FileNotFoundError:
+            return [f"No azure.yaml found in {self.folderPath}."]
+        except yaml.YAMLError as e:
+            return [f"azure.yaml is not valid YAML: {e}"]
+        if not isinstance(project, dict):
+            return [f"{azureYaml} does not define a project."]
+
+        problems = []
+        services = project.get("services") or {}
+        for name, service in services.items() if isinstance(services, dict) else []:
+            path = service.get("project") if isinstance(service, dict) else None
+            if path and not os.path.exists(os.path.join(self.folderPath, path)):
+                problems.append(
+                    f"The project path {path} of service {name} in {azureYaml} does not exist."
+                )
+
+        infra = project.get("infra") or {}
+        infraPath = infra.get("path") or "infra"
+        infraFolder = os.path.join(self.folderPath, infraPath)
+        if not os.path.isdir(infraFolder):
+            problems.append(f"The infra folder {infraPath} does not exist.")
+            return problems
+        if infra.get("provider", "bicep") != "bicep":
+            return problems
+
+        module = infra.get("module") or "main"
+        bicepPath = os.path.join(infraFolder, f"{module}.bicep")
+        if not os.path.isfile(bicepPath):
+            problems.append(
+                f"The infra module {infraPath}/{module}.bicep does not exist."
+            )
+            return problems
+        problems += self.check_modules(bicepPath, set())
+        problems += self.check_parameters(infraFolder, infraPath, module, bicepPath)
+        return problems
+
+    def check_modules(self, bicepPath, seen):
+        """Return the local modules referenced by bicepPath, or its modules, that do not exist."""
+        seen.add(os.path.normpath(bicepPath))
+        problems = []
+        for path in read_index(bicepPath).modules:
+            # Registry and template spec modules, such as br/public:..., are not local files
+            if ":" in path:
+                continue
+            modulePath = os.path.normpath(
+                os.path.join(os.path.dirname(bicepPath), path)
+            )
+            if not os.path.isfile(modulePath):
+                problems.append(
+                    f"The module {path} used by {os.path.relpath(bicepPath, self.folderPath)} does not exist."
+                )
+            elif modulePath.endswith(".bicep") and modulePath not in seen:
+                problems += self.check_modules(modulePath, seen)
+        return problems
+
+    def check_parameters(self, infraFolder, infraPath, module, bicepPath):
+        """Compare the parameters of the main Bicep file with the ones its parameters file sets."""
+        index = read_index(bicepPath)
+        declared = {name.lower() for name in index.parameters}
+        required = [parameter.name for parameter in index.required()]
+
+        jsonPath = os.path.join(infraFolder, f"{module}.parameters.json")
+        bicepparamPath = os.path.join(infraFolder, f"{module}.bicepparam")
+        if os.path.isfile(jsonPath):
+            parametersFile = f"{module}.parameters.json"
+            try:
+                with open(jsonPath, "r", encoding="utf-8-sig") as file:
+                    bound = list(json.load(file).get("parameters") or {})
+            except (ValueError, AttributeError) as e:
+                return [f"{infraPath}/{parametersFile} is not valid JSON: {e}"]
+        elif os.path.isfile(bicepparamPath):
+            parametersFile = f"{module}.bicepparam"
+            bound = list(read_index(bicepparamPath).parameters)
+        else:
+            if not required:
+                return []
+            return [
+                f"{infraPath}/{module}.parameters.json is missing, {module}.bicep requires {', '.join(required)}."
+            ]
+
+        boundNames = {name.lower() for name in bound}
+        problems = [
+            f"The required parameter {name} of {module}.bicep is not set in {parametersFile}."
+            for name in required
+            if name.lower() not in boundNames
+        ]
+        # ARM rejects a deployment that sets parameters the template does not declare
+        problems += [
+            f"{parametersFile} sets {name}, which {module}.bicep does not declare."
+            for name in bound
+            if name.lower() not in declared
+        ]
+        return problems
@@ -1,43 +1,56 @@
-import json
 import logging
 from validator.validator_base import ValidatorBase
 from utils import indent
+from psrule_results import (
+    failures_from_records,
+    group_failures,
+    iter_failures,
+)
+from mi_prescan import prescan
 from constants import ItemResultFormat, Signs, line_delimiter
 from severity import Severity
 
 
 class PSRuleValidator(ValidatorBase):
-    def __init__(self, validatorCatalog, rules_file_path, severity=Severity.MODERATE):
+    def __init__(
+        self,
+        validatorCatalog,
+        rules_file_path,
+        severity=Severity.MODERATE,
+        prescanPath=None,
+    ):
         super().__init__("PSRuleValidator", validatorCatalog, severity)
         self.rules_file_path = rules_file_path
+        # Check the templates under this folder in process instead of reading PSRule output
+        self.prescanPath = prescanPath
 
-    def validate(self):
+    def failures(self):
+        if self.prescanPath is not None:
+            logging.debug(f"Pre-scanning the templates in {self.prescanPath}")
+            return failures_from_records(prescan(self.prescanPath))
         logging.debug(f"Validating PSRule JSON file: {self.rules_file_path}")
+        return iter_failures(self.rules_file_path)
+
+    def validate(self):
         messages = []
         try:
-            with open(self.rules_file_path, "r") as file:
-                data = json.load(file)
-
             detail_messages = []
-            for item in data:
-                if item["outcome"] != "Fail":
-                    continue
-                rule_name = item["ruleName"]
-                error_code = item["ref"]
-                recommendation = item["info"]["recommendation"]
-                reference = (
-                    f"reference: {item['info']['annotations']['online version']}"
-                )
-
+            # One entry per rule, however many resources it failed on
+            for rule in group_failures(self.failures()):
+                times = "once" if rule.count == 1 else f"{rule.count} times"
                 item = ItemResultFormat.SUBITEM.format(
                     sign=Signs.BLOCK
                     if Severity.isBlocker(self.severity)
                     else Signs.WARNING,
-                    message=f"{rule_name} ({error_code}){line_delimiter}",
-                )
-                detail_messages.append(
-                    indent(line_delimiter.join([item, recommendation, reference]), 4)
+                    message=f"{rule.ruleName} ({rule.ref}), failed {times}{line_delimiter}",
                 )
+                lines = [item, rule.recommendation, f"reference: {rule.reference}"]
+                if rule.targets:
+                    targets = ", ".join(rule.targets)
+                    if rule.moreTargets:
+                        targets += " and more"
+                    lines.append(f"targets: {targets}")
+                detail_messages.append(indent(line_delimiter.join(lines), 4))
             detail_messages = line_delimiter.join(detail_messages)
             if detail_messages:
                 messages.append(
@@ -60,6 +73,19 @@ class PSRuleValidator(ValidatorBase):
             self.resultMessage = line_delimiter.join(messages)
             return self.result, self.resultMessage
         except Exception as e:
+            if self.prescanPath is not None:
+                # The pre-scan runs in this process, its failure is not a workflow issue
+                logging.error(f"Error running the security pre-scan: {e}")
+                self.result = False
+                self.resultMessage = ItemResultFormat.FAIL.format(
+                    sign=Signs.WARNING,
+                    message="Security Scan is not verified",
+                    detail_messages=ItemResultFormat.SUBITEM.format(
+                        sign=Signs.WARNING,
+                        message=f"The pre-scan could not run: {e}",
+                    ),
+                )
+                return self.result, self.resultMessage
             logging.error(f"Error parsing PSRule JSON file: {e}")
             # Parsing error usually caused by wrong workflow behavior
             self.result = True
@@ -1,14 +1,64 @@
+import time
 from abc import abstractmethod
 
 
 class ValidatorBase:
-    def __init__(self, name, catalog, severity):
+    def __init__(self, name, catalog, severity, parallelSafe=True):
         self.name = name
         self.catalog = catalog
         self.severity = severity
+        # Whether the validator can run concurrently with any other validator
+        self.parallelSafe = parallelSafe
+        # Validators that must finish before this one starts
+        self.dependencies = []
+        # Dependencies that must also pass, or this validator is not run at all
+        self.prerequisites = []
+        # Seconds this validator may run, and the time.monotonic() deadline of the whole run
+        self.timeout = None
+        self.deadline = None
+        # time.monotonic() when the current validation started, the timeout counts from it
+        self.startTime = None
+        # Set when the result was taken from the deployment cache instead of running
+        self.cachedPass = False
+        # Whether the run can report its summary before this validator finishes
+        self.background = False
+        # An OutputBuffer for the console output of commands, set when run concurrently
+        self.outputBuffer = None
         self.result = False
         self.resultMessage = "Validation not performed"
 
     @abstractmethod
     def validate(self):
         pass
+
+    def time_budget(self):
+        """
+        Return the seconds left for this validator, the smaller of its own timeout and
+        the time until the run deadline, or None when neither is set.
+        """
+        budgets = []
+        if self.timeout is not None:
+            elapsed = 0 if self.startTime is None else time.monotonic() - self.startTime
+            budgets.append(self.timeout - elapsed)
+        if self.deadline is not None:
+            budgets.append(self.deadline - time.monotonic())
+        return max(min(budgets), 0) if budgets else None
+
+    def title(self):
+        """Name the check in messages about it, such as when it was not run."""
+        return self.name
+
+    def pending_message(self):
+        """Describe the validator while its result is still pending."""
+        return self.name
+
+    def cached_dependency(self):
+        """Return the dependency whose pass came from the deployment cache, if any."""
+        return next(
+            (
+                dependency
+                for dependency in self.dependencies
+                if getattr(dependency, "cachedPass", False)
+            ),
+            None,
+        )
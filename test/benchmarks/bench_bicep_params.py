@@ -0,0 +1,164 @@
+"""
+Time of reading the parameters of synthetic main.bicep files with a growing number of
+parameters, half of them with @allowed values. Compares the regexes and nested loop the
+main.test.bicep generator used with the ParameterIndex, and the bash loop of the
+"Check parameters in main.bicep" action step, which runs grep, jq and sed per parameter
+and line, with the bicep_params env command.
+
+Usage: python test/benchmarks/bench_bicep_params.py [--params N] [--skip-bash]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from bicep_params import ParameterIndex, allowed_values
+
+BICEP_PARAMS = os.path.join(
+    os.path.dirname(__file__), "..", "..", "src", "bicep_params.py"
+)
+
+# The parameter loop of the action step before the ParameterIndex
+BASH_LOOP = r"""
+parameters=$(grep -P "^param\s+\w+\s+\w+$" "$BICEP" | grep -oP "^param\s+\K\w+" || echo "")
+for param in $parameters; do
+  param_value=$(jq -r ".parameters."$param".value // empty" "$PARAMETERS" || echo "")
+  if [ ! -z "$param_value" ] && [[ "$param_value" =~ ^\$\{[A-Za-z_]+\}$ ]]; then
+    env_key=$(echo "$param_value" | grep -oP '\$\{([^}]+)\}' | sed 's/\${//;s/}//g' || echo "")
+    env_value=$(echo -n $(printf "%c" $(($RANDOM % 26 + 65)))$(for i in {1..14}; do echo -n $(($RANDOM % 36 + 48)) | awk '{printf "%c", ($1 > 57 ? $1 + 39 : $1)}'; done))
+    allowed_value=""
+    param_line_num=$(grep -n "^param $param " "$BICEP" | cut -d: -f1 | head -1)
+    if [ -n "$param_line_num" ]; then
+      start_line=$((param_line_num-1))
+      end_line=$((param_line_num-10))
+      if [ $end_line -lt 1 ]; then end_line=1; fi
+      i=$start_line
+      while [ $i -ge $end_line ]; do
+        line=$(sed -n "${i}p" "$BICEP")
+        if echo "$line" | grep -q "@allowed"; then
+          allowed_value=$(echo "$line" | grep -oP "@allowed\(\[\K[^\]]+" || echo "")
+          break
+        elif echo "$line" | grep -q "^param "; then
+          break
+        fi
+        i=$((i-1))
+      done
+    fi
+    if [ -n "$allowed_value" ]; then
+      env_value=$(echo "$allowed_value" | tr -d "'" | tr -d '"' | awk -F, '{print $1}' | xargs)
+    fi
+    echo "$env_key=$env_value"
+  fi
+done
+"""
+
+
+def write_template(folder, count):
+    bicep = ["targetScope = 'subscription'", ""]
+    parameters = {}
+    for index in range(count):
+        bicep.append(f"@description('Parameter {index} of the template')")
+        if index % 2:
+            bicep.append("@allowed(['S0', 'S1', 'S2'])")
+        bicep.append(f"param param{index} string")
+        bicep.append("")
+        parameters[f"param{index}"] = {"value": f"${{PARAM_{chr(65 + index % 26)}}}"}
+    bicepPath = os.path.join(folder, "main.bicep")
+    with open(bicepPath, "w") as file:
+        file.write("\n".join(bicep))
+    parametersPath = os.path.join(folder, "main.parameters.json")
+    with open(parametersPath, "w") as file:
+        json.dump({"parameters": parameters}, file)
+    return bicepPath, parametersPath
+
+
+def regex_generator(content):
+    param_pattern = re.compile(r"param\s+(\w+)\s+(\w+)\s*(?!\s*=\s*'.*')(\n|\/|$)")
+    allowed_pattern = re.compile(
+        r"@allowed\(\[\s*([^\]]+)\s*\]\)(?:\s*@\w+\([^\)]*\))*\s*param\s+(\w+)\s+(\w+)"
+    )
+    params = param_pattern.findall(content)
+    allowed_params = allowed_pattern.findall(content)
+    values = {}
+    for param_name, _, _ in params:
+        values[param_name] = None
+        for allowed_values_text, allowed_param_name, _ in allowed_params:
+            if param_name == allowed_param_name:
+                values[param_name] = allowed_values_text.split(",")[0]
+                break
+    return values
+
+
+def index_generator(content):
+    return {
+        parameter.name: (allowed_values(parameter) or [None])[0]
+        for parameter in ParameterIndex(content).required()
+    }
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--params", type=int, default=400)
+    parser.add_argument("--skip-bash", action="store_true")
+    args = parser.parse_args()
+
+    print(
+        f"{'params':>7} {'regexes (s)':>12} {'index (s)':>10} "
+        f"{'bash loop (s)':>14} {'env CLI (s)':>12}"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        for count in (args.params // 16, args.params // 4, args.params):
+            bicepPath, parametersPath = write_template(folder, count)
+            with open(bicepPath) as file:
+                content = file.read()
+            regexes = timed(lambda content=content: regex_generator(content))
+            index = timed(lambda content=content: index_generator(content))
+            env = {**os.environ, "BICEP": bicepPath, "PARAMETERS": parametersPath}
+            bash = (
+                timed(
+                    lambda env=env: subprocess.run(
+                        ["bash", "-c", BASH_LOOP],
+                        env=env,
+                        capture_output=True,
+                        check=True,
+                    )
+                )
+                if not args.skip_bash
+                else float("nan")
+            )
+            cli = timed(
+                lambda bicepPath=bicepPath, parametersPath=parametersPath: (
+                    subprocess.run(
+                        [
+                            sys.executable,
+                            BICEP_PARAMS,
+                            "env",
+                            bicepPath,
+                            "--parameters",
+                            parametersPath,
+                        ],
+                        capture_output=True,
+                        check=True,
+                    )
+                )
+            )
+            print(
+                f"{count:>7} {regexes:>12.4f} {index:>10.4f} {bash:>14.2f} {cli:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
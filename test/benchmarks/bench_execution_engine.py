@@ -0,0 +1,128 @@
+"""
+Wall time of ExecutionEngine in serial and concurrent mode against the number of template
+folders. Every folder of a generated tree gets the File and Folder validators of
+src/rules.json, the README one checking the Markdown headings, over its own RepoIndex.
+
+Usage: python test/benchmarks/bench_execution_engine.py [--jobs N] [--files N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from argparse import Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from execution_engine import ExecutionEngine
+from rule_parser import RuleParser
+from validator.file_validator import FileValidator
+from validator.folder_validator import FolderValidator
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "src", "rules.json")
+README = """# Template
+
+Deploys a sample application with azd.
+
+## Features
+
+{body}
+
+## Getting Started
+
+{body}
+
+## Guidance
+
+{body}
+
+## Resources
+
+{body}
+"""
+FILES = {
+    "LICENSE": "MIT License\n",
+    "SECURITY.md": "# Security\n",
+    ".github/CODE_OF_CONDUCT.md": "# Code of Conduct\n",
+    ".github/CONTRIBUTING.md": "# Contributing\n",
+    ".github/ISSUE_TEMPLATE/bug_report.md": "# Bug report\n",
+    ".github/workflows/azure-dev.yml": "name: azure-dev\n",
+    ".devcontainer/devcontainer.json": "{}\n",
+    "azure.yaml": "name: template\n",
+    "infra/main.bicep": "param location string\n",
+}
+
+
+def write_template(folder, files):
+    """Write a template folder with the files the rules look for, and files source files."""
+    contents = dict(FILES)
+    contents["README.md"] = README.format(body="Some text.\n" * 200)
+    for index in range(files):
+        contents[f"src/module{index % 20}/file{index}.py"] = "print('hello')\n"
+    for path, text in contents.items():
+        path = os.path.join(folder, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+
+def static_validators(folders):
+    """The File and Folder validators of the rules for each folder, with fresh indexes."""
+    validators = []
+    for folder in folders:
+        args = Namespace(
+            repo_path=folder,
+            validate_paths=None,
+            validate_azd=False,
+            expected_topics="None",
+            psrule_result=None,
+            validate_playwright_test=False,
+        )
+        validators += [
+            validator
+            for validator in RuleParser(RULES_PATH, args).parse()
+            if isinstance(validator, (FileValidator, FolderValidator))
+        ]
+    return validators
+
+
+def measure(folders, jobs):
+    validators = static_validators(folders)
+    start = time.perf_counter()
+    results = ExecutionEngine(validators, jobs=jobs).execute()
+    elapsed = time.perf_counter() - start
+    assert all(result[2] for result in results), [r[1] for r in results]
+    return len(validators), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument(
+        "--files", type=int, default=500, help="Source files per template folder."
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'folders':>8} {'validators':>10} {'serial (s)':>12} "
+        f"{f'jobs={args.jobs} (s)':>14} {'speedup':>8}"
+    )
+    with tempfile.TemporaryDirectory() as root:
+        folders = []
+        for count in (1, 4, 16, 64):
+            while len(folders) < count:
+                folders.append(os.path.join(root, f"template{len(folders)}"))
+                write_template(folders[-1], args.files)
+            # Warm the page cache, so both modes read the tree from memory
+            measure(folders, 1)
+            validators, serial = measure(folders, 1)
+            _, concurrent = measure(folders, args.jobs)
+            print(
+                f"{count:>8} {validators:>10} {serial:>12.3f} {concurrent:>14.3f} "
+                f"{serial / concurrent:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
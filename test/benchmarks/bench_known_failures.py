@@ -0,0 +1,107 @@
+"""
+Throughput of the known-failure classifier on synthetic azd logs of growing size, fed
+line by line the way run_command streams them, against one regex search per pattern
+and line. One known failure sits near the end of every log.
+
+Usage: python test/benchmarks/bench_known_failures.py [--lines N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from known_failures import default_classifier
+
+WORDS = [
+    "Deploying",
+    "service",
+    "api",
+    "(✓)",
+    "Done:",
+    "Resource",
+    "group",
+    "rg-app",
+    "Packaging",
+    "container",
+    "image",
+    "step",
+    "3/12",
+    "RUN",
+    "npm",
+    "ci",
+    "added",
+    "1200",
+    "packages",
+    "in",
+    "34s",
+    "Creating/Updating",
+    "resources",
+]
+
+
+def make_log(lines, rng):
+    log = [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 20))) + "\n"
+        for _ in range(lines)
+    ]
+    log[-10] = (
+        "ERROR: failed deploying service 'indexer': archive/tar: write too long\n"
+    )
+    return log
+
+
+def per_pattern(log, patterns):
+    found = set()
+    for line in log:
+        for index, pattern in enumerate(patterns):
+            if index not in found and pattern.search(line):
+                found.add(index)
+    return found
+
+
+def streamed(log, classifier):
+    matcher = classifier.matcher()
+    for line in log:
+        matcher.feed(line)
+    return matcher.results()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=200000)
+    args = parser.parse_args()
+
+    classifier = default_classifier()
+    patterns = [re.compile(failure.pattern) for failure in classifier.failures]
+    rng = random.Random(0)
+
+    print(
+        f"{'lines':>8} {'MB':>6} {'per pattern (s)':>16} {'classifier (s)':>15} {'MB/s':>7}"
+    )
+    for lines in (args.lines // 16, args.lines // 4, args.lines):
+        log = make_log(lines, rng)
+        size = sum(len(line) for line in log) / 1e6
+
+        start = time.perf_counter()
+        expected = per_pattern(log, patterns)
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = streamed(log, classifier)
+        elapsed = time.perf_counter() - start
+
+        assert {
+            classifier.failures.index(failure) for failure, _ in results
+        } == expected
+        print(
+            f"{lines:>8} {size:>6.1f} {baseline:>16.3f} {elapsed:>15.3f} {size / elapsed:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
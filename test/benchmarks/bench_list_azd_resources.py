@@ -0,0 +1,108 @@
+"""
+Inventory time of list_azd_resources against a local fake ARM endpoint with a growing
+number of Cognitive Services accounts, against the previous listing: a new credential and
+a new client for every account, with the deployments of one account listed at a time.
+Every request takes --latency seconds, every token --token-time seconds, as azd auth
+token would.
+
+Usage: python test/benchmarks/bench_list_azd_resources.py [--latency S] [--token-time S]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from azure.mgmt.cognitiveservices import CognitiveServicesManagementClient
+from azure.mgmt.resource import ResourceManagementClient
+from fake_arm import CountingCredential, FakeArm, PlainBearerPolicy
+
+from list_azd_resources import (
+    CachedCredential,
+    ClientPool,
+    list_deployments,
+    list_resources,
+)
+
+
+class SlowCredential(CountingCredential):
+    def __init__(self, tokenTime):
+        super().__init__()
+        self.tokenTime = tokenTime
+
+    def get_token(self, *scopes, **kwargs):
+        time.sleep(self.tokenTime)
+        return super().get_token(*scopes, **kwargs)
+
+
+def per_account(arm, tokenTime, group, subscription):
+    credential = SlowCredential(tokenTime)
+    resources = ResourceManagementClient(
+        credential,
+        subscription,
+        base_url=arm.url,
+        authentication_policy=PlainBearerPolicy(credential),
+    )
+    accounts = [
+        resource.name
+        for resource in resources.resources.list_by_resource_group(group)
+        if resource.type == "Microsoft.CognitiveServices/accounts"
+    ]
+    deployments = []
+    for account in accounts:
+        credential = SlowCredential(tokenTime)
+        client = CognitiveServicesManagementClient(
+            credential,
+            subscription,
+            base_url=arm.url,
+            authentication_policy=PlainBearerPolicy(credential),
+        )
+        deployments += list_deployments(client, group, account)
+    return deployments
+
+
+def pooled(arm, tokenTime, group, subscription):
+    credential = CachedCredential(SlowCredential(tokenTime))
+    pool = ClientPool(
+        credential,
+        base_url=arm.url,
+        authentication_policy=PlainBearerPolicy(credential),
+    )
+    return list_resources(group, subscription, pool)[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--token-time", type=float, default=0.3)
+    args = parser.parse_args()
+
+    print(f"{'accounts':>8} {'per account (s)':>16} {'pooled (s)':>11} {'speedup':>8}")
+    for count in (6, 24, 48):
+        accounts = {
+            f"ai-{index}": [
+                ("OpenAI", "Standard", "gpt-4o", "2024-08-06"),
+                ("OpenAI", "Standard", "text-embedding-3-small", "1"),
+            ]
+            for index in range(count)
+        }
+        with FakeArm(accounts, ["Microsoft.Web/sites"] * 10, args.latency) as arm:
+            start = time.perf_counter()
+            expected = per_account(arm, args.token_time, "rg-app", "sub-id")
+            baseline = time.perf_counter() - start
+
+            start = time.perf_counter()
+            deployments = pooled(arm, args.token_time, "rg-app", "sub-id")
+            elapsed = time.perf_counter() - start
+
+        assert deployments == expected
+        print(
+            f"{count:>8} {baseline:>16.2f} {elapsed:>11.2f} {baseline / elapsed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Time and peak memory of reading the failures of synthetic PSRule output files of growing
+size, mostly Pass records as for multi-template repositories, with json.load against the
+streaming iter_failures.
+
+Usage: python test/benchmarks/bench_psrule_results.py [--records N] [--fail-ratio R]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from psrule_results import iter_failures
+
+RULES = [
+    "Azure.Storage.DisableLocalAuth",
+    "Azure.KeyVault.Logs",
+    "Azure.Deployment.SecureValue",
+    "Azure.AppService.ManagedIdentity",
+    "Azure.Cognitive.DisableLocalAuth",
+]
+
+
+def make_record(index, outcome, rng):
+    return {
+        "detail": {
+            "reason": [
+                {"path": f"properties.setting{n}", "message": "The value is set."}
+                for n in range(rng.randint(1, 4))
+            ]
+        },
+        "info": {
+            "displayName": "Rule display name",
+            "name": RULES[index % len(RULES)],
+            "recommendation": "Consider configuring the resource as the rule describes.",
+            "synopsis": "A short description of what the rule checks for.",
+            "annotations": {
+                "category": "Security",
+                "online version": "https://azure.github.io/PSRule.Rules.Azure/en/rules/",
+                "pillar": "Security",
+            },
+        },
+        "level": "Error",
+        "outcome": outcome,
+        "outcomeReason": "Processed",
+        "ref": f"AZR-{index % 1000:06d}",
+        "ruleName": RULES[index % len(RULES)],
+        "targetName": f"resource-{index}",
+        "targetType": "Microsoft.Storage/storageAccounts",
+        "time": rng.randint(0, 50),
+    }
+
+
+def write_output(path, records, failRatio, rng):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[\n")
+        for index in range(records):
+            outcome = "Fail" if rng.random() < failRatio else "Pass"
+            if index:
+                file.write(",\n")
+            json.dump(make_record(index, outcome, rng), file, indent=2)
+        file.write("\n]\n")
+
+
+def json_load(path):
+    with open(path, "r", encoding="utf-8-sig") as file:
+        return [record for record in json.load(file) if record["outcome"] == "Fail"]
+
+
+def streamed(path):
+    return list(iter_failures(path))
+
+
+def measure(function, path):
+    start = time.perf_counter()
+    count = len(function(path))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(path)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=160000)
+    parser.add_argument("--fail-ratio", type=float, default=0.02)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(
+        f"{'records':>8} {'MB':>6} {'json.load (s)':>14} {'peak MB':>8} "
+        f"{'streaming (s)':>14} {'peak MB':>8}"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "psrule-output.json")
+        for records in (args.records // 16, args.records // 4, args.records):
+            write_output(path, records, args.fail_ratio, rng)
+            size = os.path.getsize(path) / 1e6
+            expected, baseline, baselinePeak = measure(json_load, path)
+            count, elapsed, peak = measure(streamed, path)
+            assert count == expected
+            print(
+                f"{records:>8} {size:>6.0f} {baseline:>14.2f} {baselinePeak:>8.0f} "
+                f"{elapsed:>14.2f} {peak:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.fixture
+def template(request, tmp_path):
+    """
+    Write the TEMPLATE files of the test module to tmp_path.
+
+    :param request: The pytest request, whose module maps relative paths to their text,
+        or to None for an empty folder.
+    :return: The tmp_path folder.
+    """
+    for relativePath, text in request.module.TEMPLATE.items():
+        path = tmp_path / relativePath
+        if text is None:
+            path.mkdir(parents=True, exist_ok=True)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text)
+    return tmp_path
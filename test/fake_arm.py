@@ -0,0 +1,161 @@
+"""
+A local stand-in for Azure Resource Manager that answers the resource and Cognitive
+Services deployment listings of list_azd_resources, with an optional delay per request.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from azure.core.credentials import AccessToken
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+
+RESOURCES_PATH = re.compile(
+    r"^/subscriptions/([^/]+)/resourceGroups/([^/]+)/resources$", re.IGNORECASE
+)
+DEPLOYMENTS_PATH = re.compile(
+    r"^/subscriptions/([^/]+)/resourceGroups/([^/]+)/providers/"
+    r"Microsoft.CognitiveServices/accounts/([^/]+)/deployments$",
+    re.IGNORECASE,
+)
+
+
+class FakeArm:
+    """
+    :param accounts: the Cognitive Services accounts of the resource group, by name, each
+        with its list of (model format, sku, model name, model version)
+    :param otherTypes: the types of the other resources of the resource group
+    :param latency: seconds every request takes
+    :param pageSize: resources per page of the resource listing
+    """
+
+    def __init__(self, accounts, otherTypes=(), latency=0, pageSize=20):
+        self.accounts = accounts
+        self.otherTypes = list(otherTypes)
+        self.latency = latency
+        self.pageSize = pageSize
+        self.requests = []
+        self.active = 0
+        self.maxActive = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def resources(self, subscription, group):
+        resources = [
+            {
+                "id": f"/subscriptions/{subscription}/resourceGroups/{group}/providers/{kind}/r{index}",
+                "name": f"r{index}",
+                "type": kind,
+            }
+            for index, kind in enumerate(self.otherTypes)
+        ]
+        resources += [
+            {
+                "id": f"/subscriptions/{subscription}/resourceGroups/{group}/providers/Microsoft.CognitiveServices/accounts/{name}",
+                "name": name,
+                "type": "Microsoft.CognitiveServices/accounts",
+            }
+            for name in self.accounts
+        ]
+        return resources
+
+    def respond(self, path, query):
+        match = RESOURCES_PATH.match(path)
+        if match:
+            resources = self.resources(*match.groups())
+            start = int(query.get("skip", ["0"])[0])
+            page = {"value": resources[start : start + self.pageSize]}
+            if start + self.pageSize < len(resources):
+                page["nextLink"] = (
+                    f"{self.url}{path}?skip={start + self.pageSize}&api-version=x"
+                )
+            return 200, page
+        match = DEPLOYMENTS_PATH.match(path)
+        if match and match.group(3) in self.accounts:
+            return 200, {
+                "value": [
+                    {
+                        "name": name,
+                        "sku": {"name": sku},
+                        "properties": {
+                            "model": {
+                                "format": format,
+                                "name": name,
+                                "version": version,
+                            }
+                        },
+                    }
+                    for format, sku, name, version in self.accounts[match.group(3)]
+                ]
+            }
+        return 404, {"error": {"code": "NotFound", "message": path}}
+
+    def handler(self):
+        arm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                with arm.lock:
+                    arm.requests.append(url.path)
+                    arm.active += 1
+                    arm.maxActive = max(arm.maxActive, arm.active)
+                try:
+                    time.sleep(arm.latency)
+                    status, body = arm.respond(url.path, parse_qs(url.query))
+                finally:
+                    with arm.lock:
+                        arm.active -= 1
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class CountingCredential:
+    """A credential that counts the tokens it issues, in place of azd auth token."""
+
+    def __init__(self, lifetime=3600):
+        self.lifetime = lifetime
+        self.calls = 0
+
+    def get_token(self, *scopes, **kwargs):
+        self.calls += 1
+        return AccessToken(f"token-{self.calls}", int(time.time()) + self.lifetime)
+
+
+class PlainBearerPolicy(SansIOHTTPPolicy):
+    """Bearer token authentication that allows the plain http of the fake endpoint."""
+
+    def __init__(self, credential):
+        self.credential = credential
+
+    def on_request(self, request):
+        token = self.credential.get_token("https://management.azure.com/.default")
+        request.http_request.headers["Authorization"] = f"Bearer {token.token}"
@@ -0,0 +1,81 @@
+import os
+from unittest.mock import patch, MagicMock
+import pytest
+from azd_env import (
+    active_environment,
+    get_azd_env_value,
+    load_azd_env,
+    parse_dotenv_value,
+    read_dotenv,
+)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.delenv("AZURE_ENV_NAME", raising=False)
+    (tmp_path / ".azure" / "dev").mkdir(parents=True)
+    (tmp_path / ".azure" / "config.json").write_text(
+        '{"version": 1, "defaultEnvironment": "dev"}'
+    )
+    (tmp_path / ".azure" / "dev" / ".env").write_text(
+        'AZURE_ENV_NAME="dev"\nAZURE_RESOURCE_GROUP="rg-dev"\n'
+    )
+    return tmp_path
+
+
+def test_parse_dotenv_value():
+    assert parse_dotenv_value('"a \\"quoted\\" value"') == 'a "quoted" value'
+    assert parse_dotenv_value('"line\\nbreak \\$HOME"') == "line\nbreak $HOME"
+    assert parse_dotenv_value("'single \\n'") == "single \\n"
+    assert parse_dotenv_value(" plain # comment") == "plain"
+    assert parse_dotenv_value('""') == ""
+
+
+def test_read_dotenv(tmp_path):
+    path = tmp_path / ".env"
+    path.write_text('# comment\nexport A="1"\nB=2\n\nnot a pair\nC="x=y"\n')
+    assert read_dotenv(str(path)) == {"A": "1", "B": "2", "C": "x=y"}
+
+
+def test_active_environment(project, monkeypatch):
+    assert active_environment(str(project)) == "dev"
+    assert active_environment(str(project), "other") == "other"
+    monkeypatch.setenv("AZURE_ENV_NAME", "from-env")
+    assert active_environment(str(project)) == "from-env"
+    monkeypatch.delenv("AZURE_ENV_NAME")
+    assert active_environment(str(project / "missing")) is None
+
+
+def test_load_azd_env_rereads_changed_file(project):
+    values = load_azd_env(str(project))
+    assert values["AZURE_RESOURCE_GROUP"] == "rg-dev"
+    assert load_azd_env(str(project)) is values
+
+    env_file = project / ".azure" / "dev" / ".env"
+    env_file.write_text('AZURE_RESOURCE_GROUP="rg-new"\n')
+    stat = env_file.stat()
+    os.utime(env_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_azd_env(str(project))["AZURE_RESOURCE_GROUP"] == "rg-new"
+    assert load_azd_env(str(project), "missing") is None
+
+
+@patch("subprocess.run")
+def test_get_azd_env_value_reads_files(mock_run, project):
+    assert get_azd_env_value(str(project), "AZURE_RESOURCE_GROUP") == "rg-dev"
+    mock_run.assert_not_called()
+
+
+@patch("subprocess.run")
+def test_get_azd_env_value_falls_back_to_cli(mock_run, project):
+    mock_run.return_value = MagicMock(returncode=0, stdout="sub-id\n")
+    assert get_azd_env_value(str(project), "AZURE_SUBSCRIPTION_ID") == "sub-id"
+    mock_run.assert_called_once_with(
+        "azd env get-value AZURE_SUBSCRIPTION_ID",
+        shell=True,
+        text=True,
+        capture_output=True,
+        cwd=str(project),
+        check=False,
+    )
+    mock_run.return_value = MagicMock(returncode=1, stdout="")
+    assert get_azd_env_value(str(project / "missing"), "AZURE_SUBSCRIPTION_ID") is None
@@ -1,31 +1,43 @@
-import unittest
+import os
 import subprocess
+import sys
+import tempfile
+import time
+import unittest
 from unittest.mock import patch, MagicMock
 from validator.azd_validator import AzdValidator
 from validator.azd_command import AzdCommand
+from validator.playwright_test_validator import PlaywrightTestValidator
+from deployment_cache import DeploymentCache
 from constants import Signs
-from utils import indent
+from utils import indent, log_file_path
+
+UP_PHASE_COMMANDS = [
+    "azd package --all --no-prompt",
+    "azd provision --no-prompt",
+    "azd deploy --all --no-prompt",
+]
 
 
 class TestAzdValidator(unittest.TestCase):
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
+    @patch("validator.azd_validator.run_command")
     def test_azd_up_success(self, mock_run, mock_list_resources):
-        mock_run.return_value = MagicMock(stdout="azd up success", returncode=0)
+        mock_run.return_value = (0, "azd up success")
         mock_list_resources.return_value = None
         validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
         validator.validate()
         self.assertTrue(validator.result)
         self.assertIn(Signs.CHECK, validator.resultMessage)
-        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(
+            [call.args[0] for call in mock_run.call_args_list], UP_PHASE_COMMANDS
+        )
         mock_list_resources.assert_called_once()
 
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
+    @patch("validator.azd_validator.run_command")
     def test_azd_up_failure(self, mock_run, mock_list_resources):
-        mock_run.side_effect = subprocess.CalledProcessError(
-            1, "azd up", output="azd up failed"
-        )
+        mock_run.return_value = (1, "azd up failed")
         mock_list_resources.return_value = None
         validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
         validator.validate()
@@ -35,9 +47,9 @@ class TestAzdValidator(unittest.TestCase):
         mock_list_resources.assert_called_once()
 
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
+    @patch("validator.azd_validator.run_command")
     def test_azd_down_success(self, mock_run, mock_list_resources):
-        mock_run.return_value = MagicMock(stdout="azd down success", returncode=0)
+        mock_run.return_value = (0, "azd down success")
         mock_list_resources.return_value = None
         validator = AzdValidator("AzdDownCatalog", ".", AzdCommand.DOWN)
         validator.validate()
@@ -47,11 +59,9 @@ class TestAzdValidator(unittest.TestCase):
         mock_list_resources.assert_not_called()
 
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
+    @patch("validator.azd_validator.run_command")
     def test_azd_down_failure(self, mock_run, mock_list_resources):
-        mock_run.side_effect = subprocess.CalledProcessError(
-            1, "azd down", output="azd down failed"
-        )
+        mock_run.return_value = (1, "azd down failed")
         mock_list_resources.return_value = None
         validator = AzdValidator("AzdDownCatalog", ".", AzdCommand.DOWN)
         validator.validate()
@@ -60,98 +70,161 @@ class TestAzdValidator(unittest.TestCase):
         self.assertEqual(mock_run.call_count, 1)
         mock_list_resources.assert_not_called()
 
+    @patch("retry_policy.time.sleep")
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
-    def test_validate_retry_logic_ETXTBSY(self, mock_runCommand, mock_list_resources):
-        # Simulate a retryable error
+    @patch("validator.azd_validator.run_command")
+    def test_validate_retry_logic_ETXTBSY(
+        self, mock_runCommand, mock_list_resources, mock_sleep
+    ):
+        # Simulate a retryable error while packaging
         mock_runCommand.side_effect = [
-            subprocess.CalledProcessError(
-                1, "azd up", output="Retryable error message: spawn ETXTBSY"
-            ),
-            subprocess.CalledProcessError(
-                1, "azd up", output="Retryable error message: spawn ETXTBSY"
-            ),
-            MagicMock(returncode=0, stdout="azd up success"),
+            (1, "Retryable error message: spawn ETXTBSY"),
+            (1, "Retryable error message: spawn ETXTBSY"),
+            (0, "azd package success"),
+            (0, "azd provision success"),
+            (0, "azd deploy success"),
         ]
         mock_list_resources.return_value = None
         validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
         validator.validate()
-        # Check that runCommand was called 3 times
+        # Only the package phase was run again
         self.assertTrue(validator.result)
         self.assertIn(Signs.CHECK, validator.resultMessage)
-        self.assertEqual(mock_runCommand.call_count, 3)
-        self.assertEqual(mock_list_resources.call_count, 3)
+        self.assertEqual(
+            [call.args[0] for call in mock_runCommand.call_args_list],
+            [UP_PHASE_COMMANDS[0]] * 3 + UP_PHASE_COMMANDS[1:],
+        )
+        self.assertEqual(mock_list_resources.call_count, 1)
 
+    @patch("retry_policy.time.sleep")
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
-    def test_validate_retry_logic_DOCKER(self, mock_runCommand, mock_list_resources):
-        # Simulate a retryable error
+    @patch("validator.azd_validator.run_command")
+    def test_validate_retry_logic_DOCKER(
+        self, mock_runCommand, mock_list_resources, mock_sleep
+    ):
+        # Simulate a retryable error while deploying
         mock_runCommand.side_effect = [
-            subprocess.CalledProcessError(
-                1,
-                "azd up",
-                output="Retryable error message: Cannot connect to the Docker daemon",
-            ),
-            subprocess.CalledProcessError(
-                1,
-                "azd up",
-                output="Retryable error message: Cannot connect to the Docker daemon",
-            ),
-            MagicMock(returncode=0, stdout="azd up success"),
+            (0, "azd package success"),
+            (0, "azd provision success"),
+            (1, "Retryable error message: Cannot connect to the Docker daemon"),
+            (0, "azd deploy success"),
         ]
         mock_list_resources.return_value = None
         validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
         validator.validate()
-        # Check that runCommand was called 3 times
+        # Provisioning is not repeated
         self.assertTrue(validator.result)
         self.assertIn(Signs.CHECK, validator.resultMessage)
-        self.assertEqual(mock_runCommand.call_count, 3)
-        self.assertEqual(mock_list_resources.call_count, 3)
+        self.assertEqual(
+            [call.args[0] for call in mock_runCommand.call_args_list],
+            UP_PHASE_COMMANDS + [UP_PHASE_COMMANDS[2]],
+        )
+        self.assertIn("azd deploy #1 failed", validator.resultMessage)
+        self.assertIn("azd deploy #2 passed", validator.resultMessage)
+        self.assertEqual(mock_list_resources.call_count, 1)
+        mock_sleep.assert_called_once()
 
+    @patch("retry_policy.time.sleep")
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
+    @patch("validator.azd_validator.run_command")
     def test_validate_retry_logic_finally_failed(
-        self, mock_runCommand, mock_list_resources
+        self, mock_runCommand, mock_list_resources, mock_sleep
     ):
         # Simulate a retryable error
         mock_runCommand.side_effect = [
-            subprocess.CalledProcessError(
-                1,
-                "azd up",
-                output="Retryable error message: Cannot connect to the Docker daemon",
-            ),
-            subprocess.CalledProcessError(
-                1,
-                "azd up",
-                output="Retryable error message: Cannot connect to the Docker daemon",
-            ),
-            subprocess.CalledProcessError(
-                1,
-                "azd up",
-                output="Retryable error message: Cannot connect to the Docker daemon",
-            ),
-            subprocess.CalledProcessError(
-                1,
-                "azd up",
-                output="Retryable error message: Cannot connect to the Docker daemon",
-            ),
+            (1, "Retryable error message: Cannot connect to the Docker daemon"),
+            (1, "Retryable error message: Cannot connect to the Docker daemon"),
+            (1, "Retryable error message: Cannot connect to the Docker daemon"),
+            (0, "azd up success"),
         ]
         mock_list_resources.return_value = None
         validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
         validator.validate()
-        # Check that runCommand was called 4 times
+        # Three attempts in total, no extra run after the last retry
         self.assertFalse(validator.result)
-        self.assertEqual(mock_runCommand.call_count, 4)
+        self.assertEqual(mock_runCommand.call_count, 3)
         self.assertIn(Signs.BLOCK, validator.resultMessage)
         self.assertIn("Cannot connect to the Docker daemon", validator.resultMessage)
-        self.assertEqual(mock_list_resources.call_count, 4)
+        self.assertIn("Attempts: azd package #1 failed", validator.resultMessage)
+        self.assertEqual(mock_list_resources.call_count, 1)
+        self.assertEqual(mock_sleep.call_count, 2)
 
+    @patch("retry_policy.time.sleep")
     @patch("validator.azd_validator.AzdValidator.list_resources")
-    @patch("subprocess.run")
+    @patch("validator.azd_validator.run_command")
+    def test_known_failure_stops_retries(
+        self, mock_run, mock_list_resources, mock_sleep
+    ):
+        def run(command, cwd, log_path, on_line, **kwargs):
+            on_line("Error BCP332: The provided value (whose length will always be")
+            on_line(
+                " greater than or equal to 15) is too long to assign to a target for which the maximum allowable length is 10\n"
+            )
+            return 1, "Cannot connect to the Docker daemon"
+
+        mock_run.side_effect = run
+        validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
+        validator.validate()
+        # The output ends with a transient error, but the known cause is not transient
+        self.assertFalse(validator.result)
+        self.assertEqual(mock_run.call_count, 1)
+        mock_sleep.assert_not_called()
+        self.assertIn("Known issue", validator.resultMessage)
+        self.assertIn("maxLength", validator.resultMessage)
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_validate_resumes_at_failed_phase(self, mock_run, mock_list_resources):
+        mock_run.side_effect = [
+            (0, "azd package success"),
+            (1, "InvalidTemplateDeployment"),
+            (0, "azd provision success"),
+            (0, "azd deploy success"),
+        ]
+        validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
+        validator.validate()
+        self.assertFalse(validator.result)
+        self.assertIn("azd provision", validator.resultMessage)
+        validator.validate()
+        self.assertTrue(validator.result)
+        self.assertEqual(
+            [call.args[0] for call in mock_run.call_args_list],
+            UP_PHASE_COMMANDS[:2] + UP_PHASE_COMMANDS[1:],
+        )
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_azd_up_with_up_hooks(self, mock_run, mock_list_resources):
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "azure.yaml"), "w") as file:
+                file.write("name: app\nhooks:\n  postup:\n    run: ./seed.sh\n")
+            mock_run.return_value = (0, "azd up success")
+            validator = AzdValidator("AzdUpCatalog", folder, AzdCommand.UP)
+            validator.validate()
+        self.assertTrue(validator.result)
+        mock_run.assert_called_once()
+        self.assertEqual(mock_run.call_args.args[0], "azd up --no-prompt")
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_validate_no_retry_on_other_failures(
+        self, mock_runCommand, mock_list_resources
+    ):
+        mock_runCommand.return_value = (1, "InvalidTemplateDeployment")
+        validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
+        validator.validate()
+        self.assertFalse(validator.result)
+        self.assertEqual(mock_runCommand.call_count, 1)
+        self.assertEqual(len(validator.attempts), 1)
+        self.assertNotIn("Attempts:", validator.resultMessage)
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
     def test_replace_backslashes_in_output(self, mock_runCommand, mock_list_resources):
         # Simulate subprocess output with backslashes
-        mock_runCommand.side_effect = subprocess.CalledProcessError(
-            1, "azd down", output='azd down failed with \\"error\\": \\"message\\"'
+        mock_runCommand.return_value = (
+            1,
+            'azd down failed with \\"error\\": \\"message\\"',
         )
         mock_list_resources.return_value = None
 
@@ -165,9 +238,75 @@ class TestAzdValidator(unittest.TestCase):
         self.assertEqual(mock_runCommand.call_count, 1)
         self.assertEqual(mock_list_resources.call_count, 1)
 
+    @patch.dict("os.environ", {"AZURE_ENV_NAME": "myenv"})
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_azd_up_own_environment(self, mock_run, mock_list_resources):
+        mock_run.return_value = (0, "azd up success")
+        validator = AzdValidator(
+            "AzdUpCatalog", "app1", AzdCommand.UP, envName="myenv-1"
+        )
+        validator.validate()
+        self.assertTrue(validator.result)
+        env = mock_run.call_args.kwargs["env"]
+        self.assertEqual(env["AZURE_ENV_NAME"], "myenv-1")
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_azd_output_prefixed_with_folder(self, mock_run, mock_list_resources):
+        mock_run.return_value = (0, "azd down success")
+        AzdValidator("AzdDownCatalog", "app1", AzdCommand.DOWN).validate()
+        self.assertTrue(mock_run.call_args.kwargs["prefix"].startswith("[azd down"))
+        self.assertIn("in app1] ", mock_run.call_args.kwargs["prefix"])
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_azd_up_timeout(self, mock_run, mock_list_resources):
+        mock_run.side_effect = subprocess.TimeoutExpired(
+            "azd up --no-prompt", 60, output="Provisioning..."
+        )
+        validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP, timeout=60)
+        validator.validate()
+        self.assertFalse(validator.result)
+        self.assertIn(Signs.BLOCK, validator.resultMessage)
+        self.assertIn("Provisioning...", validator.resultMessage)
+        self.assertIn("Timed out after 60 seconds.", validator.resultMessage)
+        self.assertLessEqual(mock_run.call_args.kwargs["timeout"], 60)
+        self.assertEqual(mock_run.call_count, 1)
+
+    def test_time_budget(self):
+        validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP)
+        self.assertIsNone(validator.time_budget())
+        validator.timeout = 60
+        self.assertEqual(validator.time_budget(), 60)
+        validator.deadline = time.monotonic() + 10
+        self.assertLessEqual(validator.time_budget(), 10)
+        validator.deadline = time.monotonic() - 10
+        self.assertEqual(validator.time_budget(), 0)
+
     @patch("validator.azd_validator.list_resources")
     @patch("subprocess.run")
-    def test_list_resources(self, mock_run, mock_list_resources):
+    def test_list_resources_from_env_files(self, mock_run, mock_list_resources):
+        mock_list_resources.return_value = (["resource1"], ["deployment1"])
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, ".azure", "dev"))
+            with open(os.path.join(folder, ".azure", "config.json"), "w") as file:
+                file.write('{"version": 1, "defaultEnvironment": "dev"}')
+            with open(os.path.join(folder, ".azure", "dev", ".env"), "w") as file:
+                file.write(
+                    'AZURE_RESOURCE_GROUP="rg-dev"\nAZURE_SUBSCRIPTION_ID="sub-id"\n'
+                )
+            validator = AzdValidator("AzdUpCatalog", folder, AzdCommand.UP)
+            with patch.dict("os.environ"):
+                os.environ.pop("AZURE_ENV_NAME", None)
+                validator.list_resources()
+        mock_run.assert_not_called()
+        mock_list_resources.assert_called_once_with("rg-dev", "sub-id")
+
+    @patch("azd_env.load_azd_env", return_value=None)
+    @patch("validator.azd_validator.list_resources")
+    @patch("subprocess.run")
+    def test_list_resources(self, mock_run, mock_list_resources, mock_load_azd_env):
         # Mock the subprocess calls for resource group and subscription ID
         mock_run.side_effect = [
             MagicMock(returncode=0, stdout="mocked-resource-group"),
@@ -189,12 +328,16 @@ class TestAzdValidator(unittest.TestCase):
             shell=True,
             text=True,
             capture_output=True,
+            cwd=".",
+            check=False,
         )
         mock_run.assert_any_call(
             "azd env get-value AZURE_SUBSCRIPTION_ID",
             shell=True,
             text=True,
             capture_output=True,
+            cwd=".",
+            check=False,
         )
 
         # Check that the list_resources function was called with the correct arguments
@@ -210,5 +353,203 @@ class TestAzdValidator(unittest.TestCase):
         self.assertIn(expected_result, result)
 
 
+class TestAzdDeploymentCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        with open(os.path.join(self.folder.name, "azure.yaml"), "w") as file:
+            file.write("name: app\n")
+        os.mkdir(os.path.join(self.folder.name, "infra"))
+        self.cacheDir = os.path.join(self.folder.name, ".cache")
+
+    def make_cycle(self, force=False):
+        cache = DeploymentCache(self.cacheDir, force)
+        up = AzdValidator("AzdUpCatalog", self.folder.name, AzdCommand.UP, cache=cache)
+        test = PlaywrightTestValidator("TestCatalog", self.folder.name)
+        test.dependencies.append(up)
+        down = AzdValidator(
+            "AzdDownCatalog", self.folder.name, AzdCommand.DOWN, cache=cache
+        )
+        down.dependencies.extend([up, test])
+        return [up, test, down]
+
+    @patch("validator.playwright_test_validator.run_command")
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_unchanged_folder_is_a_cached_pass(
+        self, mock_run, mock_list_resources, mock_test_run
+    ):
+        mock_run.return_value = (0, "success")
+        mock_test_run.return_value = (0, "1 passed")
+        for validator in self.make_cycle():
+            validator.validate()
+            self.assertTrue(validator.result)
+        self.assertEqual(mock_run.call_count, 4)
+
+        mock_run.reset_mock()
+        mock_test_run.reset_mock()
+        for validator in self.make_cycle():
+            validator.validate()
+            self.assertTrue(validator.result)
+            self.assertTrue(validator.cachedPass)
+            self.assertIn("cached pass", validator.resultMessage)
+        mock_run.assert_not_called()
+        mock_test_run.assert_not_called()
+
+        # Forcing deploys again
+        for validator in self.make_cycle(force=True):
+            validator.validate()
+            self.assertFalse(validator.cachedPass)
+        self.assertEqual(mock_run.call_count, 4)
+
+    @patch("validator.playwright_test_validator.run_command")
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    @patch("validator.azd_validator.run_command")
+    def test_failed_cycle_is_not_cached(
+        self, mock_run, mock_list_resources, mock_test_run
+    ):
+        mock_run.return_value = (0, "success")
+        mock_test_run.return_value = (1, "1 failed")
+        for validator in self.make_cycle():
+            validator.validate()
+        self.assertFalse(os.path.exists(self.cacheDir))
+
+        mock_test_run.return_value = (0, "1 passed")
+        up, _test, _down = self.make_cycle()
+        up.validate()
+        self.assertFalse(up.cachedPass)
+
+
+# A fake azd that logs when each phase starts and ends and sleeps in between
+FAKE_AZD = """#!{python}
+import os, sys, time
+phase = sys.argv[1]
+def event(kind):
+    with open(os.environ["FAKE_AZD_EVENTS"], "a") as file:
+        file.write(f"{{time.monotonic()}} {{phase}} {{kind}}\\n")
+event("start")
+print(f"{{phase}} running", flush=True)
+time.sleep(float(os.environ.get("FAKE_AZD_" + phase.upper() + "_SECONDS", "0")))
+event("end")
+sys.exit(int(os.environ.get("FAKE_AZD_" + phase.upper() + "_EXIT", "0")))
+"""
+
+
+@unittest.skipIf(os.name == "nt", "the fake azd is a shebang script")
+class TestAzdPipeline(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        bin_dir = os.path.join(self.folder.name, "bin")
+        os.mkdir(bin_dir)
+        azd = os.path.join(bin_dir, "azd")
+        with open(azd, "w") as file:
+            file.write(FAKE_AZD.format(python=sys.executable))
+        os.chmod(azd, 0o755)
+        self.events = os.path.join(self.folder.name, "events.log")
+        self.logDir = os.path.join(self.folder.name, "logs")
+        os.mkdir(self.logDir)
+        environ = patch.dict(
+            "os.environ",
+            {
+                "PATH": bin_dir + os.pathsep + os.environ["PATH"],
+                "FAKE_AZD_EVENTS": self.events,
+                "AZURE_ENV_NAME": "pipeline",
+                "FAKE_AZD_PACKAGE_SECONDS": "0.5",
+                "FAKE_AZD_PROVISION_SECONDS": "0.5",
+            },
+        )
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def read_events(self):
+        with open(self.events) as file:
+            return {
+                (phase, kind): float(time)
+                for time, phase, kind in (line.split() for line in file)
+            }
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    def test_package_and_provision_overlap(self, mock_list_resources):
+        validator = AzdValidator(
+            "AzdUpCatalog", ".", AzdCommand.UP, logDir=self.logDir, pipelined=True
+        )
+        validator.validate()
+        self.assertTrue(validator.result)
+        events = self.read_events()
+        self.assertLess(events["package", "start"], events["provision", "end"])
+        self.assertLess(events["provision", "start"], events["package", "end"])
+        self.assertGreater(events["deploy", "start"], events["package", "end"])
+        self.assertGreater(events["deploy", "start"], events["provision", "end"])
+        # The environment exists before the two phases that would race to create it
+        self.assertLessEqual(events["env", "end"], events["package", "start"])
+        self.assertLessEqual(events["env", "end"], events["provision", "start"])
+        # Every phase keeps its own log
+        for phase in ("package", "provision", "deploy"):
+            with open(log_file_path(f"azd {phase}", self.logDir)) as file:
+                self.assertIn(f"{phase} running", file.read())
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    def test_sequential_by_default(self, mock_list_resources):
+        validator = AzdValidator("AzdUpCatalog", ".", AzdCommand.UP, logDir=self.logDir)
+        validator.validate()
+        self.assertTrue(validator.result)
+        events = self.read_events()
+        self.assertLessEqual(events["package", "end"], events["provision", "start"])
+
+    @patch.dict("os.environ", {"FAKE_AZD_PACKAGE_EXIT": "1"})
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    def test_failed_package_skips_deploy(self, mock_list_resources):
+        validator = AzdValidator(
+            "AzdUpCatalog", ".", AzdCommand.UP, logDir=self.logDir, pipelined=True
+        )
+        validator.validate()
+        self.assertFalse(validator.result)
+        self.assertIn("azd package", validator.resultMessage)
+        self.assertNotIn("azd provision", validator.resultMessage)
+        events = self.read_events()
+        self.assertIn(("provision", "end"), events)
+        self.assertNotIn(("deploy", "start"), events)
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    def test_pipeline_uses_the_default_environment(self, mock_list_resources):
+        template = os.path.join(self.folder.name, "template")
+        os.makedirs(os.path.join(template, ".azure", "dev"))
+        with open(os.path.join(template, ".azure", "dev", ".env"), "w") as file:
+            file.write('AZURE_ENV_NAME="dev"\n')
+        with open(os.path.join(template, ".azure", "config.json"), "w") as file:
+            file.write('{"defaultEnvironment": "dev"}')
+        with patch.dict("os.environ"):
+            del os.environ["AZURE_ENV_NAME"]
+            validator = AzdValidator(
+                "AzdUpCatalog",
+                template,
+                AzdCommand.UP,
+                logDir=self.logDir,
+                pipelined=True,
+            )
+            validator.validate()
+        self.assertTrue(validator.result)
+        self.assertNotIn(("env", "start"), self.read_events())
+
+    @patch("validator.azd_validator.AzdValidator.list_resources")
+    def test_pipeline_without_environment_name(self, mock_list_resources):
+        template = os.path.join(self.folder.name, "template")
+        os.mkdir(template)
+        with patch.dict("os.environ"):
+            del os.environ["AZURE_ENV_NAME"]
+            validator = AzdValidator(
+                "AzdUpCatalog",
+                template,
+                AzdCommand.UP,
+                logDir=self.logDir,
+                pipelined=True,
+            )
+            validator.validate()
+        self.assertFalse(validator.result)
+        self.assertIn("Set AZURE_ENV_NAME", validator.resultMessage)
+        self.assertFalse(os.path.exists(self.events))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,156 @@
+import json
+import random
+from bicep_params import (
+    ParameterIndex,
+    allowed_values,
+    main,
+    placeholder_env,
+)
+
+MAIN_BICEP = """targetScope = 'subscription'
+
+// The name of the environment
+@minLength(1)
+@description('Name of the (azd) environment')
+param environmentName string
+
+@allowed([
+  'S0'
+  'S1' // The larger one
+])
+#disable-next-line no-unused-params
+param openAiSku string
+
+@allowed(['Standard', 'Premium'])
+param searchTier string
+param location string = 'eastus' // pinned
+param tags object?
+param kind 'web' | 'api'
+param settings object = {
+  name: '${toLower('App')}-{0}'
+  sizes: [1, 2]
+}
+@secure()
+param adminPassword string
+module resources 'resources.bicep' = {
+  name: 'resources'
+}
+// module commented 'commented.bicep' = {}
+module site 'br/public:avm/res/web/site:0.3.0' = {
+  name: 'site'
+}
+var script = '''
+param notAParameter string
+'''
+@sys.description('Tokens per minute, in thousands')
+param gptCapacity int
+param searchEnabled bool
+"""
+
+PARAMETERS = {
+    "environmentName": {"value": "${AZURE_ENV_NAME}"},
+    "openAiSku": {"value": "${AZURE_OPENAI_SKU}"},
+    "searchTier": {"value": "${SEARCH_TIER}"},
+    "kind": {"value": "${APP_KIND}=web"},
+    "adminPassword": {"value": "${ADMIN_PASSWORD}"},
+    "gptCapacity": {"value": "${GPT_CAPACITY}"},
+    "searchEnabled": {"value": "${SEARCH_ENABLED}"},
+    "location": {"value": "${AZURE_LOCATION}"},
+}
+
+
+def test_parameter_index():
+    index = ParameterIndex(MAIN_BICEP)
+    assert index.targetScope == "subscription"
+    assert index.modules == ["resources.bicep", "br/public:avm/res/web/site:0.3.0"]
+    assert list(index.parameters) == [
+        "environmentName",
+        "openAiSku",
+        "searchTier",
+        "location",
+        "tags",
+        "kind",
+        "settings",
+        "adminPassword",
+        "gptCapacity",
+        "searchEnabled",
+    ]
+    environmentName = index.parameters["environmentName"]
+    assert environmentName.type == "string"
+    assert environmentName.line == 6
+    assert environmentName.decorators == {
+        "minLength": "1",
+        "description": "'Name of the (azd) environment'",
+    }
+    assert index.parameters["location"].default == "'eastus'"
+    assert index.parameters["settings"].default.endswith("sizes: [1, 2]\n}")
+    assert index.parameters["gptCapacity"].decorators == {
+        "description": "'Tokens per minute, in thousands'"
+    }
+    assert [parameter.name for parameter in index.required()] == [
+        "environmentName",
+        "openAiSku",
+        "searchTier",
+        "kind",
+        "adminPassword",
+        "gptCapacity",
+        "searchEnabled",
+    ]
+
+
+def test_declarations():
+    index = ParameterIndex(
+        "@secure()\noutput key string = 'k'\n"
+        "resource site 'Microsoft.Web/sites@2022-09-01' = {\n  name: 'site'\n}\n"
+    )
+    assert [
+        (declaration.keyword, declaration.tokens[0].text, declaration.decorators)
+        for declaration in index.declarations
+    ] == [("output", "key", {"secure": ""}), ("resource", "site", {})]
+    assert [declaration.line for declaration in index.declarations] == [2, 3]
+    # The newlines inside brackets separate the properties
+    assert [token.text for token in index.declarations[1].tokens].count("\n") == 2
+
+
+def test_allowed_values():
+    index = ParameterIndex(MAIN_BICEP)
+    assert allowed_values(index.parameters["openAiSku"]) == ["'S0'", "'S1'"]
+    assert allowed_values(index.parameters["searchTier"]) == ["'Standard'", "'Premium'"]
+    assert allowed_values(index.parameters["kind"]) == ["'web'", "'api'"]
+    assert allowed_values(index.parameters["environmentName"]) == []
+
+
+def test_placeholder_env():
+    env = placeholder_env(ParameterIndex(MAIN_BICEP), PARAMETERS, random.Random(0))
+    assert [key for key, _ in env] == [
+        "AZURE_OPENAI_SKU",
+        "SEARCH_TIER",
+        "ADMIN_PASSWORD",
+        "GPT_CAPACITY",
+        "SEARCH_ENABLED",
+    ]
+    values = dict(env)
+    assert values["AZURE_OPENAI_SKU"] == "S0"
+    assert values["SEARCH_TIER"] == "Standard"
+    assert values["GPT_CAPACITY"] == "10"
+    assert values["SEARCH_ENABLED"] == "false"
+    assert len(values["ADMIN_PASSWORD"]) == 15
+    assert values["ADMIN_PASSWORD"][0].isupper()
+
+
+def test_main(tmp_path, capsys):
+    (tmp_path / "main.bicep").write_text(MAIN_BICEP)
+    (tmp_path / "main.parameters.json").write_text(
+        json.dumps({"parameters": PARAMETERS})
+    )
+    assert main(["table", str(tmp_path / "main.bicep")]) == 0
+    table = json.loads(capsys.readouterr().out)
+    assert table["parameters"][1]["allowed"] == ["'S0'", "'S1'"]
+    assert not table["parameters"][3]["required"]
+
+    parametersPath = str(tmp_path / "main.parameters.json")
+    assert (
+        main(["env", str(tmp_path / "main.bicep"), "--parameters", parametersPath]) == 0
+    )
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[:2] == ["AZURE_OPENAI_SKU=S0", "SEARCH_TIER=Standard"]
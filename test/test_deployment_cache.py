@@ -0,0 +1,86 @@
+import os
+import pytest
+from deployment_cache import DeploymentCache, deployment_inputs
+from repo_index import hash_files
+
+AZURE_YAML = """name: app
+infra:
+  path: deploy
+services:
+  api:
+    project: ./src/api
+    host: containerapp
+"""
+
+
+TEMPLATE = {
+    "azure.yaml": AZURE_YAML,
+    "deploy/main.bicep": "param location string\n",
+    "src/api/app.py": "print('api')\n",
+    "src/api/node_modules/dep.js": "1",
+    "README.md": "# App\n",
+}
+
+
+def test_deployment_inputs(template):
+    assert deployment_inputs(str(template)) == ["azure.yaml", "deploy", "./src/api"]
+
+
+def test_deployment_inputs_defaults(tmp_path):
+    (tmp_path / "azure.yml").write_text("name: app\n")
+    assert deployment_inputs(str(tmp_path)) == ["azure.yml", "infra"]
+    with pytest.raises(FileNotFoundError):
+        deployment_inputs(str(tmp_path / "missing"))
+
+
+def test_key_ignores_unrelated_files(template, monkeypatch):
+    monkeypatch.delenv("AZURE_LOCATION", raising=False)
+    cache = DeploymentCache(str(template / ".cache"))
+    key = cache.key(str(template))
+    (template / "README.md").write_text("# App, now documented\n")
+    (template / "src" / "api" / "node_modules" / "dep.js").write_text("2")
+    assert cache.key(str(template)) == key
+
+    (template / "deploy" / "main.bicep").write_text("param location string = 'x'\n")
+    changed = cache.key(str(template))
+    assert changed != key
+    (template / "src" / "api" / "app.py").write_text("print('api v2')\n")
+    assert cache.key(str(template)) != changed
+
+
+def test_key_covers_run_settings_and_extra_paths(template, monkeypatch):
+    cache = DeploymentCache(str(template / ".cache"))
+    monkeypatch.setenv("AZURE_LOCATION", "eastus")
+    key = cache.key(str(template))
+    monkeypatch.setenv("AZURE_LOCATION", "westus")
+    assert cache.key(str(template)) != key
+    assert cache.key(str(template), envName="env-1") != cache.key(str(template))
+
+    (template / "tests").mkdir()
+    (template / "tests" / "app.spec.ts").write_text("test()")
+    assert cache.key(str(template), [str(template / "tests")]) != cache.key(
+        str(template)
+    )
+
+
+def test_hash_files_renames(tmp_path):
+    (tmp_path / "a.txt").write_text("same")
+    before = hash_files(str(tmp_path), ["."])
+    os.rename(tmp_path / "a.txt", tmp_path / "b.txt")
+    assert hash_files(str(tmp_path), ["."]) != before
+
+
+def test_store_and_lookup(tmp_path):
+    cache = DeploymentCache(str(tmp_path / "cache"))
+    assert cache.lookup("abc") is None
+    cache.store("abc", "app")
+    record = cache.lookup("abc")
+    assert record["folder"] == "app"
+    assert "time" in record
+    assert DeploymentCache(str(tmp_path / "cache"), force=True).lookup("abc") is None
+
+
+def test_lookup_ignores_broken_record(tmp_path):
+    cache = DeploymentCache(str(tmp_path))
+    (tmp_path / "abc.json").write_text("{not json")
+    assert cache.lookup("abc") is None
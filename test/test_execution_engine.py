@@ -1,9 +1,14 @@
+import logging
+import time
+import threading
 import unittest
 from unittest.mock import MagicMock
 from execution_engine import ExecutionEngine
 from validator.file_validator import FileValidator
 from validator.azd_validator import AzdValidator
+from validator.preflight_validator import PreflightValidator
 from severity import Severity
+from constants import Signs
 
 
 class TestExecutionEngine(unittest.TestCase):
@@ -37,6 +42,282 @@ class TestExecutionEngine(unittest.TestCase):
             results[1], ("AzdValidator", Severity.HIGH, True, "Azd validation passed.")
         )
 
+    def test_execute_validators_concurrently_keeps_order(self):
+        running = []
+        lock = threading.Lock()
+        peak = [0]
+
+        def make_validator(index, parallelSafe=True):
+            validator = MagicMock(spec=FileValidator)
+            validator.catalog = f"catalog{index}"
+            validator.severity = Severity.LOW
+            validator.parallelSafe = parallelSafe
+
+            def validate():
+                with lock:
+                    running.append(index)
+                    peak[0] = max(peak[0], len(running))
+                # Later validators finish first
+                time.sleep(0.01 * (5 - index % 5))
+                with lock:
+                    running.remove(index)
+                if index == 3:
+                    raise RuntimeError("validator 3 failed")
+                validator.result = True
+                validator.resultMessage = f"message{index}"
+
+            validator.validate.side_effect = validate
+            return validator
+
+        validators = [make_validator(i, parallelSafe=i != 4) for i in range(8)]
+        serial_results = ExecutionEngine(validators).execute()
+        parallel_results = ExecutionEngine(validators, jobs=4).execute()
+
+        self.assertEqual(parallel_results, serial_results)
+        self.assertEqual(
+            parallel_results[3], ("catalog3", Severity.LOW, False, "validator 3 failed")
+        )
+        self.assertEqual(
+            parallel_results[0], ("catalog0", Severity.LOW, True, "message0")
+        )
+        self.assertGreater(peak[0], 1)
+
+    def test_concurrent_output_is_written_in_blocks(self):
+        def make_validator(name):
+            validator = MagicMock(spec=AzdValidator)
+            validator.catalog = name
+            validator.severity = Severity.LOW
+            validator.parallelSafe = True
+            validator.title.return_value = name
+
+            def validate():
+                for index in range(3):
+                    if validator.outputBuffer is None:
+                        logging.info(f"{name}{index}")
+                    else:
+                        validator.outputBuffer.write(f"{name}{index}\n")
+                    time.sleep(0.01)
+                validator.result = True
+
+            validator.validate.side_effect = validate
+            return validator
+
+        validators = [make_validator("a"), make_validator("b")]
+        with self.assertLogs(level="INFO") as logs:
+            ExecutionEngine(validators, jobs=2).execute()
+        blocks = [logs.output[index : index + 4] for index in (0, 4)]
+        self.assertCountEqual(
+            [[line.split(":", 2)[-1] for line in block] for block in blocks],
+            [["Output of a:", "a0", "a1", "a2"], ["Output of b:", "b0", "b1", "b2"]],
+        )
+
+        # Run one at a time, the output is not held back
+        with self.assertLogs(level="INFO") as logs:
+            ExecutionEngine(validators).execute()
+        self.assertEqual(len(logs.output), 6)
+
+    def test_execute_respects_dependencies(self):
+        calls = []
+        lock = threading.Lock()
+
+        def make_validator(name, parallelSafe=True):
+            validator = MagicMock(spec=AzdValidator)
+            validator.catalog = name
+            validator.severity = Severity.LOW
+            validator.parallelSafe = parallelSafe
+            validator.dependencies = []
+
+            def validate():
+                with lock:
+                    calls.append(("start", name))
+                time.sleep(0.01)
+                with lock:
+                    calls.append(("end", name))
+                validator.result = True
+                validator.resultMessage = name
+
+            validator.validate.side_effect = validate
+            return validator
+
+        up1 = make_validator("up1", False)
+        up2 = make_validator("up2", False)
+        down1 = make_validator("down1", False)
+        down2 = make_validator("down2", False)
+        test1 = make_validator("test1")
+        down1.dependencies = [up1, test1]
+        test1.dependencies = [up1]
+        down2.dependencies = [up2]
+        validators = [down1, down2, test1, up1, up2]
+
+        for jobs in (1, 4):
+            calls.clear()
+            results = ExecutionEngine(validators, jobs=jobs).execute()
+            self.assertEqual(
+                [result[3] for result in results],
+                ["down1", "down2", "test1", "up1", "up2"],
+            )
+            for before, after in [
+                ("up1", "test1"),
+                ("test1", "down1"),
+                ("up2", "down2"),
+            ]:
+                self.assertLess(
+                    calls.index(("end", before)), calls.index(("start", after))
+                )
+            # Validators that are not parallelSafe never overlap
+            exclusive = [
+                call for call in calls if call[1] in ("up1", "up2", "down1", "down2")
+            ]
+            self.assertEqual([kind for kind, _ in exclusive], ["start", "end"] * 4)
+
+    def test_execute_exclusive_jobs_cap(self):
+        lock = threading.Lock()
+        running = []
+        peak = [0]
+
+        def make_validator(name):
+            validator = MagicMock(spec=AzdValidator)
+            validator.catalog = name
+            validator.severity = Severity.LOW
+            validator.parallelSafe = False
+            validator.dependencies = []
+
+            def validate():
+                with lock:
+                    running.append(name)
+                    peak[0] = max(peak[0], len(running))
+                time.sleep(0.02)
+                with lock:
+                    running.remove(name)
+                validator.result = True
+                validator.resultMessage = name
+
+            validator.validate.side_effect = validate
+            return validator
+
+        validators = [make_validator(f"up{i}") for i in range(6)]
+        results = ExecutionEngine(validators, exclusive_jobs=2).execute()
+        self.assertEqual(
+            [result[3] for result in results], [f"up{i}" for i in range(6)]
+        )
+        self.assertEqual(peak[0], 2)
+
+    def test_execute_after_deadline(self):
+        file_validator = MagicMock(spec=FileValidator)
+        file_validator.catalog = "FileValidator"
+        file_validator.severity = Severity.MODERATE
+        file_validator.parallelSafe = True
+        file_validator.dependencies = []
+        file_validator.result = True
+        file_validator.resultMessage = "File validation passed."
+
+        azd_validator = MagicMock(spec=AzdValidator)
+        azd_validator.catalog = "AzdValidator"
+        azd_validator.severity = Severity.HIGH
+        azd_validator.parallelSafe = False
+        azd_validator.dependencies = []
+
+        deadline = time.monotonic() - 1
+        results = ExecutionEngine(
+            [file_validator, azd_validator], deadline=deadline
+        ).execute()
+
+        # Static validators still run, commands are reported without being started
+        file_validator.validate.assert_called_once()
+        azd_validator.validate.assert_not_called()
+        self.assertEqual(azd_validator.deadline, deadline)
+        self.assertEqual(
+            results[0],
+            ("FileValidator", Severity.MODERATE, True, "File validation passed."),
+        )
+        self.assertFalse(results[1][2])
+        self.assertIn("AzdValidator was not run", results[1][3])
+        self.assertIn(Signs.BLOCK, results[1][3])
+
+    def test_failed_prerequisite_skips_validator(self):
+        preflight = PreflightValidator("functional_requirements", "missing-folder")
+
+        azd_validator = MagicMock(spec=AzdValidator)
+        azd_validator.catalog = "AzdValidator"
+        azd_validator.severity = Severity.HIGH
+        azd_validator.parallelSafe = False
+        azd_validator.dependencies = [preflight]
+        azd_validator.prerequisites = [preflight]
+        azd_validator.title.return_value = "azd up in app"
+
+        for jobs in (1, 2):
+            results = ExecutionEngine([azd_validator, preflight], jobs=jobs).execute()
+            azd_validator.validate.assert_not_called()
+            self.assertFalse(results[0][2])
+            self.assertIn("azd up in app was not run", results[0][3])
+            self.assertIn(
+                "azd pre-flight checks in missing-folder failed", results[0][3]
+            )
+            self.assertIn("No azure.yaml found in missing-folder", results[1][3])
+
+    def test_execute_background_validator(self):
+        teardown = threading.Event()
+
+        def make_validator(name, background=False):
+            validator = MagicMock(spec=AzdValidator)
+            validator.catalog = name
+            validator.severity = Severity.MODERATE
+            validator.parallelSafe = False
+            validator.background = background
+            validator.dependencies = []
+            validator.pending_message.return_value = f"{name} (teardown pending)"
+
+            def validate():
+                if background:
+                    teardown.wait(5)
+                validator.result = True
+                validator.resultMessage = f"{name} passed"
+
+            validator.validate.side_effect = validate
+            return validator
+
+        up = make_validator("up")
+        down = make_validator("down", True)
+        down.dependencies = [up]
+        static = MagicMock(spec=FileValidator)
+        static.catalog = "static"
+        static.severity = Severity.LOW
+        static.parallelSafe = True
+        static.dependencies = []
+        static.result = True
+        static.resultMessage = "static passed"
+
+        engine = ExecutionEngine([up, down, static])
+        results = engine.execute()
+        # Everything but the teardown is reported before it finished
+        self.assertEqual(results[0][3], "up passed")
+        self.assertIn("down (teardown pending)", results[1][3])
+        self.assertEqual(results[2][3], "static passed")
+        self.assertTrue(engine.has_background())
+
+        teardown.set()
+        results = engine.wait_background()
+        self.assertEqual(
+            [result[3] for result in results],
+            ["up passed", "down passed", "static passed"],
+        )
+        self.assertFalse(engine.has_background())
+
+    def test_execute_dependency_cycle(self):
+        first = MagicMock(spec=FileValidator)
+        second = MagicMock(spec=FileValidator)
+        first.dependencies = [second]
+        second.dependencies = [first]
+        with self.assertRaises(ValueError):
+            ExecutionEngine([first, second]).execute()
+
+    def test_execute_without_exclusive_jobs(self):
+        azd_validator = MagicMock(spec=AzdValidator)
+        azd_validator.parallelSafe = False
+        azd_validator.dependencies = []
+        with self.assertRaises(ValueError):
+            ExecutionEngine([azd_validator], jobs=2, exclusive_jobs=0).execute()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,8 @@
 import os
 import unittest
+from unittest.mock import patch
+from markdown_outline import read_outline
+from repo_index import RepoIndex
 from validator.file_validator import FileValidator
 from constants import ItemResultFormat, Signs
 from severity import Severity
@@ -214,5 +217,77 @@ def test_candidate_paths_conversion():
     assert validator.candidatePaths == expected_paths
 
 
+def test_file_validator_wildcard_candidate_path(tmp_path):
+    nested = tmp_path / "src" / "app"
+    nested.mkdir(parents=True)
+    for i in range(50):
+        (nested / f"file{i}.txt").write_text("")
+    (nested / "Azure.YAML").write_text("")
+    validator = FileValidator(
+        "TestCatalog", "azure", [".yml", ".yaml"], str(tmp_path), ["*"], None, False
+    )
+    result, message = validator.validate()
+    assert result is True
+    assert message == ItemResultFormat.PASS.format(message="azure.yml File")
+
+    validator = FileValidator(
+        "TestCatalog", "azure", [".yml", ".yaml"], str(tmp_path), ["*"], None, True
+    )
+    result, _ = validator.validate()
+    assert result is False
+
+
+def test_file_validator_rule_exclude(tmp_path):
+    (tmp_path / "samples").mkdir()
+    (tmp_path / "samples" / "azure.yaml").write_text("")
+    validator = FileValidator(
+        "TestCatalog",
+        "azure",
+        [".yaml"],
+        str(tmp_path),
+        ["*"],
+        exclude=["samples"],
+    )
+    result, _ = validator.validate()
+    assert result is False
+
+
+def test_file_validator_exact_heading(tmp_path):
+    (tmp_path / "README.md").write_text(
+        "# Title\n## Features\n```\n## Resources\n```\nSee ## Guidance\n"
+    )
+    repo_index = RepoIndex(str(tmp_path))
+    validators = [
+        FileValidator(
+            "TestCatalog",
+            "README",
+            [".md"],
+            str(tmp_path),
+            ["."],
+            tags,
+            repoIndex=repo_index,
+            exactHeading=True,
+        )
+        for tags in (["## Features"], ["## Resources", "## Guidance"])
+    ]
+    with patch("repo_index.read_outline", wraps=read_outline) as mock_read:
+        results = [validator.validate() for validator in validators]
+    mock_read.assert_called_once()
+    assert results[0][0] is True
+    assert results[1][0] is False
+    assert "## Resources is missing in README.md." in results[1][1]
+    assert "## Guidance is missing in README.md." in results[1][1]
+
+
+def test_file_validator_compile_matcher():
+    validator = FileValidator(
+        "TestCatalog", "README", [".md", ""], "root", [".", ".github"], None, False
+    )
+    matchAnyFolder, candidateFolders, candidateFiles = validator.compile_matcher()
+    assert matchAnyFolder is False
+    assert candidateFolders == {"root", os.path.join("root", ".github")}
+    assert candidateFiles == ["readme.md", "readme"]
+
+
 if __name__ == "__main__":
     unittest.main()
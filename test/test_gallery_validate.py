@@ -1,8 +1,11 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch
 import argparse
-from gallery_validate import main
+from gallery_validate import main, positive_int
 from severity import Severity
+from validator.validator_base import ValidatorBase
 
 
 class TestGalleryValidate(unittest.TestCase):
@@ -22,6 +25,19 @@ class TestGalleryValidate(unittest.TestCase):
             expected_topics=None,
             msdoresult="dummy_msdo_result_file",
             psrule_result="dummy_psrule_result_file",
+            exclude=None,
+            use_git_index=False,
+            jobs=1,
+            azd_concurrency=1,
+            azd_pipeline=False,
+            deploy_cache_dir=None,
+            force_deploy=False,
+            background_teardown=False,
+            teardown=False,
+            log_dir=None,
+            retry_budget=4,
+            deadline=None,
+            mi_prescan=False,
             output=None,
             debug=True,
         )
@@ -44,7 +60,9 @@ class TestGalleryValidate(unittest.TestCase):
         mock_parse_args.assert_called_once()
         mock_rule_parser.parse.assert_called_once()
 
-        MockExecutionEngine.assert_called_once_with(["validator1", "validator2"])
+        MockExecutionEngine.assert_called_once_with(
+            ["validator1", "validator2"], mock_rule_parser.repo_index, 1, 1, None
+        )
         mock_execution_engine.execute.assert_called_once()
 
         for result in expected_results:
@@ -56,6 +74,91 @@ class TestGalleryValidate(unittest.TestCase):
             mock_result_aggregator.generate_summary.return_value, "Summary"
         )
 
+    @patch("gallery_validate.RuleParser")
+    @patch("argparse.ArgumentParser.parse_args")
+    def test_main_background_teardown(self, mock_parse_args, MockRuleParser):
+        with tempfile.TemporaryDirectory() as folder:
+            output = os.path.join(folder, "output.log")
+            args = argparse.Namespace(
+                repo_path="dummy_repo_path",
+                validate_paths=None,
+                validate_azd=True,
+                validate_playwright_test=False,
+                topics=None,
+                expected_topics=None,
+                psrule_result=None,
+                exclude=None,
+                use_git_index=False,
+                jobs=1,
+                azd_concurrency=1,
+                azd_pipeline=False,
+                deploy_cache_dir=None,
+                force_deploy=False,
+                background_teardown=True,
+                teardown=False,
+                log_dir=None,
+                retry_budget=4,
+                deadline=None,
+                mi_prescan=False,
+                output=output,
+                debug=False,
+            )
+            mock_parse_args.return_value = args
+            runs = []
+
+            def parse():
+                # Each process builds its own validators
+                up = FakeValidator("azd up", Severity.HIGH, True, runs)
+                down = FakeValidator("azd down", Severity.MODERATE, False, runs)
+                down.background = True
+                down.dependencies = [up]
+                down.prerequisites = [up]
+                return [up, down]
+
+            MockRuleParser.return_value.parse.side_effect = parse
+            MockRuleParser.return_value.repo_index = None
+
+            main()
+            with open(output) as file:
+                first = file.read()
+            self.assertEqual(runs, ["azd up"])
+
+            args.teardown = True
+            main()
+            with open(output) as file:
+                second = file.read()
+
+        # The summary is written without running the teardown, then updated by it
+        self.assertIn("azd down pending", first)
+        self.assertIn("CONFORMING", first)
+        self.assertEqual(runs, ["azd up", "azd down"])
+        self.assertIn("azd down failed", second)
+        self.assertIn("NON-CONFORMING", second)
+
+
+class TestPositiveInt(unittest.TestCase):
+    def test_positive_int(self):
+        self.assertEqual(positive_int("4"), 4)
+        for value in ("0", "-1"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                positive_int(value)
+
+
+class FakeValidator(ValidatorBase):
+    def __init__(self, name, severity, passes, runs):
+        super().__init__(name, "functional_requirements", severity, False)
+        self.passes = passes
+        self.runs = runs
+
+    def pending_message(self):
+        return f"{self.name} pending"
+
+    def validate(self):
+        self.runs.append(self.name)
+        self.result = self.passes
+        self.resultMessage = f"{self.name} {'passed' if self.passes else 'failed'}"
+        return self.result, self.resultMessage
+
 
 if __name__ == "__main__":
     unittest.main()
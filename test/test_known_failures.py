@@ -0,0 +1,76 @@
+from known_failures import (
+    FailureClassifier,
+    KnownFailure,
+    default_classifier,
+    failure_details,
+    load_known_failures,
+)
+from retry_policy import RetryRule
+
+
+def test_load_known_failures():
+    failures = load_known_failures()
+    ids = [failure.id for failure in failures]
+    assert len(ids) == len(set(ids))
+    assert {"bcp332-max-length", "missing-principal-type", "tar-write-too-long"} <= set(
+        ids
+    )
+    assert all(isinstance(failure, KnownFailure) for failure in failures)
+
+
+def test_common_failures_are_not_retried():
+    classifier = default_classifier()
+    outputs = {
+        "Error BCP332: The provided value (whose length will always be greater than or equal to 15) is too long to assign to a target for which the maximum allowable length is 10": "maxLength",
+        "Principal 1234abcd does not exist in the directory 5678. Check that you have the correct principal ID.": "principalType",
+        "ERROR: error executing step command 'deploy --all': failed deploying service 'indexer': archive/tar: write too long": "packaging",
+    }
+    for output, reason in outputs.items():
+        retryable, found = classifier.classify(output)
+        assert not retryable
+        assert reason in found
+
+
+def test_transient_failures_are_retried():
+    classifier = default_classifier()
+    assert classifier.classify("Cannot connect to the Docker daemon at unix://")[0]
+    assert classifier.classify("Error: spawn ETXTBSY")[0]
+
+
+def test_non_transient_failure_wins():
+    classifier = default_classifier()
+    output = "Cannot connect to the Docker daemon\nInsufficientQuota: no capacity left"
+    assert classifier.classify(output) == (
+        False,
+        "the subscription has no quota left for a model deployment",
+    )
+
+
+def test_find_reports_each_failure_once_in_order():
+    classifier = FailureClassifier(
+        [RetryRule(r"beta \d+", False, "beta"), RetryRule(r"alpha", True, "alpha")]
+    )
+    found = classifier.find("alpha beta 1 alpha beta 2")
+    assert list(found.items()) == [(1, "alpha"), (0, "beta 1")]
+    assert FailureClassifier([]).find("anything") == {}
+
+
+def test_matcher_streams_partial_lines():
+    matcher = default_classifier().matcher()
+    matcher.batchSize = 8
+    # A line read in pieces, as run_command does for long lines
+    for piece in ("failed: archive/", "tar: write ", "too long\n", "done\n" * 10):
+        matcher.feed(piece)
+    assert [failure.id for failure, _ in matcher.results()] == ["tar-write-too-long"]
+
+
+def test_failure_details_quotes_match():
+    classifier = default_classifier()
+    matcher = classifier.matcher()
+    matcher.feed("Principal abc does not exist in the directory xyz.\n")
+    details = failure_details(matcher.results(), "tail of the output")
+    assert "Known issue" in details
+    assert "https://aka.ms/docs-principaltype" in details
+    assert "tail of the output" in details
+    # The message classifies like the output it was built from
+    assert classifier.classify(details)[1] == matcher.results()[0][0].reason
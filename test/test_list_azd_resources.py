@@ -0,0 +1,79 @@
+import time
+from azure.core.credentials import AccessToken
+from azure.mgmt.resource import ResourceManagementClient
+from fake_arm import CountingCredential, FakeArm, PlainBearerPolicy
+from list_azd_resources import CachedCredential, ClientPool, list_resources
+
+ACCOUNTS = {
+    f"ai-{index}": [
+        ("OpenAI", "Standard", "gpt-4o", "2024-08-06"),
+        ("OpenAI", "GlobalStandard", f"embedding-{index}", "1"),
+    ]
+    for index in range(12)
+}
+
+
+def fake_pool(arm, credential):
+    return ClientPool(
+        credential,
+        base_url=arm.url,
+        authentication_policy=PlainBearerPolicy(credential),
+        retry_total=0,
+    )
+
+
+def test_list_resources_against_fake_arm():
+    with FakeArm(
+        ACCOUNTS, ["Microsoft.Web/sites"] * 25, latency=0.05, pageSize=10
+    ) as arm:
+        credential = CachedCredential(CountingCredential())
+        pool = fake_pool(arm, credential)
+        resource_types, ai_deployments = list_resources("rg-app", "sub-id", pool)
+
+    assert resource_types == ["Microsoft.Web/sites"] * 25 + [
+        "Microsoft.CognitiveServices/accounts"
+    ] * len(ACCOUNTS)
+    # Deployments keep the order of the accounts
+    assert ai_deployments == [
+        f"{format}.{sku}.{name}:{version}"
+        for deployments in ACCOUNTS.values()
+        for format, sku, name, version in deployments
+    ]
+    assert credential.credential.calls == 1
+    assert arm.maxActive > 1
+
+
+def test_clients_are_pooled_per_subscription():
+    with FakeArm(ACCOUNTS) as arm:
+        pool = fake_pool(arm, CachedCredential(CountingCredential()))
+        list_resources("rg-app", "sub-1", pool)
+        list_resources("rg-app", "sub-1", pool)
+        client = pool.get(ResourceManagementClient, "sub-1")
+        assert pool.get(ResourceManagementClient, "sub-2") is not client
+        assert len(pool.clients) == 3
+        pool.close()
+    assert pool.clients == {}
+
+
+def test_cached_credential_refreshes_before_expiry():
+    counting = CountingCredential(lifetime=3600)
+    credential = CachedCredential(counting)
+    token = credential.get_token("scope")
+    assert credential.get_token("scope") is token
+    assert credential.get_token("other-scope") is not token
+    assert counting.calls == 2
+
+    credential.tokens[(("scope",), None, None)] = AccessToken(
+        "old", int(time.time()) + 60
+    )
+    assert credential.get_token("scope").token == "token-3"
+
+
+def test_no_ai_accounts():
+    with FakeArm({}, ["Microsoft.Storage/storageAccounts"]) as arm:
+        pool = fake_pool(arm, CachedCredential(CountingCredential()))
+        assert list_resources("rg-app", "sub-id", pool) == (
+            ["Microsoft.Storage/storageAccounts"],
+            [],
+        )
+        assert not any("deployments" in path for path in arm.requests)
@@ -0,0 +1,54 @@
+from markdown_outline import (
+    Heading,
+    parse_outline,
+    parse_heading_tag,
+    find_missing_headings,
+)
+
+
+def test_parse_outline_atx_and_setext():
+    lines = [
+        "Title\n",
+        "=====\n",
+        "## Features ##\n",
+        "#NotAHeading\n",
+        "Getting   Started\n",
+        "---\n",
+        "   ### Deep\n",
+    ]
+    assert parse_outline(lines) == [
+        Heading(1, "Title", 1),
+        Heading(2, "Features", 3),
+        Heading(2, "Getting Started", 5),
+        Heading(3, "Deep", 7),
+    ]
+
+
+def test_parse_outline_ignores_code_blocks():
+    lines = [
+        "````markdown\n",
+        "## Features\n",
+        "```\n",
+        "## Guidance\n",
+        "`````\n",
+        "~~~\n",
+        "## Setup\n",
+        "~~~\n",
+        "## Resources\n",
+    ]
+    assert parse_outline(lines) == [Heading(2, "Resources", 9)]
+
+
+def test_parse_heading_tag():
+    assert parse_heading_tag("## Getting Started") == (2, "Getting Started")
+    assert parse_heading_tag("Getting Started") == (None, "Getting Started")
+
+
+def test_find_missing_headings():
+    outline = [Heading(2, "Features", 1), Heading(3, "Guidance", 2)]
+    tags = ["## Features", "## Guidance", "Guidance", "## features"]
+    assert find_missing_headings(outline, tags, False) == ["## Guidance"]
+    assert find_missing_headings(outline, tags, True) == [
+        "## Guidance",
+        "## features",
+    ]
@@ -0,0 +1,233 @@
+import json
+from unittest.mock import patch
+from constants import Signs
+from mi_prescan import Expression, prescan, read_bicep
+from validator.ps_rule_validator import PSRuleValidator
+from severity import Severity
+
+MAIN_BICEP = """targetScope = 'subscription'
+
+@secure()
+param adminPassword string
+param plainPassword string = 'P@ss'
+param disableLocal bool = false
+param name string
+
+// An account without a managed identity
+resource ai 'Microsoft.CognitiveServices/accounts@2023-05-01' = {
+  name: 'ai-account'
+  kind: 'OpenAI'
+  properties: {
+    disableLocalAuth: disableLocal
+    customSubDomainName: toLower('x${name}')
+  }
+  resource deployment 'deployments' = [for d in deployments: {
+    name: d.name
+  }]
+}
+
+resource search 'Microsoft.Search/searchServices@2023-11-01' = if (deploySearch) {
+  name: 'search'
+  identity: {
+    type: 'SystemAssigned'
+  }
+  properties: { disableLocalAuth: true, replicaCount: 1 }
+}
+
+resource vault 'Microsoft.KeyVault/vaults@2023-07-01' existing = {
+  name: 'kv'
+}
+
+resource secret 'Microsoft.KeyVault/vaults/secrets@2023-07-01' = {
+  parent: vault
+  name: 'plain'
+  properties: {
+    value: plainPassword
+  }
+}
+
+resource apps 'Microsoft.Web/sites@2022-09-01' = [for i in range(0, 2): if (i > 0) {
+  name: 'app${i}'
+  identity: { type: 'SystemAssigned, UserAssigned' }
+}]
+
+output key string = ai.listKeys().key1
+@secure()
+output secureKey string = ai.listKeys().key1
+output password string = adminPassword
+output endpoint string = ai.properties.endpoint
+"""
+
+ARM_TEMPLATE = {
+    "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#",
+    "parameters": {
+        "adminPassword": {"type": "securestring"},
+        "principalId": {"type": "string", "defaultValue": ""},
+    },
+    "resources": [
+        {
+            "type": "Microsoft.DocumentDB/databaseAccounts",
+            "name": "cosmos",
+            "properties": {"disableLocalAuth": True},
+        },
+        {
+            "type": "Microsoft.Sql/managedInstances",
+            "name": "[parameters('principalId')]",
+            "identity": {"type": "SystemAssigned"},
+            "properties": {
+                "administratorLoginPassword": "[parameters('adminPassword')]"
+            },
+            "resources": [
+                {
+                    "type": "azureADOnlyAuthentications",
+                    "name": "Default",
+                    "properties": {"azureADOnlyAuthentication": True},
+                }
+            ],
+        },
+        {
+            "type": "Microsoft.Resources/deployments",
+            "name": "nested",
+            "properties": {
+                "template": {
+                    "resources": [
+                        {"type": "Microsoft.App/containerApps", "name": "api"}
+                    ]
+                }
+            },
+        },
+    ],
+}
+
+
+TEMPLATE = {
+    "infra/main.bicep": MAIN_BICEP,
+    "infra/sql.json": json.dumps(ARM_TEMPLATE),
+    # Compiled from main.bicep, already covered by it
+    "infra/main.json": json.dumps(
+        {
+            "$schema": ARM_TEMPLATE["$schema"],
+            "metadata": {"_generator": {"name": "bicep"}},
+            "resources": [{"type": "Microsoft.Web/sites", "name": "copy"}],
+        }
+    ),
+    "infra/main.parameters.json": '{"parameters": {}}',
+}
+
+
+def outcomes(records):
+    return {
+        (record["ruleName"], record["targetName"].split(" (")[0]): record["outcome"]
+        for record in records
+    }
+
+
+def test_read_bicep(tmp_path):
+    (tmp_path / "main.bicep").write_text(MAIN_BICEP)
+    template = read_bicep(str(tmp_path / "main.bicep"), "main.bicep")
+    assert template.parameters["adminPassword"].secure
+    assert template.parameters["plainPassword"].default == "P@ss"
+    assert [resource.type for resource in template.resources] == [
+        "Microsoft.CognitiveServices/accounts/deployments",
+        "Microsoft.CognitiveServices/accounts",
+        "Microsoft.Search/searchServices",
+        "Microsoft.KeyVault/vaults/secrets",
+        "Microsoft.Web/sites",
+    ]
+    search = template.resources[2].body
+    assert search["properties"] == {"disableLocalAuth": True, "replicaCount": 1}
+    account = template.resources[1].body
+    assert isinstance(account["properties"]["customSubDomainName"], Expression)
+    assert template.lookup(account, "properties.disableLocalAuth") is False
+    assert [output.secure for output in template.outputs] == [
+        False,
+        True,
+        False,
+        False,
+    ]
+
+
+def test_read_bicep_shares_the_tokenizer(tmp_path):
+    (tmp_path / "site.bicep").write_text(
+        """@allowed([
+  'a' // not the end of the decorator )
+])
+@secure()
+param token string = 'a'
+resource site 'Microsoft.Web/sites@2022-09-01' = {
+  name: 'site' // the name }
+  properties: {
+    url: 'https://example.com/${token}'
+    home: 'https://example.com' /* a comment,
+    over two lines */
+    tags: [
+      'x'
+      'y'
+    ]
+  }
+}
+""",
+        encoding="utf-8-sig",
+    )
+    template = read_bicep(str(tmp_path / "site.bicep"), "site.bicep")
+    assert template.parameters["token"] == ("a", True)
+    (site,) = template.resources
+    assert site.target == "site (site.bicep)"
+    assert isinstance(site.body["properties"]["url"], Expression)
+    assert site.body["properties"]["home"] == "https://example.com"
+    assert site.body["properties"]["tags"] == ["x", "y"]
+
+
+def test_prescan(template):
+    assert outcomes(prescan(str(template))) == {
+        ("Azure.AI.ManagedIdentity", "ai-account"): "Fail",
+        ("Azure.AI.DisableLocalAuth", "ai-account"): "Fail",
+        ("Azure.Search.ManagedIdentity", "search"): "Pass",
+        ("Azure.Deployment.SecureValue", "plain"): "Fail",
+        ("Azure.AppService.ManagedIdentity", "apps"): "Pass",
+        ("Azure.Deployment.OutputSecretValue", "key"): "Fail",
+        ("Azure.Deployment.OutputSecretValue", "secureKey"): "Pass",
+        ("Azure.Deployment.OutputSecretValue", "password"): "Fail",
+        ("Azure.Deployment.OutputSecretValue", "endpoint"): "Pass",
+        ("Azure.Cosmos.DisableLocalAuth", "cosmos"): "Pass",
+        ("Azure.SQLMI.ManagedIdentity", "Microsoft.Sql/managedInstances"): "Pass",
+        ("Azure.SQLMI.AADOnly", "Microsoft.Sql/managedInstances"): "Pass",
+        ("Azure.Deployment.SecureValue", "Microsoft.Sql/managedInstances"): "Pass",
+        ("Azure.ContainerApp.ManagedIdentity", "api"): "Fail",
+    }
+
+
+def test_prescan_follows_baseline(template, tmp_path):
+    baseline = tmp_path / "baseline.yaml"
+    baseline.write_text(
+        "kind: Baseline\nspec:\n  rule:\n    include:\n    - Azure.AI.DisableLocalAuth\n"
+    )
+    assert outcomes(prescan(str(template), str(baseline))) == {
+        ("Azure.AI.DisableLocalAuth", "ai-account"): "Fail"
+    }
+
+
+def test_psrule_validator_uses_prescan(template):
+    validator = PSRuleValidator(
+        "security_requirements", None, Severity.LOW, str(template)
+    )
+    result, message = validator.validate()
+    assert not result
+    assert "Azure.AI.ManagedIdentity (pre-scan), failed once" in message
+    assert "targets: ai-account (infra/main.bicep)" in message
+
+
+def test_prescan_without_baseline_file(template, tmp_path):
+    records = prescan(str(template), str(tmp_path / "missing.yaml"))
+    assert outcomes(records) == outcomes(prescan(str(template)))
+
+
+def test_prescan_error_is_not_verified(template):
+    validator = PSRuleValidator(
+        "security_requirements", None, Severity.LOW, str(template)
+    )
+    with patch("validator.ps_rule_validator.prescan", side_effect=ValueError("broken")):
+        result, message = validator.validate()
+    assert not result
+    assert not message.startswith(Signs.CHECK)
+    assert "The pre-scan could not run: broken" in message
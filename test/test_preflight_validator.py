@@ -0,0 +1,152 @@
+import json
+from constants import Signs
+from severity import Severity
+from bicep_params import ParameterIndex
+from validator.preflight_validator import PreflightValidator
+
+AZURE_YAML = """name: app
+services:
+  api:
+    project: ./src/api
+    host: containerapp
+  web:
+    project: ./src/web
+    host: appservice
+"""
+
+MAIN_BICEP = """targetScope = 'subscription'
+
+@minLength(1)
+@description('Name of the environment')
+param environmentName string
+
+param location string
+param principalId string = ''
+param tags object?
+/* param commented string */
+// param alsoCommented string
+param openAiSku string = 'S0' // pinned
+
+module resources 'resources.bicep' = {
+  name: 'resources'
+}
+module monitoring 'br/public:avm/ptn/azd/monitoring:0.1.0' = {
+  name: 'monitoring'
+}
+"""
+
+PARAMETERS = {
+    "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentParameters.json#",
+    "contentVersion": "1.0.0.0",
+    "parameters": {
+        "environmentName": {"value": "${AZURE_ENV_NAME}"},
+        "location": {"value": "${AZURE_LOCATION}"},
+        "principalId": {"value": "${AZURE_PRINCIPAL_ID}"},
+    },
+}
+
+
+TEMPLATE = {
+    "azure.yaml": AZURE_YAML,
+    "src/api": None,
+    "src/web": None,
+    "infra/main.bicep": MAIN_BICEP,
+    "infra/resources.bicep": "module db 'core/db.bicep' = {}\n",
+    "infra/core/db.bicep": "param name string = 'db'\n",
+    "infra/main.parameters.json": json.dumps(PARAMETERS),
+}
+
+
+def problems(folder):
+    return PreflightValidator("functional_requirements", str(folder)).check()
+
+
+def test_required_parameters():
+    index = ParameterIndex(MAIN_BICEP.replace("/*", "").replace("*/", ""))
+    assert [parameter.name for parameter in index.required()] == [
+        "environmentName",
+        "location",
+        "commented",
+    ]
+
+
+def test_ready_template_passes(template):
+    validator = PreflightValidator("functional_requirements", str(template))
+    result, message = validator.validate()
+    assert result
+    assert message.startswith(Signs.CHECK)
+    assert f"azd pre-flight checks in {template}" in message
+
+
+def test_missing_service_project(template):
+    (template / "src" / "web").rmdir()
+    assert problems(template) == [
+        "The project path ./src/web of service web in azure.yaml does not exist."
+    ]
+
+
+def test_missing_module(template):
+    (template / "infra" / "core" / "db.bicep").unlink()
+    assert problems(template) == [
+        "The module core/db.bicep used by infra/resources.bicep does not exist."
+    ]
+
+
+def test_unbound_and_undeclared_parameters(template):
+    parameters = dict(PARAMETERS["parameters"])
+    del parameters["location"]
+    parameters["openAiCapacity"] = {"value": 10}
+    (template / "infra" / "main.parameters.json").write_text(
+        json.dumps({"parameters": parameters})
+    )
+    assert problems(template) == [
+        "The required parameter location of main.bicep is not set in main.parameters.json.",
+        "main.parameters.json sets openAiCapacity, which main.bicep does not declare.",
+    ]
+
+
+def test_parameters_file_with_bom(template):
+    # Written this way by VS Code and PowerShell on Windows
+    (template / "infra" / "main.parameters.json").write_text(
+        json.dumps(PARAMETERS), encoding="utf-8-sig"
+    )
+    assert problems(template) == []
+
+
+def test_missing_parameters_file(template):
+    (template / "infra" / "main.parameters.json").unlink()
+    assert problems(template) == [
+        "infra/main.parameters.json is missing, main.bicep requires environmentName, location."
+    ]
+    (template / "infra" / "main.bicepparam").write_text(
+        "using 'main.bicep'\nparam environmentName = 'dev'\nparam location = 'eastus'\n"
+    )
+    assert problems(template) == []
+
+
+def test_custom_infra_path_and_module(template):
+    (template / "azure.yaml").write_text(
+        AZURE_YAML + "infra:\n  path: deploy\n  module: app\n"
+    )
+    assert problems(template) == ["The infra folder deploy does not exist."]
+    (template / "infra").rename(template / "deploy")
+    assert problems(template) == ["The infra module deploy/app.bicep does not exist."]
+
+
+def test_terraform_skips_bicep_checks(template):
+    (template / "azure.yaml").write_text(AZURE_YAML + "infra:\n  provider: terraform\n")
+    (template / "infra" / "main.bicep").unlink()
+    assert problems(template) == []
+
+
+def test_invalid_azure_yaml(tmp_path):
+    assert problems(tmp_path) == [f"No azure.yaml found in {tmp_path}."]
+    (tmp_path / "azure.yaml").write_text("services: [unclosed\n")
+    assert problems(tmp_path)[0].startswith("azure.yaml is not valid YAML")
+
+    validator = PreflightValidator(
+        "functional_requirements", str(tmp_path), Severity.LOW
+    )
+    result, message = validator.validate()
+    assert not result
+    assert message.startswith(Signs.WARNING)
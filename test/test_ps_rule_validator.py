@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import patch, mock_open
 from validator.ps_rule_validator import PSRuleValidator
@@ -21,7 +22,7 @@ class TestPSRuleValidator(unittest.TestCase):
             ItemResultFormat.FAIL.format(
                 sign=Signs.BLOCK,
                 message="Security Scan",
-                detail_messages="  - [ ] :x: Rule1 (Error1)\n    \n    Do this\n    reference: http://example.com",
+                detail_messages="  - [ ] :x: Rule1 (Error1), failed once\n    \n    Do this\n    reference: http://example.com",
             ),
         )
 
@@ -40,10 +41,75 @@ class TestPSRuleValidator(unittest.TestCase):
             ItemResultFormat.FAIL.format(
                 sign=Signs.BLOCK,
                 message="Security Scan",
-                detail_messages="  - [ ] :x: Rule1 (Error1)\n    \n    Do this\n    reference: http://example.com\n  - [ ] :x: Rule2 (Error2)\n    \n    Do that\n    reference: http://example.com",
+                detail_messages="  - [ ] :x: Rule1 (Error1), failed once\n    \n    Do this\n    reference: http://example.com\n  - [ ] :x: Rule2 (Error2), failed once\n    \n    Do that\n    reference: http://example.com",
             ),
         )
 
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data=json.dumps(
+            [
+                {
+                    "outcome": "Fail",
+                    "ruleName": "Azure.Deployment.SecureValue",
+                    "ref": "AZR-000316",
+                    "targetName": f"resource{index}",
+                    "info": {
+                        "recommendation": "Use secure parameters.",
+                        "annotations": {"online version": "http://example.com"},
+                    },
+                }
+                for index in range(300)
+            ]
+        ),
+    )
+    def test_validate_groups_failures_by_rule(self, mock_file):
+        validator = PSRuleValidator("ValidatorCatalog", "dummy_path", Severity.LOW)
+        result, message = validator.validate()
+
+        self.assertFalse(result)
+        targets = ", ".join(f"resource{index}" for index in range(10))
+        self.assertEqual(
+            message,
+            ItemResultFormat.FAIL.format(
+                sign=Signs.WARNING,
+                message="Security Scan",
+                detail_messages="  - [ ] :warning: Azure.Deployment.SecureValue (AZR-000316), failed 300 times\n    \n    Use secure parameters.\n    reference: http://example.com\n"
+                + f"    targets: {targets} and more",
+            ),
+        )
+        self.assertEqual(message.count("Use secure parameters."), 1)
+
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data=json.dumps(
+            [
+                {
+                    "outcome": "Fail",
+                    "ruleName": "Azure.Deployment.SecureValue",
+                    "ref": "AZR-000316",
+                    "targetName": f"resource{index % 10}",
+                    "info": {
+                        "recommendation": "Use secure parameters.",
+                        "annotations": {"online version": "http://example.com"},
+                    },
+                }
+                for index in range(30)
+            ]
+        ),
+    )
+    def test_validate_repeated_targets_are_not_more(self, mock_file):
+        validator = PSRuleValidator("ValidatorCatalog", "dummy_path", Severity.LOW)
+        result, message = validator.validate()
+
+        self.assertFalse(result)
+        targets = ", ".join(f"resource{index}" for index in range(10))
+        self.assertIn("failed 30 times", message)
+        self.assertIn(f"targets: {targets}", message)
+        self.assertNotIn("and more", message)
+
     @patch(
         "builtins.open",
         new_callable=mock_open,
@@ -0,0 +1,156 @@
+import importlib
+import os
+import sys
+import time
+from unittest.mock import patch
+from psrule_cache import PSRuleCache, infra_files, main
+import gallery_validate
+
+
+TEMPLATE = {
+    "repo/infra/main.bicep": "param location string\n",
+    "repo/infra/main.parameters.json": "{}",
+    "repo/infra/main.test.bicep": "// generated\n",
+    "repo/infra/app/web.bicep": "param name string\n",
+    "repo/src/package.json": "{}",
+    "repo/psrule-output.json": "[]",
+    "baseline.yaml": "kind: Baseline\n",
+}
+
+
+def make_cache(template, maxSize=1024 * 1024):
+    return PSRuleCache(
+        str(template / "cache"),
+        maxSize,
+        str(template / "baseline.yaml"),
+        str(template / "ps-rule.yaml"),
+    )
+
+
+def test_infra_files(template):
+    assert sorted(infra_files(str(template / "repo"))) == [
+        os.path.join("infra", "app", "web.bicep"),
+        os.path.join("infra", "main.bicep"),
+        os.path.join("infra", "main.parameters.json"),
+    ]
+
+
+def test_key(template):
+    repo = str(template / "repo")
+    cache = make_cache(template)
+    key = cache.key(repo)
+    # Application code, generated files and the PSRule output do not change the key
+    (template / "repo" / "src" / "package.json").write_text('{"name": "app"}')
+    (template / "repo" / "infra" / "main.test.bicep").write_text("// other\n")
+    assert cache.key(repo) == key
+
+    (template / "repo" / "infra" / "main.parameters.json").write_text('{"a": 1}')
+    parametersKey = cache.key(repo)
+    assert parametersKey != key
+
+    (template / "baseline.yaml").write_text("kind: Baseline\nspec: {}\n")
+    assert cache.key(repo) != parametersKey
+
+
+def test_lookup_and_store(template):
+    repo = str(template / "repo")
+    output = str(template / "output.json")
+    cache = make_cache(template)
+    assert not cache.lookup(repo, output)
+
+    (template / "result.json").write_text('[{"outcome": "Pass"}]')
+    cache.store(repo, str(template / "result.json"))
+    assert cache.lookup(repo, output)
+    with open(output) as file:
+        assert file.read() == '[{"outcome": "Pass"}]'
+
+    (template / "repo" / "infra" / "main.bicep").write_text("param region string\n")
+    assert not cache.lookup(repo, str(template / "other.json"))
+
+
+def test_evicts_least_recently_used(template):
+    repo = str(template / "repo")
+    main_bicep = template / "repo" / "infra" / "main.bicep"
+    (template / "result.json").write_text("x" * 400)
+    cache = make_cache(template, maxSize=1000)
+
+    keys = []
+    for index in range(3):
+        main_bicep.write_text(f"param p{index} string\n")
+        keys.append(cache.key(repo))
+        cache.store(repo, str(template / "result.json"))
+        os.utime(cache.path(keys[-1]), (index, time.time()))
+        if index == 1:
+            # Reading the first output makes it the most recently used
+            main_bicep.write_text("param p0 string\n")
+            assert cache.lookup(repo, str(template / "output.json"))
+            os.utime(cache.path(keys[0]), (10, time.time()))
+
+    assert sorted(os.listdir(template / "cache")) == sorted(
+        [f"{keys[0]}.json", f"{keys[2]}.json"]
+    )
+
+
+def test_key_covers_module_versions(template):
+    repo = str(template / "repo")
+    cache = make_cache(template)
+    (template / "result.json").write_text("[]")
+    cache.store(repo, str(template / "result.json"))
+    cache.moduleVersions = "PSRule=2.9.0,PSRule.Rules.Azure=1.40.0"
+    assert not cache.lookup(repo, str(template / "output.json"))
+
+
+def test_expired_outputs_are_not_reused(template):
+    repo = str(template / "repo")
+    cache = make_cache(template)
+    (template / "result.json").write_text("[]")
+    cache.store(repo, str(template / "result.json"))
+    stored = time.time() - cache.maxAge - 60
+    os.utime(cache.path(cache.key(repo)), (stored, stored))
+    assert not cache.lookup(repo, str(template / "output.json"))
+
+    # Removed when the next output is stored
+    (template / "repo" / "infra" / "main.bicep").write_text("param region string\n")
+    cache.store(repo, str(template / "result.json"))
+    assert os.listdir(template / "cache") == [f"{cache.key(repo)}.json"]
+
+
+def test_main(template, capsys):
+    repo = str(template / "repo")
+    cacheDir = str(template / "cache")
+    output = str(template / "output.json")
+    (template / "result.json").write_text("[]")
+    args = ["--cache_dir", cacheDir, "--baseline", str(template / "baseline.yaml")]
+
+    assert main(["lookup", repo, "--output", output] + args) == 1
+    assert main(["store", repo, "--result", str(template / "result.json")] + args) == 0
+    assert main(["lookup", repo, "--output", output] + args) == 0
+    assert os.path.isfile(output)
+
+    # Also reachable as a subcommand of the validation
+    with patch.object(
+        sys, "argv", ["gallery_validate.py", "psrule-cache", "key", repo] + args
+    ):
+        assert gallery_validate.main() == 0
+    assert len(capsys.readouterr().out.strip()) == 64
+
+
+def test_no_infra_files_is_not_cached(tmp_path):
+    (tmp_path / "repo").mkdir()
+    (tmp_path / "repo" / "README.md").write_text("# App\n")
+    (tmp_path / "result.json").write_text("[]")
+    cache = make_cache(tmp_path)
+    assert cache.key(str(tmp_path / "repo")) is None
+    assert not cache.store(str(tmp_path / "repo"), str(tmp_path / "result.json"))
+    assert not cache.lookup(str(tmp_path / "repo"), str(tmp_path / "output.json"))
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_imports_without_yaml():
+    # The action runs the cache before the Python dependencies are installed
+    modules = ["psrule_cache", "utils", "repo_index", "markdown_outline"]
+    with patch.dict(sys.modules, {"yaml": None}):
+        for name in modules:
+            sys.modules.pop(name, None)
+        module = importlib.import_module("psrule_cache")
+    assert module.PSRuleCache
@@ -0,0 +1,106 @@
+import io
+import json
+import pytest
+from psrule_results import (
+    PSRuleFailure,
+    group_failures,
+    iter_failures,
+    iter_json_array,
+)
+
+
+def record(outcome, rule="Azure.Storage.DisableLocalAuth", target="storage"):
+    return {
+        "outcome": outcome,
+        "ruleName": rule,
+        "ref": "AZR-000001",
+        "targetName": target,
+        "info": {
+            "recommendation": "Disable local auth.",
+            "annotations": {"online version": "https://example.com/rule"},
+        },
+        "detail": {"reason": [{"path": "properties", "message": "x" * 40}]},
+    }
+
+
+@pytest.mark.parametrize("chunkSize", [1, 3, 7, 64, 1024 * 1024])
+def test_iter_json_array_matches_json_loads(chunkSize):
+    values = [
+        record("Fail"),
+        12345,
+        -1.5e10,
+        'text with ] and , and \\" and ☃',
+        [],
+        {},
+        [1, [2, {"a": "]"}]],
+        None,
+        True,
+    ]
+    text = " \n[ " + " ,\n".join(json.dumps(value) for value in values) + " ]\n"
+    assert list(iter_json_array(io.StringIO(text), chunkSize)) == values
+
+
+@pytest.mark.parametrize("chunkSize", range(1, 9))
+def test_iter_json_array_numbers_across_chunks(chunkSize):
+    text = '[1.5, 2, 1e5, -3.25E-2, 0, true, null, "ab", 12345]'
+    assert list(iter_json_array(io.StringIO(text), chunkSize)) == json.loads(text)
+
+
+def test_iter_json_array_empty_and_invalid():
+    assert list(iter_json_array(io.StringIO("[ ]"), 1)) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"a": 1}')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO("[1, 2")))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO("[1 2]")))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO("[1, nope]"), 2))
+
+
+def test_iter_failures(tmp_path):
+    path = tmp_path / "psrule-output.json"
+    records = [record("Pass"), record("Fail", target="kv"), record("None")]
+    # PSRule on Windows writes a byte order mark
+    path.write_text(json.dumps(records), encoding="utf-8-sig")
+    assert list(iter_failures(str(path), 16)) == [
+        PSRuleFailure(
+            "Azure.Storage.DisableLocalAuth",
+            "AZR-000001",
+            "Disable local auth.",
+            "https://example.com/rule",
+            "kv",
+        )
+    ]
+
+
+def test_group_failures():
+    def failure(rule, target):
+        return PSRuleFailure(rule, f"ref-{rule}", f"fix {rule}", "link", target)
+
+    failures = [failure("B", f"b{index % 4}") for index in range(300)]
+    failures.insert(1, failure("A", "a"))
+    failures.append(failure("A", None))
+    first, second = group_failures(failures, maxTargets=3)
+    assert (first.ruleName, first.count, list(first.targets)) == (
+        "B",
+        300,
+        ["b0", "b1", "b2"],
+    )
+    assert first.moreTargets
+    assert (second.ruleName, second.ref, second.count) == ("A", "ref-A", 2)
+    assert list(second.targets) == ["a"]
+    assert not second.moreTargets
+
+
+def test_group_failures_repeated_targets_are_not_more():
+    failures = [
+        PSRuleFailure("A", "ref-A", "fix A", "link", f"a{index % 3}")
+        for index in range(30)
+    ]
+    (rule,) = group_failures(failures, maxTargets=3)
+    assert (rule.count, list(rule.targets), rule.moreTargets) == (
+        30,
+        ["a0", "a1", "a2"],
+        False,
+    )
@@ -0,0 +1,169 @@
+import os
+import subprocess
+from unittest.mock import patch
+from repo_index import RepoIndex, is_excluded
+from validator.file_validator import FileValidator
+from validator.folder_validator import FolderValidator
+import utils
+
+
+def test_repo_index_walks_once():
+    repo_index = RepoIndex("test/data")
+    with patch("repo_index.os.walk", wraps=os.walk) as mock_walk:
+        repo_index.walk()
+        repo_index.walk()
+        repo_index.is_folder("test/data/ISSUE_TEMPLATE")
+    assert mock_walk.call_count == 1
+
+
+def test_repo_index_is_folder():
+    repo_index = RepoIndex("test")
+    assert repo_index.is_folder("test/data/ISSUE_TEMPLATE")
+    assert repo_index.is_folder("./test/data")
+    assert not repo_index.is_folder("test/data/LICENSE")
+    assert not repo_index.is_folder("test/missing")
+
+
+def test_repo_index_has_folder_named():
+    repo_index = RepoIndex("test")
+    assert repo_index.has_folder_named("ISSUE_TEMPLATE")
+    assert not repo_index.has_folder_named("missing")
+
+
+def test_repo_index_file_names():
+    repo_index = RepoIndex("test/data")
+    assert repo_index.file_names("test/data")["LICENSE"] == "LICENSE"
+    assert "license" not in repo_index.file_names("test/data")
+    assert repo_index.file_names("test/data", False)["license"] == "LICENSE"
+
+
+def test_repo_index_find_roots_with_file(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "azure.yaml").write_text("")
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "azure.yml").write_text("")
+    (tmp_path / "c").mkdir()
+    repo_index = RepoIndex(str(tmp_path))
+    roots = repo_index.find_roots_with_file(["azure.yaml", "azure.yml"])
+    assert sorted(roots) == [str(tmp_path / "a"), str(tmp_path / "b")]
+    assert utils.find_infra_yaml_path(str(tmp_path), repo_index) == roots
+    assert utils.find_playwright_config_ts_path(str(tmp_path), repo_index) == []
+
+
+def test_validators_share_repo_index():
+    repo_index = RepoIndex("test")
+    validators = [
+        FileValidator(
+            "TestCatalog", "LICENSE", [""], "test", ["data"], repoIndex=repo_index
+        ),
+        FileValidator(
+            "TestCatalog", "README", [".md"], "test", ["data"], repoIndex=repo_index
+        ),
+        FolderValidator("TestCatalog", "ISSUE_TEMPLATE", ["*"], repoIndex=repo_index),
+    ]
+    with patch("repo_index.os.walk", wraps=os.walk) as mock_walk:
+        results = [validator.validate()[0] for validator in validators]
+    assert results == [True, True, True]
+    assert mock_walk.call_count == 1
+
+
+def test_is_excluded():
+    assert is_excluded("node_modules", ["node_modules"])
+    assert is_excluded("web/node_modules", ["node_modules"])
+    assert is_excluded("docs/build", ["docs/*"])
+    assert not is_excluded("src/build_tools", ["build"])
+
+
+def test_repo_index_prunes_default_excludes(tmp_path):
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / "azure.yaml").write_text("")
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "azure.yaml").write_text("")
+    visited = []
+    os_walk = os.walk
+
+    def walk(top):
+        for root, dirs, files in os_walk(top):
+            visited.append(root)
+            yield root, dirs, files
+
+    with patch("repo_index.os.walk", side_effect=walk):
+        repo_index = RepoIndex(str(tmp_path))
+        roots = repo_index.find_roots_with_file(["azure.yaml"])
+    assert roots == [str(tmp_path / "app")]
+    assert str(tmp_path / "node_modules" / "pkg") not in visited
+    assert not repo_index.is_folder(str(tmp_path / "node_modules"))
+
+
+def test_repo_index_walk_with_rule_exclude(tmp_path):
+    (tmp_path / "samples" / "a").mkdir(parents=True)
+    (tmp_path / "src").mkdir()
+    repo_index = RepoIndex(str(tmp_path))
+    roots = [root for root, _, _ in repo_index.walk(["samples"])]
+    assert roots == [str(tmp_path), str(tmp_path / "src")]
+    assert repo_index.is_pruned(str(tmp_path / "samples" / "a"), ["samples"])
+    assert not repo_index.is_pruned(str(tmp_path / "src"), ["samples"])
+
+
+def test_repo_index_find_entries():
+    repo_index = RepoIndex(".")
+    entries = repo_index.find_entries(
+        [os.path.join(".", "test", "data"), os.path.join(".", "test")]
+    )
+    assert [root for root, _, _ in entries] == [
+        os.path.join(".", "test"),
+        os.path.join(".", "test", "data"),
+    ]
+    entries = repo_index.find_entries(
+        [os.path.join(".", "test", "data")], False, ["test"]
+    )
+    assert entries == []
+
+
+def _init_git_repo(path):
+    subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+    (path / ".gitignore").write_text("generated/\n")
+    (path / "infra").mkdir()
+    (path / "infra" / "main.bicep").write_text("")
+    (path / "src" / "api").mkdir(parents=True)
+    (path / "src" / "api" / "app.py").write_text("")
+    (path / "azure.yaml").write_text("")
+    (path / "generated").mkdir()
+    (path / "generated" / "azure.yaml").write_text("")
+    subprocess.run(["git", "add", "-A"], cwd=path, check=True)
+    # Untracked but not ignored files are listed too
+    (path / "README.md").write_text("")
+
+
+def test_repo_index_git_index_matches_walk(tmp_path):
+    _init_git_repo(tmp_path)
+    git_index = RepoIndex(
+        str(tmp_path), exclude=[".git", "generated"], useGitIndex=True
+    )
+    walk_index = RepoIndex(str(tmp_path), exclude=[".git", "generated"])
+
+    def normalize(entries):
+        return sorted(
+            (root, sorted(dirs), sorted(files)) for root, dirs, files in entries
+        )
+
+    assert normalize(git_index.walk()) == normalize(walk_index.walk())
+    assert git_index.find_roots_with_file(["azure.yaml"]) == [str(tmp_path)]
+
+
+def test_repo_index_git_index_skips_ignored_files(tmp_path):
+    _init_git_repo(tmp_path)
+    with patch("repo_index.os.walk") as mock_walk:
+        repo_index = RepoIndex(str(tmp_path), useGitIndex=True)
+        assert not repo_index.is_folder(str(tmp_path / "generated"))
+        assert repo_index.is_folder(str(tmp_path / "src" / "api"))
+    mock_walk.assert_not_called()
+
+
+def test_repo_index_git_index_falls_back_to_walk(tmp_path):
+    (tmp_path / "infra").mkdir()
+    repo_index = RepoIndex(str(tmp_path), useGitIndex=True)
+    with patch("repo_index.subprocess.run") as mock_run:
+        mock_run.side_effect = subprocess.CalledProcessError(128, "git ls-files")
+        assert repo_index.is_folder(str(tmp_path / "infra"))
+    mock_run.assert_called_once()
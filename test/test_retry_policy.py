@@ -0,0 +1,85 @@
+from retry_policy import RetryBudget, RetryPolicy, RetryRule
+
+
+def failing(messages):
+    calls = []
+
+    def func():
+        message = messages[len(calls)]
+        calls.append(message)
+        return message is None, message or "ok"
+
+    return func, calls
+
+
+def test_backoff_grows_exponentially_up_to_max():
+    policy = RetryPolicy(baseDelay=10, maxDelay=50, jitter=0.5, uniform=lambda: 0)
+    assert [policy.delay(retry) for retry in range(1, 5)] == [10, 20, 40, 50]
+    policy.uniform = lambda: 1
+    assert policy.delay(1) == 5
+
+
+def test_retries_transient_failures_with_delays():
+    sleeps = []
+    policy = RetryPolicy(baseDelay=10, sleep=sleeps.append, uniform=lambda: 0)
+    func, calls = failing(
+        ["spawn ETXTBSY", "Cannot connect to the Docker daemon", None]
+    )
+    attempts = []
+    assert policy.run(func, attempts) == (True, "ok")
+    assert len(calls) == 3
+    assert sleeps == [10, 20]
+    assert [(attempt.number, attempt.result) for attempt in attempts] == [
+        (1, False),
+        (2, False),
+        (3, True),
+    ]
+    assert attempts[0].reason == "executable still being written"
+    assert all(attempt.duration >= 0 for attempt in attempts)
+
+
+def test_max_attempts_includes_first_run():
+    sleeps = []
+    policy = RetryPolicy(maxAttempts=3, sleep=sleeps.append)
+    func, calls = failing(["spawn ETXTBSY"] * 4)
+    assert policy.run(func) == (False, "spawn ETXTBSY")
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+
+
+def test_first_matching_rule_wins():
+    policy = RetryPolicy(
+        rules=[
+            RetryRule(r"quota exceeded", False, "quota"),
+            RetryRule(r"exceeded", True, "throttled"),
+        ],
+        sleep=lambda delay: None,
+    )
+    assert policy.classify("Error: quota exceeded") == (False, "quota")
+    assert policy.classify("rate exceeded") == (True, "throttled")
+    assert policy.classify("something else") == (False, None)
+    func, calls = failing(["quota exceeded", None])
+    assert policy.run(func) == (False, "quota exceeded")
+    assert len(calls) == 1
+
+
+def test_budget_is_shared_between_policies():
+    budget = RetryBudget(2)
+    first = RetryPolicy(maxAttempts=5, budget=budget, sleep=lambda delay: None)
+    second = RetryPolicy(maxAttempts=5, budget=budget, sleep=lambda delay: None)
+    func, calls = failing(["spawn ETXTBSY"] * 5)
+    first.run(func)
+    assert len(calls) == 3
+    func, calls = failing(["spawn ETXTBSY"] * 5)
+    second.run(func)
+    assert len(calls) == 1
+    assert budget.used == 2
+
+
+def test_no_retry_when_delay_exceeds_time_left():
+    sleeps = []
+    policy = RetryPolicy(baseDelay=30, sleep=sleeps.append, uniform=lambda: 0)
+    func, calls = failing(["spawn ETXTBSY", None])
+    assert policy.run(func, timeBudget=lambda: 10) == (False, "spawn ETXTBSY")
+    assert len(calls) == 1
+    assert sleeps == []
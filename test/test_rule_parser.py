@@ -3,12 +3,14 @@ import unittest
 import json
 from unittest.mock import patch, mock_open
 from rule_parser import RuleParser
+from execution_engine import ExecutionEngine
 from validator.file_validator import FileValidator
 from validator.azd_validator import AzdValidator
 from validator.topic_validator import TopicValidator
 from validator.azd_command import AzdCommand
 from validator.ps_rule_validator import PSRuleValidator
 from validator.playwright_test_validator import PlaywrightTestValidator
+from validator.preflight_validator import PreflightValidator
 from severity import Severity
 
 
@@ -100,20 +102,24 @@ class TestParseRules(unittest.TestCase):
         self.assertEqual(azd_down_validator.folderPath, "mocked/path/to/infra.yaml")
         self.assertEqual(azd_down_validator.command, AzdCommand.DOWN)
         self.assertEqual(azd_down_validator.severity, Severity.MODERATE)
+        self.assertEqual(azd_down_validator.dependencies, [azd_validator])
 
-        azd_up_validator = validators[3]
-        self.assertIsInstance(azd_up_validator, AzdValidator)
-        self.assertEqual(azd_up_validator.catalog, "Functional Requirements")
-        self.assertEqual(azd_up_validator.folderPath, "mocked/path/to/infra2.yaml")
-        self.assertEqual(azd_up_validator.command, AzdCommand.UP)
-        self.assertEqual(azd_up_validator.severity, Severity.HIGH)
+        azd_up_validator2 = validators[3]
+        self.assertIsInstance(azd_up_validator2, AzdValidator)
+        self.assertEqual(azd_up_validator2.catalog, "Functional Requirements")
+        self.assertEqual(azd_up_validator2.folderPath, "mocked/path/to/infra2.yaml")
+        self.assertEqual(azd_up_validator2.command, AzdCommand.UP)
+        self.assertEqual(azd_up_validator2.severity, Severity.HIGH)
+        # Both folders share one azd environment, the second waits for the teardown
+        self.assertEqual(azd_up_validator2.dependencies, [azd_down_validator])
 
-        azd_down_validator = validators[4]
-        self.assertIsInstance(azd_down_validator, AzdValidator)
-        self.assertEqual(azd_down_validator.catalog, "Functional Requirements")
-        self.assertEqual(azd_down_validator.folderPath, "mocked/path/to/infra2.yaml")
-        self.assertEqual(azd_down_validator.command, AzdCommand.DOWN)
-        self.assertEqual(azd_down_validator.severity, Severity.MODERATE)
+        azd_down_validator2 = validators[4]
+        self.assertIsInstance(azd_down_validator2, AzdValidator)
+        self.assertEqual(azd_down_validator2.catalog, "Functional Requirements")
+        self.assertEqual(azd_down_validator2.folderPath, "mocked/path/to/infra2.yaml")
+        self.assertEqual(azd_down_validator2.command, AzdCommand.DOWN)
+        self.assertEqual(azd_down_validator2.severity, Severity.MODERATE)
+        self.assertEqual(azd_down_validator2.dependencies, [azd_up_validator2])
 
         topic_validator = validators[5]
         self.assertIsInstance(topic_validator, TopicValidator)
@@ -141,6 +147,7 @@ class TestParseRules(unittest.TestCase):
                     "catalog": "Functional Requirements",
                     "validator": "AzdValidator",
                     "severity": "high",
+                    "timeout": 5400,
                 },
                 "azd down": {
                     "catalog": "Functional Requirements",
@@ -170,6 +177,7 @@ class TestParseRules(unittest.TestCase):
         self.assertEqual(azd_up_validator.folderPath, "mocked/path/to/infra.yaml")
         self.assertEqual(azd_up_validator.command, AzdCommand.UP)
         self.assertEqual(azd_up_validator.severity, Severity.HIGH)
+        self.assertEqual(azd_up_validator.timeout, 5400)
 
         azd_down_validator = validators[1]
         self.assertIsInstance(azd_down_validator, AzdValidator)
@@ -177,6 +185,77 @@ class TestParseRules(unittest.TestCase):
         self.assertEqual(azd_down_validator.folderPath, "mocked/path/to/infra.yaml")
         self.assertEqual(azd_down_validator.command, AzdCommand.DOWN)
         self.assertEqual(azd_down_validator.severity, Severity.MODERATE)
+        self.assertIsNone(azd_down_validator.timeout)
+        # Both commands draw their retries from the budget of the run
+        self.assertIs(
+            azd_up_validator.retryPolicy.budget, azd_down_validator.retryPolicy.budget
+        )
+
+    @patch.dict("os.environ", {"AZURE_ENV_NAME": "myenv"})
+    @patch("utils.find_infra_yaml_path")
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data=json.dumps(
+            {
+                "azd up": {
+                    "catalog": "Functional Requirements",
+                    "validator": "AzdValidator",
+                },
+                "azd down": {
+                    "catalog": "Functional Requirements",
+                    "validator": "AzdValidator",
+                },
+            }
+        ),
+    )
+    def test_parse_azd_validator_concurrent_env_names(
+        self, mock_file, mock_find_infra_yaml_path
+    ):
+        mock_find_infra_yaml_path.return_value = ["./app1", "./app2"]
+        args = argparse.Namespace(
+            validate_azd=True,
+            topics=None,
+            repo_path=".",
+            validate_paths=None,
+            expected_topics=None,
+            azd_concurrency=2,
+        )
+        validators = RuleParser("dummy_path", args).parse()
+        self.assertEqual(
+            [(v.folderPath, v.envName) for v in validators],
+            [
+                ("./app1", "myenv-1"),
+                ("./app1", "myenv-1"),
+                ("./app2", "myenv-2"),
+                ("./app2", "myenv-2"),
+            ],
+        )
+        # The folders have their own environments, so they are not chained
+        self.assertEqual(validators[2].dependencies, [])
+
+        args.azd_concurrency = 1
+        validators = RuleParser("dummy_path", args).parse()
+        self.assertEqual([v.envName for v in validators], [None] * 4)
+        self.assertEqual(validators[2].dependencies, [validators[1]])
+
+        # A teardown in the background overlaps the next deployment
+        args.background_teardown = True
+        validators = RuleParser("dummy_path", args).parse()
+        self.assertEqual(
+            [v.envName for v in validators],
+            ["myenv-1", "myenv-1", "myenv-2", "myenv-2"],
+        )
+        self.assertEqual(validators[2].dependencies, [])
+        args.background_teardown = False
+
+        # Without AZURE_ENV_NAME, the folder names keep the environments apart
+        args.azd_concurrency = 2
+        with patch.dict("os.environ", {}, clear=True):
+            validators = RuleParser("dummy_path", args).parse()
+        self.assertEqual(
+            [v.envName for v in validators], ["app1-1", "app1-1", "app2-2", "app2-2"]
+        )
 
     @patch("utils.find_playwright_config_ts_path")
     @patch("utils.find_infra_yaml_path")
@@ -245,6 +324,124 @@ class TestParseRules(unittest.TestCase):
         self.assertEqual(azd_down_validator.command, AzdCommand.DOWN)
         self.assertEqual(azd_down_validator.severity, Severity.MODERATE)
 
+        self.assertEqual(playwright_test_validator.dependencies, [azd_up_validator])
+        self.assertEqual(
+            azd_down_validator.dependencies,
+            [azd_up_validator, playwright_test_validator],
+        )
+
+    @patch("utils.find_playwright_config_ts_path")
+    @patch("utils.find_infra_yaml_path")
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data=json.dumps(
+            {
+                "azd up": {
+                    "catalog": "Functional Requirements",
+                    "validator": "AzdValidator",
+                    "severity": "high",
+                },
+                "azd down": {
+                    "catalog": "Functional Requirements",
+                    "validator": "AzdValidator",
+                    "severity": "moderate",
+                },
+                "playwright test": {
+                    "catalog": "Functional Requirements",
+                    "validator": "PlaywrightTestValidator",
+                    "severity": "low",
+                },
+            }
+        ),
+    )
+    def test_parse_playwright_dependencies_per_infra_folder(
+        self, mock_file, find_infra_yaml_path, find_playwright_config_ts_path
+    ):
+        find_infra_yaml_path.return_value = ["./app1", "./app2"]
+        find_playwright_config_ts_path.return_value = ["./app2/tests"]
+        args = argparse.Namespace(
+            validate_azd=True,
+            validate_playwright_test=True,
+            topics=None,
+            repo_path=".",
+            validate_paths=None,
+            expected_topics=None,
+        )
+        parser = RuleParser("dummy_path", args)
+        validators = parser.parse()
+        up1, down1, up2, playwright, down2 = validators
+        # Run one at a time, each folder's cycle ends before the next one deploys
+        order = ExecutionEngine(validators).topological_order()
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+        self.assertEqual(up2.dependencies, [down1])
+        self.assertEqual(playwright.dependencies, [up2])
+        self.assertEqual(down1.dependencies, [up1])
+        self.assertEqual(down2.dependencies, [up2, playwright])
+        self.assertEqual(up2.cachePaths, ["./app2/tests"])
+        self.assertIsNone(up2.cache)
+
+    @patch("utils.find_playwright_config_ts_path")
+    @patch("utils.find_infra_yaml_path")
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data=json.dumps(
+            {
+                "azd preflight": {
+                    "catalog": "Functional Requirements",
+                    "validator": "PreflightValidator",
+                    "severity": "high",
+                },
+                "azd up": {
+                    "catalog": "Functional Requirements",
+                    "validator": "AzdValidator",
+                    "severity": "high",
+                },
+                "azd down": {
+                    "catalog": "Functional Requirements",
+                    "validator": "AzdValidator",
+                    "severity": "moderate",
+                },
+                "playwright test": {
+                    "catalog": "Functional Requirements",
+                    "validator": "PlaywrightTestValidator",
+                    "severity": "low",
+                },
+            }
+        ),
+    )
+    def test_parse_preflight_prerequisites(
+        self, mock_file, find_infra_yaml_path, find_playwright_config_ts_path
+    ):
+        find_infra_yaml_path.return_value = ["./app1", "./app2"]
+        find_playwright_config_ts_path.return_value = ["./app2/tests"]
+        args = argparse.Namespace(
+            validate_azd=True,
+            validate_playwright_test=True,
+            topics=None,
+            repo_path=".",
+            validate_paths=None,
+            expected_topics=None,
+        )
+        parser = RuleParser("dummy_path", args)
+        check1, check2, up1, down1, up2, playwright, down2 = parser.parse()
+
+        self.assertIsInstance(check1, PreflightValidator)
+        self.assertEqual(check2.folderPath, "./app2")
+        self.assertEqual(up1.prerequisites, [check1])
+        self.assertEqual(up2.dependencies, [check2, down1])
+        self.assertEqual(up2.prerequisites, [check2])
+        self.assertEqual(playwright.dependencies, [up2, check2])
+        self.assertEqual(playwright.prerequisites, [check2])
+        self.assertEqual(down1.dependencies, [up1, check1])
+        self.assertEqual(down2.prerequisites, [check2])
+
+        args.validate_azd = False
+        (playwright,) = RuleParser("dummy_path", args).parse()
+        self.assertEqual(playwright.prerequisites, [])
+
     @patch("utils.find_playwright_config_ts_path")
     @patch(
         "builtins.open",
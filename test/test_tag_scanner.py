@@ -0,0 +1,63 @@
+import random
+from tag_scanner import TagScanner
+
+
+def test_find_missing_case_non_sensitive(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("# Title\n## FEATURES\n## Getting started\n")
+    scanner = TagScanner(["## Features", "## Getting Started", "## Resources"])
+    assert scanner.find_missing(str(readme)) == ["## Resources"]
+
+
+def test_find_missing_case_sensitive(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("## Features\n## getting started\n")
+    scanner = TagScanner(["## Features", "## Getting Started"], True)
+    assert scanner.find_missing(str(readme)) == ["## Getting Started"]
+
+
+def test_find_missing_across_chunk_boundaries(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("x" * 10 + "## Guidance" + "y" * 10 + "## Resources")
+    scanner = TagScanner(["## Guidance", "## Resources", "## Features"])
+    assert scanner.find_missing(str(readme), chunkSize=3) == ["## Features"]
+
+
+def test_find_missing_overlapping_tags(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("## Getting Started\n")
+    scanner = TagScanner(["## Getting Started", "Getting", "## Get", "Started!"])
+    assert scanner.find_missing(str(readme)) == ["Started!"]
+
+
+def test_find_missing_invalid_utf8(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_bytes(b"\xff\xfe## Features\n\x80## Guidance")
+    scanner = TagScanner(["## Features", "## Guidance", "## Resources"])
+    assert scanner.find_missing(str(readme), chunkSize=4) == ["## Resources"]
+
+
+def test_find_missing_empty_tag(tmp_path):
+    readme = tmp_path / "README.md"
+    readme.write_text("")
+    scanner = TagScanner(["", "## Features"])
+    assert scanner.find_missing(str(readme)) == ["## Features"]
+
+
+def test_scan_matches_substring_search():
+    rng = random.Random(0)
+    for _ in range(200):
+        text = "".join(rng.choice("abAB# ") for _ in range(rng.randint(0, 60)))
+        tags = [
+            "".join(rng.choice("abAB#") for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 5))
+        ]
+        for caseSensitive in (True, False):
+            scanner = TagScanner(tags, caseSensitive)
+            found = scanner.scan([text[:7], text[7:]])
+            expected = {
+                index
+                for index, tag in enumerate(tags)
+                if (tag in text if caseSensitive else tag.lower() in text.lower())
+            }
+            assert found == expected
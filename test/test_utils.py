@@ -0,0 +1,139 @@
+import logging
+import os
+import subprocess
+import sys
+import time
+import pytest
+import utils
+from utils import OutputBuffer, atomic_write, run_command, log_file_path, indent
+
+
+def python_command(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+def test_run_command_success(tmp_path):
+    log_path = str(tmp_path / "run.log")
+    lines = []
+    returncode, output = run_command(
+        python_command("print('hello'); print('world')"),
+        str(tmp_path),
+        log_path,
+        on_line=lines.append,
+    )
+    assert returncode == 0
+    assert output == "hello\nworld\n"
+    assert lines == ["hello\n", "world\n"]
+    with open(log_path) as log_file:
+        assert "hello\nworld\n" in log_file.read()
+
+
+def test_run_command_keeps_bounded_tail(tmp_path):
+    log_path = str(tmp_path / "run.log")
+    code = "import sys; [print(i) for i in range(20000)]; sys.stderr.write('boom'); sys.exit(3)"
+    returncode, output = run_command(
+        python_command(code), str(tmp_path), log_path, tail_size=100
+    )
+    assert returncode == 3
+    assert len(output) <= 100
+    assert output.endswith("19999\nboom")
+    with open(log_path) as log_file:
+        content = log_file.read()
+    assert "\n0\n" in content and "19999\nboom" in content
+    assert content.endswith("exit code 3\n")
+
+
+def test_run_command_invalid_utf8(tmp_path):
+    returncode, output = run_command(
+        python_command("import sys; sys.stdout.buffer.write(bytes([255, 65]))"),
+        str(tmp_path),
+        str(tmp_path / "run.log"),
+    )
+    assert returncode == 0
+    assert output == "�A"
+
+
+def test_run_command_timeout_kills_process_tree(tmp_path):
+    log_path = str(tmp_path / "run.log")
+    # The child keeps the output pipe open, the read loop only ends once it is killed too
+    code = (
+        "import subprocess, sys; print('started', flush=True); "
+        "subprocess.run([sys.executable, '-c', 'import time; time.sleep(60)'])"
+    )
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired) as error:
+        run_command(python_command(code), str(tmp_path), log_path, timeout=1)
+    assert time.monotonic() - start < 30
+    assert error.value.output == "started\n"
+    with open(log_path) as log_file:
+        assert log_file.read().endswith("timed out after 1 seconds\n")
+
+
+def test_run_command_no_time_left(tmp_path):
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_command(
+            python_command("print('never')"),
+            str(tmp_path),
+            str(tmp_path / "run.log"),
+            timeout=0,
+        )
+    assert not (tmp_path / "run.log").exists()
+
+
+def test_log_file_path(tmp_path, monkeypatch):
+    path = log_file_path("azd up in ./app1", str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+    assert os.path.basename(path).startswith("azd-up-in-app1-")
+    assert path.endswith(".log")
+    # Labels that only differ in punctuation keep their own logs
+    assert path != log_file_path("azd up in ./app-1", str(tmp_path))
+    assert path == log_file_path("azd up in ./app1", str(tmp_path))
+    monkeypatch.setattr(utils, "default_log_dir", str(tmp_path / "default"))
+    assert os.path.dirname(log_file_path("azd up")) == str(tmp_path / "default")
+
+
+def test_output_buffer_writes_one_block(tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    buffers = [OutputBuffer(), OutputBuffer()]
+    for index in range(3):
+        for name, buffer in zip("ab", buffers):
+            run_command(
+                python_command(f"print('{name}{index}')"),
+                str(tmp_path),
+                str(tmp_path / f"{name}.log"),
+                prefix=f"[{name}] ",
+                console=buffer,
+            )
+    assert caplog.messages == []
+    buffers[1].flush("b")
+    buffers[0].flush("a")
+    buffers[0].flush("a")
+    assert caplog.messages == [
+        "Output of b:",
+        "[b] b0",
+        "[b] b1",
+        "[b] b2",
+        "Output of a:",
+        "[a] a0",
+        "[a] a1",
+        "[a] a2",
+    ]
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / "record.json"
+    path.write_text("old")
+    with pytest.raises(ValueError):
+        with atomic_write(str(path)) as file:
+            file.write("new")
+            raise ValueError("interrupted")
+    assert os.listdir(tmp_path) == ["record.json"]
+    assert path.read_text() == "old"
+    with atomic_write(str(path)) as file:
+        file.write("new")
+    assert os.listdir(tmp_path) == ["record.json"]
+    assert path.read_text() == "new"
+
+
+def test_indent():
+    assert indent("a\nb\n", 4) == "a\n    b\n"